@@ -3,6 +3,8 @@
 # https://docs.gunicorn.org/en/stable/settings.html
 
 import multiprocessing
+import os
+import shutil
 
 bind = '0.0.0.0:8000'
 # Concerning `workers` setting see:
@@ -15,3 +17,24 @@ max_requests_jitter = 400
 accesslog = '-'
 chdir = '/code'
 worker_tmp_dir = '/dev/shm'  # noqa: S108
+
+
+def _metrics():
+    """Metrics module configured by the same Django settings as workers."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+    from server.common import metrics  # noqa: WPS433
+
+    return metrics
+
+
+def on_starting(server):
+    """Drops metric files of the previous run (see server/common/metrics.py)."""
+    shutil.rmtree(_metrics().get_directory(), ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Moves counters of the exited worker to the metrics archive file."""
+    try:
+        _metrics().archive(worker.pid)
+    except OSError:
+        server.log.exception('Failed to archive metrics of %s', worker.pid)
@@ -1,10 +1,13 @@
 """
 Административный интерфейс для моделей аутентификации и авторизации.
 """
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import User, Role, UserRole, BusinessElement, AccessRule, Session
+from .masks import PERMISSION_FIELDS, mask_to_names
+from .models import AccessRule, BusinessElement, Role, Session, User, UserRole
+from .session_cache import invalidate_session_tokens
 
 
 @admin.register(User)
@@ -66,21 +69,55 @@ class BusinessElementAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+class AccessRuleAdminForm(forms.ModelForm):
+    """Форма правила доступа: права - флажки над маской permissions."""
+
+    read_permission = forms.BooleanField(
+        label=AccessRule.read_permission.__doc__, required=False
+    )
+    read_all_permission = forms.BooleanField(
+        label=AccessRule.read_all_permission.__doc__, required=False
+    )
+    create_permission = forms.BooleanField(
+        label=AccessRule.create_permission.__doc__, required=False
+    )
+    update_permission = forms.BooleanField(
+        label=AccessRule.update_permission.__doc__, required=False
+    )
+    update_all_permission = forms.BooleanField(
+        label=AccessRule.update_all_permission.__doc__, required=False
+    )
+    delete_permission = forms.BooleanField(
+        label=AccessRule.delete_permission.__doc__, required=False
+    )
+    delete_all_permission = forms.BooleanField(
+        label=AccessRule.delete_all_permission.__doc__, required=False
+    )
+
+    class Meta:
+        model = AccessRule
+        fields = ['role', 'element']
+
+    def __init__(self, *args, **kwargs):
+        """Флажки прав заполняются из маски правила."""
+        super().__init__(*args, **kwargs)
+        for name in PERMISSION_FIELDS:
+            self.initial.setdefault(name, getattr(self.instance, name))
+
+    def clean(self):
+        """Перенос флажков в маску правила."""
+        cleaned_data = super().clean()
+        for name in PERMISSION_FIELDS:
+            setattr(self.instance, name, cleaned_data.get(name, False))
+        return cleaned_data
+
+
 @admin.register(AccessRule)
 class AccessRuleAdmin(admin.ModelAdmin):
     """Админ для модели AccessRule."""
     
-    list_display = [
-        'role',
-        'element',
-        'read_permission',
-        'read_all_permission',
-        'create_permission',
-        'update_permission',
-        'update_all_permission',
-        'delete_permission',
-        'delete_all_permission',
-    ]
+    form = AccessRuleAdminForm
+    list_display = ['role', 'element', 'permission_names']
     list_filter = ['role', 'element']
     search_fields = ['role__name', 'element__name']
     readonly_fields = ['created_at', 'updated_at']
@@ -106,6 +143,11 @@ class AccessRuleAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.display(description='Права', ordering='permissions')
+    def permission_names(self, obj):
+        """Короткие имена прав правила."""
+        return ', '.join(mask_to_names(obj.permissions)) or '-'
+
 
 @admin.register(Session)
 class SessionAdmin(admin.ModelAdmin):
@@ -116,7 +158,19 @@ class SessionAdmin(admin.ModelAdmin):
     search_fields = ['user__email', 'ip_address']
     readonly_fields = ['token_hash', 'refresh_token_hash', 'created_at']
     raw_id_fields = ['user']
+    actions = ['deactivate_sessions']
     
+    @admin.action(description='Деактивировать выбранные сессии')
+    def deactivate_sessions(self, request, queryset):
+        """Деактивация сессий с отзывом из кеша всех воркеров."""
+        sessions = queryset.filter(is_active=True)
+        token_hashes = list(sessions.values_list('token_hash', flat=True))
+        sessions.update(is_active=False)
+        invalidate_session_tokens(token_hashes)
+        self.message_user(
+            request, f'Деактивировано сессий: {len(token_hashes)}'
+        )
+
     def has_add_permission(self, request):
         """Запрещаем создание сессий через админку."""
         return False
@@ -10,3 +10,4 @@ class AuthenticationConfig(AppConfig):
 
     def ready(self):
         """Инициализация приложения."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,149 @@
+"""
+Массовое назначение и отзыв ролей.
+
+Пары (пользователь, роль) проверяются запросами по множествам:
+существующие пользователи, роли и назначения загружаются одним
+запросом каждое. Новые назначения вставляются одним bulk_create
+с ignore_conflicts (гонку с параллельным назначением разрешает
+ограничение unique_user_role), отзыв - одним удалением по ID.
+Версии прав затронутых пользователей меняются один раз на пачку.
+"""
+from django.db import transaction
+
+from .models import Role, User, UserRole
+from .versions import bump_user_versions, deferred_bumps
+
+# Не больше стольких пар за запрос
+MAX_PAIRS = 10000
+# Строк в одном INSERT
+BATCH_SIZE = 1000
+
+ASSIGNED = 'assigned'
+ALREADY_ASSIGNED = 'already_assigned'
+REVOKED = 'revoked'
+NOT_ASSIGNED = 'not_assigned'
+USER_NOT_FOUND = 'user_not_found'
+ROLE_NOT_FOUND = 'role_not_found'
+
+
+def assign_roles(pairs, assigned_by=None) -> list[dict]:
+    """
+    Назначение ролей пользователям.
+
+    Args:
+        pairs: итерируемое из (user_id, role_id)
+        assigned_by: пользователь, назначающий роли
+
+    Returns:
+        Результат для каждой пары (без повторов, в исходном порядке):
+        {'user_id', 'role_id', 'status'}, status - assigned,
+        already_assigned, user_not_found или role_not_found
+    """
+    pairs, existing = _load(pairs)
+    results = _check(pairs)
+    new = [
+        pair
+        for pair, result in zip(pairs, results, strict=True)
+        if result is None and pair not in existing
+    ]
+
+    _insert(new, assigned_by)
+
+    new = set(new)
+    return [
+        _result(pair, status or (ASSIGNED if pair in new else ALREADY_ASSIGNED))
+        for pair, status in zip(pairs, results, strict=True)
+    ]
+
+
+def revoke_roles(pairs) -> list[dict]:
+    """
+    Отзыв ролей у пользователей.
+
+    Args:
+        pairs: итерируемое из (user_id, role_id)
+
+    Returns:
+        Результат для каждой пары: status - revoked, not_assigned,
+        user_not_found или role_not_found
+    """
+    pairs, existing = _load(pairs)
+    results = _check(pairs)
+    revoked = {pair: existing[pair] for pair in pairs if pair in existing}
+
+    if revoked:
+        # post_delete каждой строки меняет версию - откладываем до конца пачки
+        with transaction.atomic(), deferred_bumps():
+            UserRole.objects.filter(id__in=revoked.values()).delete()
+
+    return [
+        _result(pair, status or (REVOKED if pair in revoked else NOT_ASSIGNED))
+        for pair, status in zip(pairs, results, strict=True)
+    ]
+
+
+def _insert(pairs, assigned_by) -> None:
+    """Вставка новых назначений и смена версий прав их пользователей."""
+    with transaction.atomic():
+        UserRole.objects.bulk_create(
+            [
+                UserRole(
+                    user_id=user_id, role_id=role_id, assigned_by=assigned_by
+                )
+                for user_id, role_id in pairs
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # bulk_create не отправляет post_save - версии меняются здесь
+        bump_user_versions({user_id for user_id, _ in pairs})
+
+
+def _load(pairs):
+    """Пары без повторов и существующие назначения {(user_id, role_id): ID}."""
+    pairs = list(
+        dict.fromkeys(
+            (int(user_id), int(role_id)) for user_id, role_id in pairs
+        )
+    )
+    user_ids = {user_id for user_id, _ in pairs}
+    role_ids = {role_id for _, role_id in pairs}
+    wanted = set(pairs)
+    existing = {
+        (user_id, role_id): assignment_id
+        for assignment_id, user_id, role_id in UserRole.objects.filter(
+            user_id__in=user_ids, role_id__in=role_ids,
+        ).order_by().values_list('id', 'user_id', 'role_id')
+        if (user_id, role_id) in wanted
+    }
+    return pairs, existing
+
+
+def _check(pairs) -> list[str | None]:
+    """Ошибка для каждой пары (None - пользователь и роль существуют)."""
+    user_ids = {user_id for user_id, _ in pairs}
+    role_ids = {role_id for _, role_id in pairs}
+    users = set(
+        User.objects
+        .filter(id__in=user_ids)
+        .order_by()
+        .values_list('id', flat=True)
+    )
+    roles = set(
+        Role.objects
+        .filter(id__in=role_ids)
+        .order_by()
+        .values_list('id', flat=True)
+    )
+    return [
+        USER_NOT_FOUND
+        if user_id not in users
+        else ROLE_NOT_FOUND
+        if role_id not in roles
+        else None
+        for user_id, role_id in pairs
+    ]
+
+
+def _result(pair, status) -> dict:
+    return {'user_id': pair[0], 'role_id': pair[1], 'status': status}
@@ -1,11 +1,73 @@
 """
 DRF Authentication классы для JWT токенов.
 """
+import functools
+
 import jwt
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from rest_framework import authentication, exceptions
 
-from .models import User, Session
-from .utils import decode_token, hash_token
+from server.common.timing import phase
+
+from .metrics import AUTHENTICATIONS
+from .models import Session, User
+from .principal import get_principal, principal_from_claims
+from .revocation import get_revocation_list
+from .session_cache import get_session_cache
+from .utils import verify_token
+
+
+def authentication_failed(
+    outcome: str, message: str
+) -> exceptions.AuthenticationFailed:
+    """
+    Ошибка аутентификации с учетом в метрике rolegate_authentication_total.
+
+    Args:
+        outcome: причина отказа (метка outcome)
+        message: сообщение для клиента
+
+    Returns:
+        AuthenticationFailed для raise
+    """
+    AUTHENTICATIONS.inc(outcome=outcome)
+    return exceptions.AuthenticationFailed(message)
+
+
+class LazyUser(SimpleLazyObject):
+    """
+    Пользователь, загружаемый из БД при первом обращении к его полям.
+
+    ID, признак аутентификации и снимок прав доступны без загрузки,
+    поэтому проверка токена и прав в режиме 'revocation' не обращается
+    к БД; профиль загружается одним запросом, только если он нужен
+    представлению.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id: int):
+        """
+        Создание пользователя.
+
+        Args:
+            user_id: ID активного пользователя из токена
+        """
+        super().__init__(functools.partial(User.objects.get, id=user_id))
+        self.__dict__['id'] = self.__dict__['pk'] = user_id
+
+    def __bool__(self):
+        """Пользователь аутентифицирован - загрузка не нужна."""
+        return True
+
+    def __setattr__(self, name, value):
+        """Снимок прав сохраняется без загрузки пользователя."""
+        if name == 'principal':
+            self.__dict__[name] = value
+        else:
+            super().__setattr__(name, value)
 
 
 class JWTAuthentication(authentication.BaseAuthentication):
@@ -42,10 +104,12 @@ class JWTAuthentication(authentication.BaseAuthentication):
             return None
 
         if len(auth_parts) == 1:
-            raise exceptions.AuthenticationFailed('Токен не предоставлен')
+            raise authentication_failed('malformed', 'Токен не предоставлен')
 
         if len(auth_parts) > 2:
-            raise exceptions.AuthenticationFailed('Некорректный формат токена')
+            raise authentication_failed(
+                'malformed', 'Некорректный формат токена'
+            )
 
         token = auth_parts[1]
 
@@ -64,45 +128,127 @@ class JWTAuthentication(authentication.BaseAuthentication):
         Raises:
             AuthenticationFailed: если токен невалиден
         """
+        payload, token_hash = self._decode_token(token)
+
+        user_id = payload.get('user_id')
+        if not user_id:
+            raise authentication_failed('invalid', 'Токен не содержит user_id')
+
+        validation = getattr(settings, 'JWT_SESSION_VALIDATION', 'database')
+        if validation == 'revocation':
+            user = self._validate_session_revocation(user_id, token_hash)
+        else:
+            user = self._validate_session_database(
+                user_id, token_hash, payload['exp']
+            )
+
+        # Прикрепляем скомпилированный снимок ролей и прав
+        # (из claims токена, если версия прав в нем актуальна)
+        with phase('principal'):
+            user.principal = principal_from_claims(payload) or get_principal(
+                user.id
+            )
+
+        AUTHENTICATIONS.inc(outcome='success')
+        return (user, token)
+
+    def _decode_token(self, token):
+        """
+        Декодирование access токена.
+
+        Returns:
+            tuple (payload, token_hash)
+
+        Raises:
+            AuthenticationFailed: если токен невалиден или не access
+        """
         try:
-            # Декодируем токен
-            payload = decode_token(token)
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Токен истек')
-        except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed('Невалидный токен')
+            # Повторные токены - из кеша проверенных
+            with phase('token'):
+                payload, token_hash = verify_token(token)
+        except jwt.ExpiredSignatureError as error:
+            raise authentication_failed('expired', 'Токен истек') from error
+        except jwt.InvalidTokenError as error:
+            raise authentication_failed(
+                'invalid', 'Невалидный токен'
+            ) from error
 
         # Проверяем тип токена
         if payload.get('type') != 'access':
-            raise exceptions.AuthenticationFailed('Неверный тип токена')
+            raise authentication_failed('wrong_type', 'Неверный тип токена')
+        return payload, token_hash
 
-        user_id = payload.get('user_id')
-        if not user_id:
-            raise exceptions.AuthenticationFailed('Токен не содержит user_id')
+    def _validate_session_revocation(self, user_id, token_hash):
+        """
+        Проверка сессии по списку отзыва, без обращения к БД.
 
-        # Проверяем существование активной сессии
-        token_hash = hash_token(token)
-        session_exists = Session.objects.filter(
-            user_id=user_id,
-            token_hash=token_hash,
-            is_active=True,
-        ).exists()
+        Токен валиден, пока его сессию не отозвали, а пользователя
+        не деактивировали.
 
-        if not session_exists:
-            raise exceptions.AuthenticationFailed('Сессия не найдена или неактивна')
+        Returns:
+            LazyUser, загружаемый из БД только при обращении к полям
+        """
+        with phase('session'):
+            if get_revocation_list().is_revoked(token_hash, user_id):
+                raise authentication_failed(
+                    'session_not_found', 'Сессия не найдена или неактивна'
+                )
+        with phase('user'):
+            return LazyUser(user_id)
 
-        # Загружаем пользователя с его ролями
-        try:
-            user = User.objects.prefetch_related(
-                'user_roles__role__access_rules__element'
-            ).get(
-                id=user_id,
+    def _validate_session_database(self, user_id, token_hash, expires_at):
+        """
+        Проверка сессии и пользователя в БД.
+
+        Returns:
+            активный пользователь
+
+        Raises:
+            AuthenticationFailed: если сессии или пользователя нет
+        """
+        with phase('session'):
+            self.check_session(user_id, token_hash, expires_at)
+        with phase('user'):
+            try:
+                return User.objects.get(id=user_id, is_active=True)
+            except User.DoesNotExist as error:
+                raise authentication_failed(
+                    'user_not_found', 'Пользователь не найден',
+                ) from error
+
+    def check_session(self, user_id, token_hash, expires_at):
+        """
+        Проверка существования активной сессии в БД.
+
+        Подтвержденные сессии берутся из процессного кеша.
+
+        Args:
+            user_id: ID пользователя из токена
+            token_hash: SHA-256 хеш access токена
+            expires_at: время истечения токена (unix timestamp)
+
+        Raises:
+            AuthenticationFailed: если активной сессии нет
+        """
+        session_cache = get_session_cache()
+        if session_cache is None or not session_cache.contains(
+            user_id, token_hash
+        ):
+            # Отзыв во время чтения БД не даст закешировать сессию
+            generation = getattr(session_cache, 'generation', None)
+            session_exists = Session.objects.filter(
+                user_id=user_id,
+                token_hash=token_hash,
                 is_active=True,
-            )
-        except User.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Пользователь не найден')
+            ).exists()
 
-        return (user, token)
+            if not session_exists:
+                raise authentication_failed(
+                    'session_not_found', 'Сессия не найдена или неактивна'
+                )
+
+            if session_cache is not None:
+                session_cache.add(user_id, token_hash, expires_at, generation)
 
     def authenticate_header(self, request):
         """
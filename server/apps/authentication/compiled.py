@@ -0,0 +1,259 @@
+"""
+Скомпилированные сериализаторы для горячих эндпоинтов чтения.
+
+DRF на каждый ответ создает сериализатор, копирует и привязывает
+поля и для каждого значения проходит get_attribute и
+to_representation. Для чтения это не нужно: набор полей
+сериализатора известен заранее. compile_serializer один раз (при
+первом обращении, когда реестр моделей уже загружен) превращает
+объявленные поля в список (имя, getter, преобразование) и строит
+обычные dict из моделей или из строк ``.values()``.
+
+Результат совпадает с ``serializer.data``. Методы SerializerMethodField
+вызываются у общего экземпляра сериализатора без context.
+Поля, которые нельзя скомпилировать (вложенные сериализаторы,
+source='*', many=True), отключают компиляцию сериализатора -
+он продолжает работать через DRF. Запись (create/update) всегда
+идет через DRF.
+"""
+from collections.abc import Callable
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+
+from server.common.timing import phase
+
+# Значение поля отсутствует - ключ не попадает в ответ (как SkipField в DRF)
+_SKIP = object()
+
+# Поля DRF, чье to_representation не меняет значения из модели
+_IDENTITY_FIELDS = (
+    fields.BooleanField,
+    fields.CharField,
+    fields.IntegerField,
+    fields.ReadOnlyField,
+)
+
+
+class NotCompilable(Exception):  # noqa: N818
+    """Поле сериализатора нельзя скомпилировать."""
+
+
+class CompiledSerializer:
+    """Сериализатор только для чтения, собранный из полей DRF сериализатора."""
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer]):
+        """Сборка по полям serializer_class."""
+        self.serializer_class = serializer_class
+        # Экземпляр нужен для привязанных полей и методов SerializerMethodField
+        self.serializer = serializer_class()
+        model = serializer_class.Meta.model
+        self.fields: list[tuple[str, Callable, Callable | None]] = []
+        values_map = []
+        for field in self.serializer._readable_fields:  # noqa: SLF001
+            getter, values_key = _compile_getter(self.serializer, field, model)
+            convert = _compile_converter(field)
+            self.fields.append((field.field_name, getter, convert))
+            # Поле может брать значение из другого столбца и
+            # преобразовывать его своим from_values (см. PermissionFlagField)
+            values_map.append((
+                field.field_name,
+                getattr(field, 'values_source', values_key),
+                getattr(field, 'from_values', convert),
+            ))
+        values_keys = [key for _, key, _ in values_map]
+        # Поля для .values(), если все значения можно взять из строки
+        self.values_fields = (
+            None if None in values_keys else tuple(dict.fromkeys(values_keys))
+        )
+        self._values_map = tuple(values_map)
+
+    def to_representation(self, instance) -> dict:
+        """Представление модели (как ``serializer.data``)."""
+        data = {}
+        for name, getter, convert in self.fields:
+            value = getter(instance)
+            if value is _SKIP:
+                continue
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def from_values(self, row: dict) -> dict:
+        """Представление строки ``queryset.values(*values_fields)``."""
+        data = {}
+        for name, key, convert in self._values_map:
+            value = row[key]
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def many(self, instances) -> list[dict]:
+        """Представление последовательности моделей."""
+        to_representation = self.to_representation
+        return [to_representation(instance) for instance in instances]
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class) -> CompiledSerializer | None:
+    """
+    Скомпилированная версия сериализатора.
+
+    Args:
+        serializer_class: класс ModelSerializer
+
+    Returns:
+        CompiledSerializer или None, если сериализатор нельзя
+        скомпилировать (тогда используется DRF)
+    """
+    try:
+        return CompiledSerializer(serializer_class)
+    except NotCompilable:
+        return None
+
+
+def _compile_getter(serializer, field, model) -> tuple[Callable, str | None]:
+    """Функция получения значения и ключ поля в строке .values()."""
+    for field_types, resolve in _GETTER_RESOLVERS:
+        if isinstance(field, field_types):
+            return resolve(serializer, field, model)
+    return _source_getter(serializer, field, model)
+
+
+def _source_attrs(field) -> list[str]:
+    """Путь source поля; source='*' не компилируется."""
+    if field.source == '*' or not field.source_attrs:
+        raise NotCompilable(field.field_name)
+    return field.source_attrs
+
+
+def _not_compilable(serializer, field, model):
+    """Поле, которое отдается только через DRF."""
+    raise NotCompilable(field.field_name)
+
+
+def _method_getter(serializer, field, model) -> tuple[Callable, None]:
+    """SerializerMethodField: метод сериализатора."""
+    return getattr(serializer, field.method_name), None
+
+
+def _primary_key_getter(serializer, field, model) -> tuple[Callable, str]:
+    """Внешний ключ: id без загрузки связанного объекта."""
+    attrs = _source_attrs(field)
+    if len(attrs) != 1:
+        raise NotCompilable(field.field_name)
+    try:
+        model_field = model._meta.get_field(attrs[0])  # noqa: SLF001
+    except FieldDoesNotExist:
+        raise NotCompilable(field.field_name) from None
+    attname = model_field.attname
+    return (lambda instance: getattr(instance, attname)), attrs[0]
+
+
+def _source_getter(serializer, field, model) -> tuple[Callable, str | None]:
+    """Атрибут или метод модели по пути source."""
+    attrs = _source_attrs(field)
+    if len(attrs) > 1:
+        return _dotted_getter(attrs), '__'.join(attrs)
+    attr = attrs[0]
+    if callable(getattr(model, attr, None)):
+        # source='get_full_name' - метод модели, в .values() недоступен
+        return (lambda instance: getattr(instance, attr)()), None
+    try:
+        model._meta.get_field(attr)  # noqa: SLF001
+    except FieldDoesNotExist:
+        values_key = None
+    else:
+        values_key = attr
+    return (lambda instance: getattr(instance, attr)), values_key
+
+
+# Getter по типу поля (первое совпадение), иначе _source_getter
+_GETTER_RESOLVERS = (
+    (serializers.SerializerMethodField, _method_getter),
+    # Вложенный сериализатор, менеджер связи (many=True), поле модели
+    (
+        (
+            serializers.BaseSerializer,
+            relations.ManyRelatedField,
+            fields.ModelField,
+        ),
+        _not_compilable,
+    ),
+    (relations.PrimaryKeyRelatedField, _primary_key_getter),
+    (relations.RelatedField, _not_compilable),
+)
+
+
+def _dotted_getter(attrs: list[str]) -> Callable:
+    """Getter для source вида 'role.name'."""
+    def getter(instance):
+        try:
+            for attr in attrs:
+                instance = getattr(instance, attr)
+        except ObjectDoesNotExist:
+            return None
+        except AttributeError:
+            # Промежуточный объект None: DRF пропускает поле только для чтения
+            return _SKIP
+        return instance
+    return getter
+
+
+def _compile_converter(field) -> Callable | None:
+    """Преобразование значения или None, если значение не меняется."""
+    if isinstance(
+        field,
+        (serializers.SerializerMethodField, relations.PrimaryKeyRelatedField),
+    ):
+        return None
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    return field.to_representation
+
+
+class CompiledReadMixin:
+    """
+    list и retrieve ViewSet через скомпилированный serializer_class.
+
+    Атрибуты view:
+        compiled_values (bool): строить список из ``.values()``
+            без создания моделей (если все поля доступны в строке)
+    """
+
+    compiled_values = False
+
+    def list(self, request, *args, **kwargs):
+        """Список с пагинацией без DRF сериализатора."""
+        compiled = compile_serializer(self.get_serializer_class())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        represent = compiled.to_representation
+        if self.compiled_values and compiled.values_fields is not None:
+            queryset = queryset.values(*compiled.values_fields)
+            represent = compiled.from_values
+
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        with phase('serialize'):
+            data = [represent(row) for row in rows]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Объект без DRF сериализатора."""
+        compiled = compile_serializer(self.get_serializer_class())
+        if compiled is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        instance = self.get_object()
+        with phase('serialize'):
+            data = compiled.to_representation(instance)
+        return Response(data)
@@ -0,0 +1,271 @@
+"""
+Движок проверки прав на основе матрицы роль x бизнес-элемент.
+
+Все правила AccessRule загружаются в плотную матрицу: строка - роль,
+столбец - бизнес-элемент, ячейка - 7-битная маска прав. Решение
+сводится к побитовому ИЛИ по ролям пользователя и проверке маски.
+
+Матрица неизменяема. При изменении Role, BusinessElement или AccessRule
+меняется глобальная версия прав, и движок строит новую матрицу,
+атомарно подменяя ссылку на нее. Смена версии доходит до всех воркеров
+через канал инвалидации (см. versions.py), поэтому изменения из админки,
+apply_policy и bulk-upsert применяются везде не позже чем через
+ENGINE_CHECK_INTERVAL.
+"""
+import threading
+import time
+
+from .masks import METHOD_MASKS, OBJECT_METHOD_MASKS
+from .models import AccessRule, BusinessElement, Role
+from .versions import get_config, get_global_version
+
+
+class PermissionMatrix:
+    """Неизменяемый снимок всех правил доступа."""
+
+    __slots__ = (
+        'cells',
+        'element_index',
+        'role_codes',
+        'role_index',
+        'version',
+        'width',
+    )
+
+    def __init__(
+        self,
+        role_codes: dict[int, str],
+        element_codes: dict[int, str],
+        rules,
+        version: str,
+    ):
+        """
+        Построение матрицы.
+
+        Args:
+            role_codes: {ID роли: код роли}
+            element_codes: {ID элемента: код элемента}
+            rules: итерируемое из (role_id, element_id, mask)
+            version: глобальная версия прав, которой соответствует матрица
+        """
+        self.version = version
+        self.role_codes = role_codes
+        self.role_index = {
+            role_id: row for row, role_id in enumerate(role_codes)
+        }
+        element_rows = {
+            element_id: column
+            for column, element_id in enumerate(element_codes)
+        }
+        self.element_index = {
+            code: element_rows[element_id]
+            for element_id, code in element_codes.items()
+        }
+        self.width = len(element_codes)
+        self.cells = bytearray(len(role_codes) * self.width)
+        for role_id, element_id, mask in rules:
+            self.cells[
+                self.role_index[role_id] * self.width + element_rows[element_id]
+            ] = mask
+
+    @classmethod
+    def load(cls, version: str) -> 'PermissionMatrix':
+        """Загрузка матрицы из БД тремя запросами."""
+        return cls(
+            role_codes=dict(Role.objects.values_list('id', 'code')),
+            element_codes=dict(
+                BusinessElement.objects.values_list('id', 'code')
+            ),
+            # Маски хранятся в БД готовыми
+            rules=AccessRule.objects.order_by().values_list(
+                'role_id', 'element_id', 'permissions'
+            ),
+            version=version,
+        )
+
+    def mask(self, role_ids, element_code: str) -> int:
+        """Объединенная маска прав ролей на бизнес-элемент."""
+        column = self.element_index.get(element_code)
+        if column is None:
+            return 0
+        mask = 0
+        for role_id in role_ids:
+            row = self.role_index.get(role_id)
+            if row is not None:
+                mask |= self.cells[row * self.width + column]
+        return mask
+
+    def masks(self, role_ids) -> dict[str, int]:
+        """Ненулевые маски ролей по всем бизнес-элементам."""
+        rows = [
+            self.role_index[role_id]
+            for role_id in role_ids
+            if role_id in self.role_index
+        ]
+        result = {}
+        for code, column in self.element_index.items():
+            mask = 0
+            for row in rows:
+                mask |= self.cells[row * self.width + column]
+            if mask:
+                result[code] = mask
+        return result
+
+    def has_role(self, role_ids, role_code: str) -> bool:
+        """Есть ли среди ролей роль с указанным кодом."""
+        return any(
+            self.role_codes.get(role_id) == role_code for role_id in role_ids
+        )
+
+
+class PermissionEngine:
+    """
+    Точка принятия решений о доступе.
+
+    Глобальная версия прав проверяется не чаще раза в check_interval
+    секунд; изменения в текущем процессе применяются сразу (см. invalidate),
+    в остальных воркерах - при следующей проверке.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        """Снимок проверяется на актуальность раз в check_interval секунд."""
+        self.check_interval = check_interval
+        self._matrix = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self, version: str | None = None) -> PermissionMatrix:
+        """
+        Актуальная матрица прав.
+
+        Args:
+            version: требуемая глобальная версия; если передана,
+                матрица гарантированно ей соответствует
+
+        Returns:
+            PermissionMatrix
+        """
+        matrix = self._matrix
+        if version is None:
+            if (
+                matrix is not None
+                and time.monotonic() - self._checked_at < self.check_interval
+            ):
+                return matrix
+            version = get_global_version()
+            self._checked_at = time.monotonic()
+        if matrix is not None and matrix.version == version:
+            return matrix
+        return self.reload(version)
+
+    def reload(self, version: str | None = None) -> PermissionMatrix:
+        """Построение новой матрицы и атомарная подмена текущей."""
+        with self._lock:
+            if version is None:
+                version = get_global_version()
+            matrix = self._matrix
+            if matrix is None or matrix.version != version:
+                matrix = PermissionMatrix.load(version)
+                self._matrix = matrix
+            self._checked_at = time.monotonic()
+        return matrix
+
+    def invalidate(self) -> None:
+        """Проверить версию при следующем обращении."""
+        self._checked_at = 0.0
+
+    def mask(self, role_ids, element_code: str) -> int:
+        """Объединенная маска прав ролей на бизнес-элемент."""
+        return self.snapshot().mask(role_ids, element_code)
+
+    def has_permission(self, role_ids, element_code: str, method: str) -> bool:
+        """
+        Проверка прав на уровне представления.
+
+        Args:
+            role_ids: ID ролей пользователя
+            element_code: код бизнес-элемента
+            method: HTTP метод
+
+        Returns:
+            True, если есть право на свои или на все объекты
+        """
+        required_mask = METHOD_MASKS.get(method)
+        if not required_mask:
+            return True
+        return bool(self.mask(role_ids, element_code) & required_mask)
+
+    def has_object_permission(
+        self, role_ids, element_code: str, method: str, is_owner: bool
+    ) -> bool:
+        """
+        Проверка прав на конкретный объект.
+
+        Args:
+            role_ids: ID ролей пользователя
+            element_code: код бизнес-элемента
+            method: HTTP метод
+            is_owner: является ли пользователь владельцем объекта
+
+        Returns:
+            True, если есть право на все объекты или на свои и объект свой
+        """
+        owner_masks = OBJECT_METHOD_MASKS.get(method)
+        if not owner_masks:
+            return True
+        own_mask, all_mask = owner_masks
+        mask = self.mask(role_ids, element_code)
+        return bool(mask & all_mask or (is_owner and mask & own_mask))
+
+    def bulk_object_permission(
+        self, role_ids, element_code: str, method: str, owner_ids, user_id: int,
+    ) -> list[bool]:
+        """
+        Проверка прав сразу на много объектов.
+
+        Маска ролей вычисляется один раз, после чего решение по каждому
+        объекту - одно сравнение ID владельца.
+
+        Args:
+            role_ids: ID ролей пользователя
+            element_code: код бизнес-элемента
+            method: HTTP метод
+            owner_ids: ID владельцев объектов
+            user_id: ID пользователя
+
+        Returns:
+            Список флагов доступа в порядке owner_ids
+        """
+        owner_masks = OBJECT_METHOD_MASKS.get(method)
+        if not owner_masks:
+            return [True] * len(owner_ids)
+        own_mask, all_mask = owner_masks
+        mask = self.mask(role_ids, element_code)
+        if mask & all_mask:
+            return [True] * len(owner_ids)
+        if mask & own_mask:
+            return [owner_id == user_id for owner_id in owner_ids]
+        return [False] * len(owner_ids)
+
+    def has_role(self, role_ids, role_code: str) -> bool:
+        """Есть ли среди ролей роль с указанным кодом."""
+        return self.snapshot().has_role(role_ids, role_code)
+
+
+_engine = None
+
+
+def get_engine() -> PermissionEngine:
+    """Движок прав текущего процесса."""
+    global _engine  # noqa: PLW0603
+    if _engine is None:
+        _engine = PermissionEngine(
+            check_interval=get_config()['ENGINE_CHECK_INTERVAL']
+        )
+    return _engine
+
+
+def reset_engine() -> None:
+    """Сброс движка (например, при изменении настроек в тестах)."""
+    global _engine  # noqa: PLW0603
+    _engine = None
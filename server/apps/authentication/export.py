@@ -0,0 +1,230 @@
+"""
+Потоковая выгрузка пользователей, назначений ролей и правил доступа.
+
+Строки читаются серверным курсором (``.iterator(chunk_size=...)``)
+и сразу кодируются в NDJSON или CSV, поэтому память не зависит
+от размера таблиц. Роли пользователей подгружаются одним запросом
+на пачку из chunk_size пользователей, эффективные права считаются
+по одному снимку матрицы движка прав - вся выгрузка соответствует
+одной версии правил.
+
+Используется ExportView (StreamingHttpResponse) и командой
+``export_auth_data``.
+"""
+import csv
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+from server.apps.main.renderers import ORJSONRenderer
+
+from .engine import get_engine
+from .masks import PERMISSION_FIELDS, mask_to_names
+from .models import AccessRule, User, UserRole
+
+# Строк, которые серверный курсор получает за одно обращение
+CHUNK_SIZE = 2000
+# Размер фрагмента ответа: мелкие строки склеиваются перед отправкой
+BUFFER_SIZE = 64 * 1024
+# Начало ячейки, с которого табличные редакторы читают формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+USER_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'middle_name',
+    'is_active', 'is_staff', 'created_at',
+)
+
+
+def export_users(chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Пользователи с ролями и эффективными правами.
+
+    Args:
+        chunk_size: строк за одно обращение к курсору
+
+    Yields:
+        dict: поля USER_FIELDS, roles (коды ролей) и permissions
+            ({код бизнес-элемента: [read, read_all, ...]})
+    """
+    matrix = get_engine().snapshot()
+    # Права зависят только от набора ролей, наборов обычно немного
+    permissions_by_roles: dict[frozenset, dict] = {}
+    users = (
+        User.objects
+        .order_by('id')
+        .values(*USER_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for batch in _batches(users, chunk_size):
+        role_ids: dict[int, set] = {}
+        assignments = UserRole.objects.filter(
+            user_id__in=[user['id'] for user in batch],
+        ).values_list('user_id', 'role_id')
+        for user_id, role_id in assignments:
+            role_ids.setdefault(user_id, set()).add(role_id)
+
+        for user in batch:
+            roles = frozenset(role_ids.get(user['id'], ()))
+            permissions = permissions_by_roles.get(roles)
+            if permissions is None:
+                permissions = {
+                    code: mask_to_names(mask)
+                    for code, mask in sorted(matrix.masks(roles).items())
+                }
+                permissions_by_roles[roles] = permissions
+            user['roles'] = sorted(
+                matrix.role_codes[role_id]
+                for role_id in roles
+                if role_id in matrix.role_codes
+            )
+            user['permissions'] = permissions
+            yield user
+
+
+def export_user_roles(chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Назначения ролей: пользователь, роль, кто и когда назначил."""
+    rows = UserRole.objects.order_by('id').values_list(
+        'user_id',
+        'user__email',
+        'role__code',
+        'assigned_at',
+        'assigned_by__email',
+    )
+    for user_id, email, role, assigned_at, assigned_by in rows.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {
+            'user_id': user_id,
+            'email': email,
+            'role': role,
+            'assigned_at': assigned_at,
+            'assigned_by': assigned_by,
+        }
+
+
+def export_access_rules(chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Правила доступа: коды роли и бизнес-элемента и права."""
+    rows = AccessRule.objects.order_by('id').values_list(
+        'id', 'role__code', 'element__code', 'permissions', 'updated_at',
+    )
+    for rule_id, role, element, mask, updated_at in rows.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {
+            'id': rule_id,
+            'role': role,
+            'element': element,
+            **{
+                field: bool(mask & bit)
+                for field, bit in PERMISSION_FIELDS.items()
+            },
+            'updated_at': updated_at,
+        }
+
+
+# Набор данных: (источник строк, колонки CSV)
+DATASETS: dict[str, tuple[Callable[[int], Iterator[dict]], tuple[str, ...]]] = {
+    'users': (export_users, (*USER_FIELDS, 'roles', 'permissions')),
+    'user-roles': (
+        export_user_roles,
+        ('user_id', 'email', 'role', 'assigned_at', 'assigned_by'),
+    ),
+    'access-rules': (
+        export_access_rules,
+        ('id', 'role', 'element', *PERMISSION_FIELDS, 'updated_at'),
+    ),
+}
+
+
+def stream_export(
+    dataset: str, export_format: str, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Выгрузка набора данных фрагментами не больше BUFFER_SIZE.
+
+    Args:
+        dataset: ключ DATASETS
+        export_format: ключ CONTENT_TYPES
+        chunk_size: строк за одно обращение к курсору
+
+    Returns:
+        Итератор байтовых фрагментов
+    """
+    source, columns = DATASETS[dataset]
+    rows = source(chunk_size)
+    if export_format == 'csv':
+        lines = render_csv(rows, columns)
+    else:
+        lines = render_ndjson(rows)
+    return _buffered(lines)
+
+
+def render_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    """Строка JSON на объект."""
+    renderer = ORJSONRenderer()
+    for row in rows:
+        yield renderer.render(row) + b'\n'
+
+
+def render_csv(
+    rows: Iterable[dict], columns: tuple[str, ...]
+) -> Iterator[bytes]:
+    """
+    CSV с заголовком.
+
+    Списки записываются через ';', права - как
+    ``элемент:право,право;элемент:право``. Строки, начинающиеся
+    с FORMULA_PREFIXES, экранируются апострофом, чтобы табличный
+    редактор не выполнил их как формулу.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns).encode()
+    for row in rows:
+        yield writer.writerow([
+            _csv_value(row[column]) for column in columns
+        ]).encode()
+
+
+def _csv_value(value):
+    if isinstance(value, dict):
+        value = ';'.join(
+            f'{key}:{",".join(names)}' for key, names in value.items()
+        )
+    elif isinstance(value, list):
+        value = ';'.join(value)
+    elif hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class _Echo:
+    """Файлоподобный объект: csv.writer возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _buffered(
+    chunks: Iterable[bytes], size: int = BUFFER_SIZE
+) -> Iterator[bytes]:
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
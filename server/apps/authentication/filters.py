@@ -0,0 +1,45 @@
+"""
+Filter backends для ограничения выборок правами доступа.
+"""
+from rest_framework import filters
+
+from .engine import get_engine
+from .masks import OBJECT_METHOD_MASKS
+from .principal import get_user_principal
+
+
+class ResourcePermissionFilterBackend(filters.BaseFilterBackend):
+    """
+    Ограничение queryset правами на свои и на все объекты.
+
+    Использует атрибуты view, как и HasResourcePermission:
+        resource_code (str): код бизнес-элемента
+        owner_field (str): поле владельца объекта (по умолчанию 'owner')
+
+    Для GET пользователь с read_all получает queryset без изменений,
+    с read - только свои объекты (WHERE owner_id = :uid), без прав -
+    пустой queryset. Для PUT/PATCH/DELETE так же применяются
+    update/update_all и delete/delete_all. Фильтр выполняется в SQL,
+    поэтому списки по большим таблицам используют индекс по владельцу.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """Фильтрация queryset по правам пользователя."""
+        resource_code = getattr(view, 'resource_code', None)
+        owner_masks = OBJECT_METHOD_MASKS.get(request.method)
+        if not resource_code or not owner_masks:
+            return queryset
+
+        if not request.user or not request.user.is_authenticated:
+            return queryset.none()
+
+        own_mask, all_mask = owner_masks
+        principal = get_user_principal(request.user)
+        mask = get_engine().mask(principal.role_ids, resource_code)
+
+        if mask & all_mask:
+            return queryset
+        if mask & own_mask:
+            owner_field = getattr(view, 'owner_field', 'owner')
+            return queryset.filter(**{owner_field: request.user.id})
+        return queryset.none()
@@ -0,0 +1,145 @@
+"""
+Forward auth для обратного прокси
+(Caddy ``forward_auth``, nginx ``auth_request``).
+
+Прокси перед каждым запросом к API отправляет подзапрос на
+FORWARD_AUTH_PATH (по умолчанию /api/auth/check/) с исходными
+методом и URI в заголовках X-Forwarded-Method / X-Forwarded-Uri
+(nginx: X-Original-Method / X-Original-URI). Ответ без тела:
+
+* 204 - запрос можно пропустить, для аутентифицированного
+  пользователя с заголовками X-User-Id и X-Roles;
+* 401 - токен невалиден или отсутствует, а ресурс требует входа;
+  открытые пути (см. resolve_route) пропускаются без проверки токена;
+* 403 - у пользователя нет прав на бизнес-элемент.
+
+Подзапрос перехватывает ForwardAuthMiddleware, стоящий в MIDDLEWARE
+до цепочек PathDispatchMiddleware, поэтому CSRF, сессии, сообщения, CSP, локаль
+и согласование контента DRF для него не выполняются.
+"""
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import exceptions
+from rest_framework.permissions import AllowAny
+
+from .authentication import JWTAuthentication
+from .engine import get_engine
+from .masks import METHOD_MASKS
+from .permissions import record_decision
+
+
+@lru_cache(maxsize=4096)
+def resolve_route(path: str, method: str) -> tuple[str | None, bool]:
+    """
+    Код бизнес-элемента и открытость представления, обслуживающего запрос.
+
+    Открытое представление не требует входа: у него пустые
+    authentication_classes или только AllowAny в permission_classes
+    (JWKS, вход, регистрация, обновление токена). Атрибуты ищутся
+    в порядке: @action метода, аргументы as_view, класс представления.
+
+    Args:
+        path: путь исходного запроса
+        method: метод исходного запроса
+
+    Returns:
+        (resource_code представления или None, если путь не защищен
+        правами на ресурс или не найден; True для открытого представления)
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None, False
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    actions = getattr(func, 'actions', None) or {}
+    handler = getattr(view_class, actions.get(method.lower(), ''), None)
+    sources = (getattr(handler, 'kwargs', {}), getattr(func, 'initkwargs', {}))
+
+    def option(name):
+        for source in sources:
+            if name in source:
+                return source[name]
+        return getattr(view_class, name, None)
+
+    authentication_classes = option('authentication_classes')
+    permission_classes = option('permission_classes')
+    public = authentication_classes is not None and not authentication_classes
+    if permission_classes and not public:
+        public = all(
+            isinstance(permission, type) and issubclass(permission, AllowAny)
+            for permission in permission_classes
+        )
+    return getattr(view_class, 'resource_code', None), public
+
+
+def forward_auth(request) -> HttpResponse:
+    """
+    Решение о доступе для исходного запроса.
+
+    Args:
+        request: подзапрос прокси
+
+    Returns:
+        Пустой ответ 204, 401 или 403
+    """
+    meta = request.META
+    method = (
+        meta.get('HTTP_X_FORWARDED_METHOD')
+        or meta.get('HTTP_X_ORIGINAL_METHOD')
+        or request.method
+    ).upper()
+    uri = (
+        meta.get('HTTP_X_FORWARDED_URI')
+        or meta.get('HTTP_X_ORIGINAL_URI')
+        or '/'
+    )
+    resource_code, public = resolve_route(urlsplit(uri).path, method)
+    if public:
+        # Открытые пути не проверяем: истекший токен в запросе
+        # на вход или обновление токена не должен давать 401
+        return HttpResponse(status=204)
+
+    try:
+        credentials = JWTAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return HttpResponse(status=401)
+
+    if credentials is None:
+        # Анонимные запросы к ресурсам не пропускаем,
+        # остальные пути проверяет само приложение
+        return HttpResponse(status=401 if resource_code else 204)
+
+    principal = credentials[0].principal
+    if resource_code and method in METHOD_MASKS:
+        allowed = bool(principal.role_ids) and get_engine().has_permission(
+            principal.role_ids, resource_code, method,
+        )
+        record_decision(resource_code, method, 'forward_auth', allowed)
+        if not allowed:
+            return HttpResponse(status=403)
+
+    response = HttpResponse(status=204)
+    response['X-User-Id'] = str(principal.user_id)
+    response['X-Roles'] = ','.join(sorted(principal.role_codes))
+    return response
+
+
+class ForwardAuthMiddleware:
+    """Перехват подзапросов прокси до остальных middleware."""
+
+    def __init__(self, get_response):
+        """Путь подзапросов - FORWARD_AUTH_PATH."""
+        self.get_response = get_response
+        self.path = getattr(settings, 'FORWARD_AUTH_PATH', '/api/auth/check/')
+
+    def __call__(self, request):
+        """Подзапрос прокси или обычная обработка запроса."""
+        if request.path_info == self.path:
+            request.metrics_route = 'forward_auth'
+            return forward_auth(request)
+        return self.get_response(request)
@@ -0,0 +1,99 @@
+"""
+Интроспекция токенов в стиле RFC 7662.
+
+Соседние сервисы и API gateway спрашивают, действует ли токен и какие
+у его владельца роли и права. Проверка выполняется тем же
+JWTAuthentication, что и для обычных запросов. Результаты кратко
+хранятся в Django cache по хешу токена, поэтому повторы одного токена
+из разных запросов gateway не повторяют проверку.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+
+from .authentication import JWTAuthentication
+from .masks import mask_to_names
+from .utils import hash_token, verify_token
+
+CACHE_KEY = 'rolegate:introspect:{token_hash}'
+
+DEFAULT_INTROSPECTION = {
+    'ROLES': ['admin'],
+    'BATCH_SIZE': 100,
+    'CACHE_ALIAS': 'default',
+    'CACHE_TTL': 5,  # секунды, 0 - без кеша
+}
+
+
+def get_config() -> dict:
+    """Настройки интроспекции."""
+    return {**DEFAULT_INTROSPECTION, **getattr(settings, 'INTROSPECTION', {})}
+
+
+def introspect_token(token: str) -> dict:
+    """
+    Проверка одного токена.
+
+    Args:
+        token: access токен
+
+    Returns:
+        {'active': False} или {'active': True, 'user_id', 'roles',
+        'permissions': {код элемента: [имена прав]}, 'exp', 'iat'}
+    """
+    try:
+        user, _ = JWTAuthentication().authenticate_credentials(token)
+    except exceptions.AuthenticationFailed:
+        return {'active': False}
+
+    payload, _ = verify_token(token)
+    principal = user.principal
+    return {
+        'active': True,
+        'token_type': 'access',
+        'user_id': user.id,
+        'roles': sorted(principal.role_codes),
+        'permissions': {
+            code: mask_to_names(mask)
+            for code, mask in principal.permissions.items()
+        },
+        'exp': payload['exp'],
+        'iat': payload.get('iat'),
+    }
+
+
+def introspect_tokens(tokens: list[str]) -> list[dict]:
+    """
+    Проверка пачки токенов.
+
+    Кешированные результаты читаются одним get_many, новые
+    записываются одним set_many. Повторы токена в пачке
+    проверяются один раз.
+
+    Args:
+        tokens: access токены
+
+    Returns:
+        Результаты introspect_token в порядке tokens
+    """
+    config = get_config()
+    cache = caches[config['CACHE_ALIAS']] if config['CACHE_TTL'] else None
+    keys = [CACHE_KEY.format(token_hash=hash_token(token)) for token in tokens]
+    results = cache.get_many(keys) if cache is not None else {}
+
+    # Результат, сохраненный до истечения токена, к этому моменту мог устареть
+    now = time.time()
+    results = {
+        key: result for key, result in results.items()
+        if not result['active'] or result['exp'] > now
+    }
+
+    fresh = {}
+    for token, key in zip(tokens, keys, strict=True):
+        if key not in results:
+            results[key] = fresh[key] = introspect_token(token)
+    if fresh and cache is not None:
+        cache.set_many(fresh, timeout=config['CACHE_TTL'])
+    return [results[key] for key in keys]
@@ -0,0 +1,149 @@
+"""
+Набор ключей подписи JWT (key ring).
+
+По умолчанию токены подписываются общим секретом JWT_SECRET_KEY
+(HS256). Если задан JWT_SIGNING_KEYS, токены подписываются
+асимметричными ключами (RS256, EdDSA), а в заголовок токена
+записывается ``kid`` ключа. Публичные ключи публикуются
+в /api/auth/jwks/, и другие сервисы проверяют токены локально.
+
+Ротация: новый ключ добавляется с NOT_BEFORE в будущем. До этого
+момента он только публикуется в JWKS, после - подписывает новые
+токены. Старый ключ остается в списке (можно без PRIVATE_KEY),
+пока не истекут подписанные им токены. Токены без kid, подписанные
+JWT_SECRET_KEY, после перехода отключаются настройкой
+JWT_ACCEPT_SECRET_KEY_TOKENS.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from jwt.algorithms import get_default_algorithms
+
+
+@dataclass(frozen=True, slots=True)
+class SigningKey:
+    """Ключ подписи из JWT_SIGNING_KEYS."""
+
+    kid: str
+    algorithm: str
+    private_key: object | None
+    public_key: object
+    not_before: datetime | None
+
+    def to_jwk(self) -> dict:
+        """Публичная часть ключа в формате JWK."""
+        jwk = get_default_algorithms()[self.algorithm].to_jwk(
+            self.public_key, as_dict=True
+        )
+        return {**jwk, 'kid': self.kid, 'alg': self.algorithm, 'use': 'sig'}
+
+
+def load_signing_key(options: dict) -> SigningKey:
+    """
+    Загрузка ключа из элемента JWT_SIGNING_KEYS.
+
+    Args:
+        options: ключи KID, ALGORITHM, PRIVATE_KEY, PUBLIC_KEY, NOT_BEFORE;
+            PRIVATE_KEY и PUBLIC_KEY - PEM, достаточно одного из них
+
+    Returns:
+        SigningKey
+
+    Raises:
+        ImproperlyConfigured: если ключ задан некорректно
+    """
+    kid = options.get('KID')
+    algorithm = options.get('ALGORITHM', 'RS256')
+    algorithms = get_default_algorithms()
+    if not kid or algorithm not in algorithms or algorithm.startswith('HS'):
+        raise ImproperlyConfigured(
+            f'JWT_SIGNING_KEYS: некорректный ключ {kid!r} ({algorithm})'
+        )
+
+    backend = algorithms[algorithm]
+    private_key = None
+    if options.get('PRIVATE_KEY'):
+        private_key = backend.prepare_key(options['PRIVATE_KEY'])
+        public_key = private_key.public_key()
+    elif options.get('PUBLIC_KEY'):
+        public_key = backend.prepare_key(options['PUBLIC_KEY'])
+    else:
+        raise ImproperlyConfigured(
+            f'JWT_SIGNING_KEYS: для ключа {kid!r} не задан PEM'
+        )
+
+    not_before = options.get('NOT_BEFORE')
+    if isinstance(not_before, str):
+        not_before = parse_datetime(not_before)
+    return SigningKey(kid, algorithm, private_key, public_key, not_before)
+
+
+class KeyRing:
+    """Набор ключей подписи, индексированный по kid."""
+
+    def __init__(self, keys: list[SigningKey]):
+        """Набор из ключей keys."""
+        self.keys = {key.kid: key for key in keys}
+
+    def __bool__(self):
+        """Задан ли хотя бы один ключ."""
+        return bool(self.keys)
+
+    def signing_key(self, now: datetime | None = None) -> SigningKey | None:
+        """
+        Ключ для подписи новых токенов.
+
+        Args:
+            now: момент подписи (по умолчанию - текущее время)
+
+        Returns:
+            Действующий ключ с самым поздним NOT_BEFORE или None
+        """
+        now = now or timezone.now()
+        candidates = [
+            key
+            for key in self.keys.values()
+            if key.private_key is not None
+            and (key.not_before is None or key.not_before <= now)
+        ]
+        if not candidates:
+            return None
+        earliest = datetime.min.replace(tzinfo=now.tzinfo)
+        return max(candidates, key=lambda key: key.not_before or earliest)
+
+    def verification_key(self, kid: str) -> SigningKey | None:
+        """Ключ для проверки токена с указанным kid."""
+        return self.keys.get(kid)
+
+    def jwks(self) -> dict:
+        """Все публичные ключи (включая запланированные) в формате JWKS."""
+        return {'keys': [key.to_jwk() for key in self.keys.values()]}
+
+
+_key_ring = None
+_key_ring_lock = threading.Lock()
+
+
+def get_key_ring() -> KeyRing:
+    """Набор ключей по настройке JWT_SIGNING_KEYS."""
+    global _key_ring  # noqa: PLW0603
+    if _key_ring is None:
+        with _key_ring_lock:
+            if _key_ring is None:
+                _key_ring = KeyRing([
+                    load_signing_key(options)
+                    for options in getattr(settings, 'JWT_SIGNING_KEYS', [])
+                ])
+    return _key_ring
+
+
+def reset_key_ring() -> None:
+    """Сброс набора ключей (например, при изменении настроек в тестах)."""
+    global _key_ring  # noqa: PLW0603
+    with _key_ring_lock:
+        _key_ring = None
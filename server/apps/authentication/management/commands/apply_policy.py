@@ -0,0 +1,69 @@
+"""
+Management команда для применения политики доступа из YAML/JSON.
+
+Сравнивает политику с БД и применяет только разницу (см. policy.py).
+
+Пример:
+    python manage.py apply_policy policy.yaml --dry-run
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...policy import PolicyError, apply_diff, diff_policy, load_policy
+
+
+class Command(BaseCommand):
+    """Команда для применения политики."""
+
+    help = (
+        'Применение декларативной политики ролей, бизнес-элементов '
+        'и правил доступа'
+    )
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            'policy', help='Файл политики (.yaml, .yml или .json)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Только показать изменения'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Удалить роли, элементы и правила, которых нет в политике',
+        )
+
+    def handle(self, *args, **options):
+        """Выполнение команды."""
+        started = time.perf_counter()
+        try:
+            diff = diff_policy(
+                load_policy(options['policy']), prune=options['prune']
+            )
+        except (OSError, PolicyError) as error:
+            raise CommandError(f'Ошибка политики: {error}') from None
+
+        if options['verbosity'] > 1 or options['dry_run']:
+            for line in diff.lines():
+                self.stdout.write(line)
+        counts = ', '.join(
+            f'{name}: {count}' for name, count in diff.counts().items() if count
+        )
+        if not diff:
+            self.stdout.write(self.style.SUCCESS('Изменений нет'))
+        elif options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Пробный запуск, изменения не применены ({counts})'
+                )
+            )
+        else:
+            apply_diff(diff)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Политика применена за '
+                    f'{time.perf_counter() - started:.2f} с ({counts})',
+                )
+            )
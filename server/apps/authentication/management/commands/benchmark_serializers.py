@@ -0,0 +1,126 @@
+"""
+Management команда для сравнения DRF и скомпилированных сериализаторов.
+
+Создает тестовые строки в транзакции, которая затем откатывается,
+загружает их один раз и замеряет только сериализацию: строк в секунду
+для UserSerializer и AccessRuleSerializer в DRF, скомпилированной
+версии из моделей и (для правил) из строк ``.values()``.
+
+Пример:
+    python manage.py benchmark_serializers --rows 2000 --repeat 5
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...compiled import compile_serializer
+from ...models import AccessRule, BusinessElement, Role, User, UserRole
+from ...serializers import AccessRuleSerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    """Команда для замера скорости сериализации."""
+
+    help = 'Сравнение DRF и скомпилированных сериализаторов (строк в секунду)'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--rows', type=int, default=1000, help='Число строк'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3, help='Число повторов'
+        )
+
+    def handle(self, *args, **options):
+        """Выполнение команды."""
+        rows = options['rows']
+        self.repeat = options['repeat']
+
+        with transaction.atomic():
+            self.create_rows(rows)
+            users = list(
+                User.objects.prefetch_related('user_roles__role').order_by(
+                    'id'
+                )[:rows]
+            )
+            rules = list(
+                AccessRule.objects.select_related('role', 'element').order_by(
+                    'id'
+                )[:rows]
+            )
+            compiled_rules = compile_serializer(AccessRuleSerializer)
+            rule_rows = list(
+                AccessRule.objects
+                .values(*compiled_rules.values_fields)
+                .order_by('id')[:rows],
+            )
+            compiled_users = compile_serializer(UserSerializer)
+
+            self.compare('UserSerializer', len(users), [
+                ('DRF', lambda: UserSerializer(users, many=True).data),
+                ('compiled', lambda: compiled_users.many(users)),
+            ])
+            self.compare(
+                'AccessRuleSerializer',
+                len(rules),
+                [
+                    (
+                        'DRF',
+                        lambda: AccessRuleSerializer(rules, many=True).data,
+                    ),
+                    ('compiled', lambda: compiled_rules.many(rules)),
+                    (
+                        'compiled .values()',
+                        lambda: [
+                            compiled_rules.from_values(row) for row in rule_rows
+                        ],
+                    ),
+                ],
+            )
+            transaction.set_rollback(True)
+
+    def create_rows(self, rows):
+        """Роли, элементы, правила и пользователи с ролями."""
+        roles = Role.objects.bulk_create(
+            Role(name=f'Benchmark {number}', code=f'benchmark_{number}')
+            for number in range(10)
+        )
+        elements = BusinessElement.objects.bulk_create(
+            BusinessElement(
+                name=f'Benchmark {number}', code=f'benchmark_{number}'
+            )
+            for number in range(rows // len(roles) + 1)
+        )
+        AccessRule.objects.bulk_create(
+            AccessRule(role=role, element=element, read_permission=True)
+            for element in elements
+            for role in roles
+        )
+        users = User.objects.bulk_create(
+            User(email=f'benchmark{number}@example.com', first_name='Benchmark')
+            for number in range(rows)
+        )
+        UserRole.objects.bulk_create(
+            UserRole(user=user, role=roles[number % len(roles)])
+            for number, user in enumerate(users)
+        )
+
+    def compare(self, name, count, variants):
+        """Замер вариантов сериализации одного набора строк."""
+        self.stdout.write(f'{name}, {count} строк:')
+        baseline = None
+        for label, serialize in variants:
+            best = min(self.measure(serialize) for _ in range(self.repeat))
+            rate = count / best
+            baseline = baseline or rate
+            self.stdout.write(
+                f'  {label}: {rate:,.0f} строк/с (x{rate / baseline:.1f})'
+            )
+
+    def measure(self, serialize):
+        """Время одного прогона."""
+        started = time.perf_counter()
+        serialize()
+        return time.perf_counter() - started
@@ -0,0 +1,367 @@
+"""
+Management команда для массового импорта пользователей из CSV/NDJSON.
+
+Файл читается потоково, пачками по --chunk-size строк. Для пачки
+одним запросом отбрасываются уже существующие email, пароли хешируются
+в пуле процессов (Argon2 - основная стоимость импорта), затем
+пользователи и их роли вставляются двумя bulk_create в одной
+транзакции. После коммита пачки в файл контрольной точки записывается
+число обработанных строк: повторный запуск продолжает с нее.
+
+Колонки (как в выгрузке export_auth_data users):
+    email - обязательна
+    password - пароль в открытом виде, или
+    password_hash - готовый хеш Django (например, argon2$...)
+    first_name, last_name, middle_name, is_active
+    roles - коды ролей (в CSV через ';'); без ролей назначается
+        --default-role
+
+Без пароля и хеша пользователю ставится непригодный пароль.
+
+Пример:
+    python manage.py import_users users.csv --workers 8
+"""
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import connections, transaction
+
+from ...models import Role, User, UserRole
+from ...versions import bump_user_versions
+
+USER_FIELDS = ('first_name', 'last_name', 'middle_name')
+# Не больше стольких ошибок выводится построчно
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    """Команда для импорта пользователей."""
+
+    help = 'Массовый импорт пользователей из CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument('input', help="Файл CSV/NDJSON ('-' - stdin)")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Формат (по умолчанию по расширению)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000, help='Строк в пачке'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Процессов для хеширования паролей (0 - в текущем процессе)',
+        )
+        parser.add_argument(
+            '--default-role', default='user', help='Роль для строк без ролей'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <input>.checkpoint)',
+        )
+
+    def handle(self, *args, **options):
+        """Выполнение команды."""
+        source = options['input']
+        checkpoint = options['checkpoint']
+        if checkpoint is None and source != '-':
+            checkpoint = f'{source}.checkpoint'
+        self.chunk_size = options['chunk_size']
+        self.load_roles(options['default_role'])
+        self.processed = self.read_checkpoint(checkpoint, source)
+        self.created = 0
+        self.skipped = 0
+        self.errors = 0
+        if self.processed:
+            self.stdout.write(
+                'Продолжение с контрольной точки: '
+                f'{self.processed} строк уже обработано'
+            )
+
+        self.import_file(
+            source,
+            options['format'] or guess_format(source),
+            checkpoint,
+            options['workers'],
+        )
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Готово: создано {self.created}, '
+                f'пропущено {self.skipped}, ошибок {self.errors}',
+            )
+        )
+
+    def load_roles(self, default_role):
+        """Коды ролей из БД и роли для строк без ролей."""
+        self.role_ids = dict(Role.objects.values_list('code', 'id'))
+        if default_role and default_role not in self.role_ids:
+            raise CommandError(f'Роль по умолчанию не найдена: {default_role}')
+        self.default_roles = [default_role] if default_role else []
+
+    def import_file(self, source, export_format, checkpoint, workers):
+        """Импорт пачками с контрольной точкой после каждой пачки."""
+        if source == '-':
+            stream = sys.stdin
+        else:
+            stream = open(source, encoding='utf-8', newline='')  # noqa: SIM115
+        executor = self.create_executor(workers)
+        started = time.perf_counter()
+        try:
+            rows = read_rows(stream, export_format)
+            rows = islice(rows, self.processed, None)
+            while chunk := list(islice(rows, self.chunk_size)):
+                self.import_chunk(chunk, executor)
+                self.write_checkpoint(checkpoint, source)
+                self.report(started)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+    def create_executor(self, workers):
+        """Пул процессов для хеширования или None."""
+        self.workers = workers
+        if workers < 1:
+            return None
+        # Дочерние процессы не должны унаследовать открытое соединение с БД
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=workers, initializer=django.setup
+        )
+
+    def import_chunk(self, chunk, executor):
+        """Проверка, хеширование и вставка одной пачки."""
+        first_line = self.processed + 1
+        self.processed += len(chunk)
+
+        users = {}
+        for line, row in enumerate(chunk, start=first_line):
+            try:
+                email, user = self.parse_row(row)
+            except ValidationError as error:
+                self.error(line, '; '.join(error.messages))
+                continue
+            if email in users:
+                self.error(line, f'повтор email в пачке: {email}')
+                continue
+            users[email] = user
+
+        existing = set(
+            User.objects.filter(email__in=list(users)).values_list(
+                'email', flat=True
+            )
+        )
+        self.skipped += len(existing)
+        users = {
+            email: user
+            for email, user in users.items()
+            if email not in existing
+        }
+        if not users:
+            return
+
+        # Готовые хеши (password_hash) используются как есть
+        self.hash_passwords(
+            [user for user in users.values() if not user['password']], executor
+        )
+
+        with transaction.atomic():
+            created = User.objects.bulk_create(
+                User(
+                    email=email,
+                    **{
+                        field: user[field]
+                        for field in (*USER_FIELDS, 'is_active', 'password')
+                    },
+                )
+                for email, user in users.items()
+            )
+            UserRole.objects.bulk_create(
+                UserRole(user_id=instance.pk, role_id=self.role_ids[code])
+                for instance, user in zip(created, users.values(), strict=True)
+                for code in user['roles']
+            )
+            # Новым пользователям не достаются снимки прав с теми же ID
+            bump_user_versions([instance.pk for instance in created])
+        self.created += len(created)
+
+    def parse_row(self, row):
+        """Поля пользователя из строки файла (см. COLUMNS)."""
+        if isinstance(row, ValidationError):
+            # Строка, которую не удалось прочитать (см. read_rows)
+            raise row
+        if not isinstance(row, dict):
+            raise ValidationError('строка должна быть JSON объектом')
+        user = {
+            column: clean(row.get(column), column)
+            for column, clean in COLUMNS.items()
+        }
+        user['roles'] = self.resolve_roles(user['roles'])
+        # Готовый хеш записывается как есть, пароль хешируется при вставке
+        user['raw_password'] = user.pop('password') or None
+        user['password'] = user.pop('password_hash')
+        return user.pop('email'), user
+
+    def resolve_roles(self, roles):
+        """Коды ролей строки или роли по умолчанию."""
+        roles = list(dict.fromkeys(roles)) or self.default_roles
+        unknown = [code for code in roles if code not in self.role_ids]
+        if unknown:
+            raise ValidationError(f'неизвестные роли: {", ".join(unknown)}')
+        return roles
+
+    def hash_passwords(self, users, executor):
+        """Хеширование паролей пачки (в пуле процессов, если он есть)."""
+        passwords = [user['raw_password'] for user in users]
+        if executor is None:
+            hashes = map(make_password, passwords)
+        else:
+            # Несколько заданий на процесс: меньше накладных расходов
+            # на передачу
+            chunksize = max(1, len(passwords) // (self.workers * 4))
+            hashes = executor.map(make_password, passwords, chunksize=chunksize)
+        for user, password_hash in zip(users, hashes, strict=True):
+            user['password'] = password_hash
+
+    def error(self, line, message):
+        """Учет и вывод ошибки строки."""
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Строка {line}: {message}')
+
+    def report(self, started):
+        """Прогресс и скорость импорта."""
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Обработано {self.processed}: создано {self.created}, '
+            f'пропущено {self.skipped}, ошибок {self.errors}, '
+            f'{self.created / elapsed:,.0f} пользователей/с',
+        )
+
+    def read_checkpoint(self, checkpoint, source):
+        """Число строк, обработанных прошлым запуском."""
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('input') != os.path.abspath(source):
+            raise CommandError(
+                f'Контрольная точка {checkpoint} относится к другому файлу'
+            )
+        return state['processed']
+
+    def write_checkpoint(self, checkpoint, source):
+        """Атомарная запись контрольной точки после коммита пачки."""
+        if not checkpoint:
+            return
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(
+                {'input': os.path.abspath(source), 'processed': self.processed},
+                file,
+            )
+        os.replace(temporary, checkpoint)
+
+
+def guess_format(source):
+    """Формат файла по расширению."""
+    return 'ndjson' if source.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def clean_string(value, column):
+    """Строковая колонка; пустое значение - ''."""
+    value = value or ''
+    if not isinstance(value, str):
+        raise ValidationError(f'{column} должен быть строкой')
+    return value
+
+
+def clean_email(value, column):
+    """Нормализованный и проверенный email."""
+    email = User.objects.normalize_email(clean_string(value, column).strip())
+    validate_email(email)
+    return email
+
+
+def clean_password_hash(value, column):
+    """Готовый хеш Django в известном формате."""
+    password_hash = clean_string(value, column)
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            raise ValidationError('неизвестный формат password_hash') from None
+    return password_hash
+
+
+def clean_roles(value, column):
+    """Коды ролей: список или строка через ';'."""
+    if isinstance(value, str):
+        return [code for code in value.split(';') if code]
+    roles = value or []
+    if not isinstance(roles, list) or not all(
+        isinstance(code, str) for code in roles
+    ):
+        raise ValidationError(f'{column} должен быть списком кодов ролей')
+    return roles
+
+
+def clean_is_active(value, column):
+    """Активность; без колонки пользователь активен."""
+    return True if value is None else parse_bool(value)
+
+
+# Проверка и нормализация колонок: колонка -> функция(значение, колонка)
+COLUMNS = {
+    'email': clean_email,
+    'password': clean_string,
+    'password_hash': clean_password_hash,
+    **dict.fromkeys(USER_FIELDS, clean_string),
+    'is_active': clean_is_active,
+    'roles': clean_roles,
+}
+
+
+def read_rows(stream, export_format):
+    """
+    Строки файла в виде dict.
+
+    Вместо строки NDJSON, которую не удалось разобрать, возвращается
+    ValidationError: ошибка учитывается для этой строки, импорт
+    остальных продолжается.
+    """
+    if export_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                row = ValidationError(f'некорректный JSON: {error}')
+            yield row
+
+
+def parse_bool(value):
+    """Булево значение из CSV ('True', 'false', '1', ...) или JSON."""
+    if isinstance(value, str):
+        return value.strip().lower() not in {'', '0', 'false', 'no'}
+    return bool(value)
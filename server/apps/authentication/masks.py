@@ -0,0 +1,82 @@
+"""
+Битовые маски прав доступа правил AccessRule.
+
+Каждое из семи булевых прав правила соответствует одному биту,
+поэтому права роли на бизнес-элемент помещаются в 7-битную маску,
+а права нескольких ролей объединяются побитовым ИЛИ.
+"""
+READ = 1 << 0
+READ_ALL = 1 << 1
+CREATE = 1 << 2
+UPDATE = 1 << 3
+UPDATE_ALL = 1 << 4
+DELETE = 1 << 5
+DELETE_ALL = 1 << 6
+
+ALL_PERMISSIONS = (
+    READ | READ_ALL | CREATE | UPDATE | UPDATE_ALL | DELETE | DELETE_ALL
+)
+
+# Поля модели AccessRule и соответствующие им биты (порядок важен)
+PERMISSION_FIELDS = {
+    'read_permission': READ,
+    'read_all_permission': READ_ALL,
+    'create_permission': CREATE,
+    'update_permission': UPDATE,
+    'update_all_permission': UPDATE_ALL,
+    'delete_permission': DELETE,
+    'delete_all_permission': DELETE_ALL,
+}
+
+# Короткие имена прав (read, read_all, ...) и соответствующие им биты
+PERMISSION_NAMES = {
+    field.removesuffix('_permission'): bit
+    for field, bit in PERMISSION_FIELDS.items()
+}
+
+# Права, достаточные для доступа к ресурсу на уровне представления
+METHOD_MASKS = {
+    'GET': READ_ALL | READ,
+    'POST': CREATE,
+    'PUT': UPDATE_ALL | UPDATE,
+    'PATCH': UPDATE_ALL | UPDATE,
+    'DELETE': DELETE_ALL | DELETE,
+}
+
+# Права на объект: (право на свои объекты, право на все объекты)
+OBJECT_METHOD_MASKS = {
+    'GET': (READ, READ_ALL),
+    'PUT': (UPDATE, UPDATE_ALL),
+    'PATCH': (UPDATE, UPDATE_ALL),
+    'DELETE': (DELETE, DELETE_ALL),
+}
+
+
+def flags_to_mask(**flags: bool) -> int:
+    """
+    Сборка маски из булевых прав.
+
+    Args:
+        flags: права в виде read_permission=True, ...
+
+    Returns:
+        Битовая маска
+    """
+    mask = 0
+    for field, bit in PERMISSION_FIELDS.items():
+        if flags.get(field):
+            mask |= bit
+    return mask
+
+
+def mask_to_names(mask: int) -> list[str]:
+    """
+    Разбор маски на короткие имена прав.
+
+    Args:
+        mask: битовая маска
+
+    Returns:
+        Имена прав в порядке PERMISSION_FIELDS
+    """
+    return [name for name, bit in PERMISSION_NAMES.items() if mask & bit]
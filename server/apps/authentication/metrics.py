@@ -0,0 +1,44 @@
+"""
+Метрики аутентификации, проверки прав и процессных кешей.
+"""
+from server.common.metrics import Counter, registry
+
+from .principal import get_principal_cache_stats
+from .session_cache import get_session_cache
+from .utils import get_verified_token_cache
+
+AUTHENTICATIONS = Counter(
+    'rolegate_authentication_total',
+    'Результаты аутентификации по JWT',
+    ['outcome'],
+)
+PERMISSION_DECISIONS = Counter(
+    'rolegate_permission_decisions_total',
+    'Решения HasResourcePermission по бизнес-элементам',
+    ['resource', 'method', 'scope', 'decision'],
+)
+CACHE_REQUESTS = Counter(
+    'rolegate_cache_requests_total',
+    'Обращения к процессным кешам (hit/miss)',
+    ['cache', 'result'],
+)
+
+
+def collect_cache_stats() -> None:
+    """Перенос счетчиков попаданий кешей в CACHE_REQUESTS."""
+    caches = {
+        'verified_tokens': get_verified_token_cache(),
+        'sessions': get_session_cache(),
+    }
+    stats = {
+        name: cache.stats()
+        for name, cache in caches.items()
+        if cache is not None
+    }
+    stats['principals'] = get_principal_cache_stats()
+    for name, cache_stats in stats.items():
+        CACHE_REQUESTS.set(cache_stats['hits'], cache=name, result='hit')
+        CACHE_REQUESTS.set(cache_stats['misses'], cache=name, result='miss')
+
+
+registry.register_collector(collect_cache_stats)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessrule',
+            index=models.Index(fields=['created_at', 'id'], name='access_rules_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['created_at', 'id'], name='sessions_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='users_created_at_id_idx'),
+        ),
+    ]
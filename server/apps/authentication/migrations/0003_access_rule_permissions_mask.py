@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-17 01:21
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import GreaterThan
+
+# Биты прав (masks.py), зафиксированные на момент миграции
+PERMISSION_BITS = {
+    'read_permission': 1 << 0,
+    'read_all_permission': 1 << 1,
+    'create_permission': 1 << 2,
+    'update_permission': 1 << 3,
+    'update_all_permission': 1 << 4,
+    'delete_permission': 1 << 5,
+    'delete_all_permission': 1 << 6,
+}
+
+
+def flags_to_mask(apps, schema_editor):
+    """Маска из булевых полей одним UPDATE."""
+    AccessRule = apps.get_model('authentication', 'AccessRule')
+    mask = Value(0)
+    for field, bit in PERMISSION_BITS.items():
+        mask += Case(When(**{field: True}, then=Value(bit)), default=Value(0))
+    AccessRule.objects.update(permissions=mask)
+
+
+def mask_to_flags(apps, schema_editor):
+    """Булевы поля из маски одним UPDATE."""
+    AccessRule = apps.get_model('authentication', 'AccessRule')
+    AccessRule.objects.update(**{
+        field: Case(
+            When(GreaterThan(F('permissions').bitand(bit), 0), then=Value(True)),
+            default=Value(False),
+        )
+        for field, bit in PERMISSION_BITS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrule',
+            name='permissions',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Битовая маска прав: чтение, создание, обновление, удаление своих и всех объектов', verbose_name='Права'),
+        ),
+        migrations.RunPython(flags_to_mask, mask_to_flags),
+    ]
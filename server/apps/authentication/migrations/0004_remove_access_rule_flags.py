@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 01:22
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_access_rule_permissions_mask'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='create_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='delete_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='delete_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='read_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='read_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='update_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='update_permission',
+        ),
+    ]
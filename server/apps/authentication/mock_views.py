@@ -51,6 +51,10 @@ class MockProductViewSet(viewsets.ViewSet):
         GET /api/mock/products/
         """
         # В реальном приложении здесь была бы фильтрация на основе прав
+        # Права на редактирование вычисляются для всего списка за один проход
+        can_edit = HasResourcePermission().has_bulk_object_permission(
+            request, self, MOCK_PRODUCTS, method='PUT',
+        )
         products_data = [
             {
                 'id': p.id,
@@ -58,8 +62,9 @@ class MockProductViewSet(viewsets.ViewSet):
                 'price': p.price,
                 'owner_id': p.owner,
                 'is_mine': p.owner == request.user.id,
+                'can_edit': editable,
             }
-            for p in MOCK_PRODUCTS
+            for p, editable in zip(MOCK_PRODUCTS, can_edit, strict=True)
         ]
 
         return Response({
@@ -199,11 +204,12 @@ class MockProductViewSet(viewsets.ViewSet):
 
     def check_object_permission(self, request, obj):
         """Проверка прав на уровне объекта."""
-        for permission in self.permission_classes:
-            perm = permission()
-            if hasattr(perm, 'has_object_permission'):
-                if not perm.has_object_permission(request, self, obj):
-                    return False
+        # Экземпляры permission классов создаются один раз на запрос
+        if not hasattr(self, '_permissions'):
+            self._permissions = self.get_permissions()
+        for permission in self._permissions:
+            if not permission.has_object_permission(request, self, obj):
+                return False
         return True
 
 
@@ -3,8 +3,11 @@
 """
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
+from . import masks
+
 
 class CustomUserManager(BaseUserManager):
     """Менеджер для кастомной модели пользователя."""
@@ -87,6 +90,12 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['-created_at']
+        indexes = [
+            # Пагинация по курсору (created_at, id)
+            models.Index(
+                fields=['created_at', 'id'], name='users_created_at_id_idx'
+            ),
+        ]
 
     def __str__(self):
         """Строковое представление пользователя."""
@@ -192,6 +201,41 @@ class BusinessElement(models.Model):
         return self.name
 
 
+def _permission_flag(bit: int, verbose_name: str) -> property:
+    """Булево право AccessRule, хранящееся битом в поле permissions."""
+    def getter(self) -> bool:
+        return bool(self.permissions & bit)
+
+    def setter(self, value: bool) -> None:
+        self.permissions = (
+            self.permissions | bit if value else self.permissions & ~bit
+        )
+
+    getter.short_description = verbose_name
+    return property(getter, setter, doc=verbose_name)
+
+
+class AccessRuleQuerySet(models.QuerySet):
+    """
+    Побитовые фильтры правил доступа.
+
+    Пример - роли, которые могут обновлять все заказы:
+        AccessRule.objects.granting(UPDATE_ALL).filter(element__code='orders')
+    """
+
+    def granting(self, mask: int) -> 'AccessRuleQuerySet':
+        """Правила, в которых есть все права из маски."""
+        return self.alias(_granted=F('permissions').bitand(mask)).filter(
+            _granted=mask
+        )
+
+    def granting_any(self, mask: int) -> 'AccessRuleQuerySet':
+        """Правила, в которых есть хотя бы одно право из маски."""
+        return self.alias(_granted=F('permissions').bitand(mask)).filter(
+            _granted__gt=0
+        )
+
+
 class AccessRule(models.Model):
     """Правило доступа роли к бизнес-элементу."""
 
@@ -210,43 +254,37 @@ class AccessRule(models.Model):
         db_index=True,
     )
 
-    # Права доступа
-    read_permission = models.BooleanField(
-        'Чтение своих объектов',
-        default=False,
-        help_text='Может читать объекты, которые создал сам',
+    # Права доступа: битовая маска (биты - в masks.py)
+    permissions = models.PositiveSmallIntegerField(
+        'Права',
+        default=0,
+        help_text=(
+            'Битовая маска прав: чтение, создание, обновление, удаление '
+            'своих и всех объектов'
+        ),
     )
-    read_all_permission = models.BooleanField(
-        'Чтение всех объектов',
-        default=False,
-        help_text='Может читать все объекты',
+
+    # Булевы права поверх маски (совместимость API, админки и фикстур)
+    read_permission = _permission_flag(masks.READ, 'Чтение своих объектов')
+    read_all_permission = _permission_flag(
+        masks.READ_ALL, 'Чтение всех объектов'
     )
-    create_permission = models.BooleanField(
-        'Создание',
-        default=False,
-        help_text='Может создавать новые объекты',
+    create_permission = _permission_flag(masks.CREATE, 'Создание')
+    update_permission = _permission_flag(
+        masks.UPDATE, 'Обновление своих объектов'
     )
-    update_permission = models.BooleanField(
-        'Обновление своих объектов',
-        default=False,
-        help_text='Может обновлять объекты, которые создал сам',
+    update_all_permission = _permission_flag(
+        masks.UPDATE_ALL, 'Обновление всех объектов'
     )
-    update_all_permission = models.BooleanField(
-        'Обновление всех объектов',
-        default=False,
-        help_text='Может обновлять все объекты',
+    delete_permission = _permission_flag(
+        masks.DELETE, 'Удаление своих объектов'
     )
-    delete_permission = models.BooleanField(
-        'Удаление своих объектов',
-        default=False,
-        help_text='Может удалять объекты, которые создал сам',
-    )
-    delete_all_permission = models.BooleanField(
-        'Удаление всех объектов',
-        default=False,
-        help_text='Может удалять все объекты',
+    delete_all_permission = _permission_flag(
+        masks.DELETE_ALL, 'Удаление всех объектов'
     )
 
+    objects = AccessRuleQuerySet.as_manager()
+
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
 
@@ -255,6 +293,12 @@ class AccessRule(models.Model):
         verbose_name = 'Правило доступа'
         verbose_name_plural = 'Правила доступа'
         ordering = ['role', 'element']
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                name='access_rules_created_at_id_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['role', 'element'],
@@ -310,6 +354,9 @@ class Session(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['token_hash', 'is_active']),
+            models.Index(
+                fields=['created_at', 'id'], name='sessions_created_at_id_idx'
+            ),
         ]
 
     def __str__(self):
@@ -1,10 +1,17 @@
 """
 Permissions для проверки прав доступа к ресурсам.
 """
+from django.db.models import QuerySet
 from rest_framework import permissions
-from django.core.exceptions import ObjectDoesNotExist
 
-from .models import AccessRule, BusinessElement
+from server.common.metrics import method_label
+from server.common.timing import timed
+
+from .engine import get_engine
+from .introspection import get_config as get_introspection_config
+from .masks import METHOD_MASKS
+from .metrics import PERMISSION_DECISIONS
+from .principal import get_user_principal
 
 
 class IsAuthenticated(permissions.BasePermission):
@@ -21,11 +28,16 @@ class HasResourcePermission(permissions.BasePermission):
     """
     Проверка прав доступа к ресурсу на основе системы access_rules.
     
+    Роли берутся из снимка Principal, прикрепленного к request.user,
+    решение принимает движок прав (матрица роль x элемент в памяти),
+    поэтому проверка не выполняет запросов к БД.
+
     Атрибуты view:
         resource_code (str): код бизнес-элемента (например, 'products')
         owner_field (str): название поля владельца объекта (по умолчанию 'owner')
     """
     
+    @timed('permissions')
     def has_permission(self, request, view):
         """Проверка прав на уровне представления."""
         # Проверяем аутентификацию
@@ -40,110 +52,155 @@ class HasResourcePermission(permissions.BasePermission):
             # (можно изменить на запрет по умолчанию)
             return True
         
-        # Определяем требуемое право в зависимости от метода
-        method_permissions = {
-            'GET': ('read_all_permission', 'read_permission'),
-            'POST': ('create_permission',),
-            'PUT': ('update_all_permission', 'update_permission'),
-            'PATCH': ('update_all_permission', 'update_permission'),
-            'DELETE': ('delete_all_permission', 'delete_permission'),
-        }
-        
-        required_permissions = method_permissions.get(request.method, ())
-        if not required_permissions:
+        # Методы без требуемых прав не проверяем
+        if request.method not in METHOD_MASKS:
             return True
         
-        # Получаем все роли пользователя
-        user_roles = request.user.user_roles.select_related('role').all()
-        role_ids = [ur.role_id for ur in user_roles]
-        
-        if not role_ids:
+        principal = get_user_principal(request.user)
+        if not principal.role_ids:
             self.message = 'У пользователя нет ролей'
+            record_decision(resource_code, request.method, 'view', False)
             return False
         
-        # Получаем бизнес-элемент
-        try:
-            element = BusinessElement.objects.get(code=resource_code)
-        except ObjectDoesNotExist:
-            self.message = f'Ресурс {resource_code} не найден'
-            return False
-        
-        # Получаем правила доступа для ролей пользователя
-        access_rules = AccessRule.objects.filter(
-            role_id__in=role_ids,
-            element=element,
-        )
-        
         # Проверяем наличие хотя бы одного подходящего права
-        for rule in access_rules:
-            for perm in required_permissions:
-                if getattr(rule, perm, False):
-                    # Сохраняем информацию о правах для has_object_permission
-                    request.access_rules = access_rules
-                    request.resource_element = element
-                    return True
+        if get_engine().has_permission(
+            principal.role_ids, resource_code, request.method
+        ):
+            record_decision(resource_code, request.method, 'view', True)
+            return True
         
         self.message = 'Недостаточно прав для выполнения операции'
+        record_decision(resource_code, request.method, 'view', False)
         return False
     
+    @timed('permissions')
     def has_object_permission(self, request, view, obj):
         """Проверка прав на уровне объекта."""
         # Для GET списка не проверяем объект
         if request.method == 'GET' and not hasattr(view, 'get_object'):
             return True
         
-        # Получаем правила доступа из request (установлены в has_permission)
-        access_rules = getattr(request, 'access_rules', None)
-        if not access_rules:
+        resource_code = getattr(view, 'resource_code', None)
+        if not resource_code:
             return False
         
-        # Определяем права для проверки владельца
-        method_owner_permissions = {
-            'GET': ('read_permission', 'read_all_permission'),
-            'PUT': ('update_permission', 'update_all_permission'),
-            'PATCH': ('update_permission', 'update_all_permission'),
-            'DELETE': ('delete_permission', 'delete_all_permission'),
-        }
-        
-        owner_permissions = method_owner_permissions.get(request.method, ())
-        if not owner_permissions:
-            return True
-        
-        # Получаем поле владельца
-        owner_field = getattr(view, 'owner_field', 'owner')
-        
         # Проверяем, является ли пользователь владельцем объекта
-        is_owner = False
-        if hasattr(obj, owner_field):
-            owner = getattr(obj, owner_field)
-            # Владелец может быть объектом User или просто ID
-            if hasattr(owner, 'id'):
-                is_owner = owner.id == request.user.id
-            else:
-                is_owner = owner == request.user.id
+        owner_field = getattr(view, 'owner_field', 'owner')
+        is_owner = get_owner_id(obj, owner_field) == request.user.id
         
-        # Проверяем права
-        for rule in access_rules:
-            # Если пользователь владелец, проверяем "обычные" права
-            if is_owner and getattr(rule, owner_permissions[0], False):
-                return True
-            # Проверяем "все" права
-            if getattr(rule, owner_permissions[1], False):
-                return True
+        principal = get_user_principal(request.user)
+        if get_engine().has_object_permission(
+            principal.role_ids, resource_code, request.method, is_owner,
+        ):
+            record_decision(resource_code, request.method, 'object', True)
+            return True
         
         self.message = 'Недостаточно прав для доступа к объекту'
+        record_decision(resource_code, request.method, 'object', False)
         return False
 
+    @timed('permissions')
+    def has_bulk_object_permission(
+        self, request, view, objects=None, owner_ids=None, method=None
+    ):
+        """
+        Проверка прав сразу на много объектов.
+
+        Args:
+            request: HTTP запрос
+            view: view с resource_code и owner_field
+            objects: последовательность объектов или queryset
+            owner_ids: ID владельцев (вместо objects)
+            method: HTTP метод, для которого проверяются права
+                (по умолчанию метод запроса, например 'PUT' для can_edit)
+
+        Returns:
+            Список флагов доступа в порядке объектов
+        """
+        if owner_ids is None:
+            owner_ids = get_owner_ids(
+                objects, getattr(view, 'owner_field', 'owner')
+            )
+
+        resource_code = getattr(view, 'resource_code', None)
+        if not resource_code:
+            return [False] * len(owner_ids)
+
+        principal = get_user_principal(request.user)
+        return get_engine().bulk_object_permission(
+            principal.role_ids,
+            resource_code,
+            method or request.method,
+            owner_ids,
+            request.user.id,
+        )
+
+
+def record_decision(resource_code, method, scope, allowed):
+    """Учет решения в метрике rolegate_permission_decisions_total."""
+    PERMISSION_DECISIONS.inc(
+        resource=resource_code,
+        method=method_label(method),
+        scope=scope,
+        decision='allow' if allowed else 'deny',
+    )
+
+
+def get_owner_id(obj, owner_field):
+    """
+    ID владельца объекта.
+
+    Владелец может быть объектом User или просто ID,
+    а сам объект - моделью, mock объектом или словарем.
+    """
+    if isinstance(obj, dict):
+        owner = obj.get(owner_field)
+    else:
+        owner = getattr(obj, owner_field, None)
+    return getattr(owner, 'id', owner)
+
+
+def get_owner_ids(objects, owner_field):
+    """
+    ID владельцев объектов.
+
+    Для queryset выбирается только столбец владельца, без создания моделей.
+    """
+    if isinstance(objects, QuerySet):
+        return list(objects.values_list(owner_field, flat=True))
+    return [get_owner_id(obj, owner_field) for obj in objects]
+
 
 class IsAdminRole(permissions.BasePermission):
     """Проверка, что пользователь имеет роль администратора."""
     
     message = 'Требуются права администратора'
     
+    @timed('permissions')
     def has_permission(self, request, view):
         """Проверка прав на уровне представления."""
         if not request.user or not request.user.is_authenticated:
             return False
         
         # Проверяем наличие роли admin
-        return request.user.user_roles.filter(role__code='admin').exists()
+        principal = get_user_principal(request.user)
+        return get_engine().has_role(principal.role_ids, 'admin')
+
+
+class IsIntrospectionClient(permissions.BasePermission):
+    """Проверка, что пользователь может выполнять интроспекцию токенов."""
+
+    message = 'Недостаточно прав для интроспекции токенов'
+
+    @timed('permissions')
+    def has_permission(self, request, view):
+        """Наличие одной из ролей INTROSPECTION['ROLES']."""
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        principal = get_user_principal(request.user)
+        engine = get_engine()
+        return any(
+            engine.has_role(principal.role_ids, role_code)
+            for role_code in get_introspection_config()['ROLES']
+        )
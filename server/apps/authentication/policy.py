@@ -0,0 +1,406 @@
+"""
+Декларативные политики доступа: роли, бизнес-элементы и правила.
+
+Политика описывается в YAML или JSON:
+
+    roles:
+      - {code: manager, name: Менеджер, description: ...}
+    elements:
+      - {code: products, name: Продукты}
+    rules:
+      manager:
+        products: [read_all, create, update_all, delete]
+
+Права правила - короткие имена из masks.PERMISSION_NAMES, пустой
+список - правило без прав. Блок роли в rules описывает все ее
+правила: правила роли на элементы, не указанные в блоке, удаляются.
+Роли и элементы, которых нет в политике, и правила ролей без блока
+в rules удаляются только с prune=True.
+
+diff_policy загружает текущее состояние тремя запросами и строит
+PolicyDiff, apply_diff применяет его через bulk_create, bulk_update
+и удаление QuerySet в одной транзакции с одной сменой версии прав.
+Неизмененная политика не приводит ни к одной записи.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.db import transaction
+
+from .engine import get_engine
+from .masks import PERMISSION_NAMES, mask_to_names
+from .models import AccessRule, BusinessElement, Role
+from .versions import bump_global_version, deferred_bumps
+
+# Изменяемые поля ролей и бизнес-элементов
+ENTITY_FIELDS = ('name', 'description')
+# Записей в одном запросе bulk_create / bulk_update
+BATCH_SIZE = 2000
+
+
+class PolicyError(ValueError):
+    """Некорректный файл политики."""
+
+
+@dataclass
+class PolicyDiff:
+    """Разница между политикой и текущим состоянием БД."""
+
+    # code -> значения ENTITY_FIELDS
+    create_roles: dict[str, dict] = field(default_factory=dict)
+    update_roles: dict[str, dict] = field(default_factory=dict)
+    delete_roles: list[str] = field(default_factory=list)
+    create_elements: dict[str, dict] = field(default_factory=dict)
+    update_elements: dict[str, dict] = field(default_factory=dict)
+    delete_elements: list[str] = field(default_factory=list)
+    # (код роли, код элемента) -> маска прав
+    create_rules: dict[tuple[str, str], int] = field(default_factory=dict)
+    # (код роли, код элемента) -> (ID правила, старая маска, новая маска)
+    update_rules: dict[tuple[str, str], tuple[int, int, int]] = field(
+        default_factory=dict
+    )
+    # (код роли, код элемента) -> ID правила
+    delete_rules: dict[tuple[str, str], int] = field(default_factory=dict)
+
+    def __bool__(self):
+        """Есть ли изменения."""
+        return any(getattr(self, name) for name in self.__dataclass_fields__)
+
+    def counts(self) -> dict[str, int]:
+        """Число изменений по видам."""
+        return {
+            name: len(getattr(self, name)) for name in self.__dataclass_fields__
+        }
+
+    def lines(self) -> list[str]:
+        """Изменения в читаемом виде (+ создание, ~ изменение, - удаление)."""
+        lines = []
+        for kind in ('role', 'element'):
+            for code, values in getattr(self, f'create_{kind}s').items():
+                lines.append(f'+ {kind} {code} ({values["name"]})')
+            for code, values in getattr(self, f'update_{kind}s').items():
+                changes = ', '.join(
+                    f'{name}={value!r}' for name, value in values.items()
+                )
+                lines.append(f'~ {kind} {code}: {changes}')
+            lines.extend(
+                f'- {kind} {code}' for code in getattr(self, f'delete_{kind}s')
+            )
+        for (role, element), mask in self.create_rules.items():
+            lines.append(f'+ rule {role}/{element}: {_names(mask)}')
+        for (role, element), (
+            _,
+            old_mask,
+            new_mask,
+        ) in self.update_rules.items():
+            lines.append(
+                f'~ rule {role}/{element}: '
+                f'{_names(old_mask)} -> {_names(new_mask)}'
+            )
+        lines.extend(
+            f'- rule {role}/{element}' for role, element in self.delete_rules
+        )
+        return lines
+
+
+def load_policy(path) -> dict:
+    """
+    Чтение и проверка файла политики.
+
+    Args:
+        path: путь к .yaml/.yml или .json
+
+    Returns:
+        dict с ключами roles, elements ({code: поля}) и rules
+        ({код роли: {код элемента: маска}})
+
+    Raises:
+        PolicyError: файл не соответствует формату
+    """
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix in {'.yaml', '.yml'}:
+        import yaml  # noqa: PLC0415 - нужен только для YAML
+
+        # C-загрузчик быстрее на порядок, если PyYAML собран с libyaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        try:
+            data = yaml.load(text, Loader=loader)  # noqa: S506
+        except yaml.YAMLError as error:
+            raise PolicyError(str(error)) from None
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as error:
+            raise PolicyError(str(error)) from None
+    return parse_policy(data)
+
+
+def parse_policy(data) -> dict:
+    """Проверка и нормализация содержимого политики (см. load_policy)."""
+    if not isinstance(data, dict):
+        raise PolicyError(
+            'Политика должна быть объектом с ключами roles, elements, rules'
+        )
+    unknown = set(data) - {'roles', 'elements', 'rules'}
+    if unknown:
+        raise PolicyError(f'Неизвестные разделы: {", ".join(sorted(unknown))}')
+
+    return {
+        'roles': _parse_entities(data.get('roles') or [], 'roles'),
+        'elements': _parse_entities(data.get('elements') or [], 'elements'),
+        'rules': _parse_rules(data.get('rules') or {}),
+    }
+
+
+def diff_policy(policy: dict, prune: bool = False) -> PolicyDiff:
+    """
+    Разница между политикой и БД.
+
+    Args:
+        policy: результат load_policy или parse_policy
+        prune: удалять роли, элементы и правила, которых нет в политике
+
+    Returns:
+        PolicyDiff
+
+    Raises:
+        PolicyError: правило ссылается на неизвестную роль или элемент
+    """
+    diff = PolicyDiff()
+    roles = _diff_entities(
+        Role, policy['roles'], diff.create_roles, diff.update_roles
+    )
+    elements = _diff_entities(
+        BusinessElement,
+        policy['elements'],
+        diff.create_elements,
+        diff.update_elements,
+    )
+    if prune:
+        diff.delete_roles = sorted(set(roles) - set(policy['roles']))
+        diff.delete_elements = sorted(set(elements) - set(policy['elements']))
+    current = _current_rules(roles, elements)
+    _diff_rules(diff, policy['rules'], current, roles, elements)
+    _prune_rules(diff, policy['rules'], current, prune)
+    return diff
+
+
+def apply_diff(diff: PolicyDiff) -> None:
+    """
+    Применение разницы в одной транзакции.
+
+    Сигналы bulk-операций не отправляются, поэтому версия прав
+    меняется здесь - один раз на всю политику.
+    """
+    if not diff:
+        return
+    with transaction.atomic(), deferred_bumps():
+        _apply_entities(
+            Role, diff.create_roles, diff.update_roles, diff.delete_roles
+        )
+        _apply_entities(
+            BusinessElement,
+            diff.create_elements,
+            diff.update_elements,
+            diff.delete_elements,
+        )
+
+        if diff.delete_rules:
+            AccessRule.objects.filter(
+                id__in=diff.delete_rules.values(),
+            ).delete()
+        if diff.update_rules:
+            AccessRule.objects.bulk_update(
+                [
+                    AccessRule(id=rule_id, permissions=mask)
+                    for rule_id, _, mask in diff.update_rules.values()
+                ],
+                ['permissions'],
+                batch_size=BATCH_SIZE,
+            )
+        if diff.create_rules:
+            role_ids = dict(Role.objects.values_list('code', 'id'))
+            element_ids = dict(
+                BusinessElement.objects.values_list('code', 'id')
+            )
+            AccessRule.objects.bulk_create(
+                [
+                    AccessRule(
+                        role_id=role_ids[role],
+                        element_id=element_ids[element],
+                        permissions=mask,
+                    )
+                    for (role, element), mask in diff.create_rules.items()
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        bump_global_version()
+    get_engine().invalidate()
+
+
+def _parse_entities(items, section: str) -> dict[str, dict]:
+    if not isinstance(items, list):
+        raise PolicyError(f'{section}: ожидается список')
+    entities = {}
+    for number, item in enumerate(items):
+        if (
+            not isinstance(item, dict)
+            or not item.get('code')
+            or not item.get('name')
+        ):
+            raise PolicyError(f'{section}[{number}]: обязательны code и name')
+        code = str(item['code'])
+        if code in entities:
+            raise PolicyError(f'{section}[{number}]: повтор кода {code}')
+        entities[code] = {
+            name: str(item.get(name) or '') for name in ENTITY_FIELDS
+        }
+    return entities
+
+
+def _parse_rules(rules) -> dict[str, dict[str, int]]:
+    if not isinstance(rules, dict):
+        raise PolicyError(
+            'rules: ожидается {код роли: {код элемента: [права]}}'
+        )
+    parsed = {}
+    for role_code, role_rules in rules.items():
+        if not isinstance(role_rules, dict):
+            raise PolicyError(
+                f'rules.{role_code}: ожидается {{код элемента: [права]}}'
+            )
+        parsed[str(role_code)] = {
+            str(element_code): _parse_mask(
+                names, f'rules.{role_code}.{element_code}'
+            )
+            for element_code, names in role_rules.items()
+        }
+    return parsed
+
+
+def _parse_mask(names, location: str) -> int:
+    if not isinstance(names, list):
+        raise PolicyError(f'{location}: ожидается список прав')
+    mask = 0
+    for name in names:
+        bit = PERMISSION_NAMES.get(name)
+        if bit is None:
+            raise PolicyError(f'{location}: неизвестное право {name}')
+        mask |= bit
+    return mask
+
+
+def _diff_entities(
+    model, wanted: dict, create: dict, update: dict
+) -> dict[str, int]:
+    """
+    Создание и изменение ролей или элементов.
+
+    Returns:
+        {code: ID} из БД
+    """
+    ids = {}
+    for entity_id, code, *values in model.objects.values_list(
+        'id', 'code', *ENTITY_FIELDS
+    ):
+        ids[code] = entity_id
+        target = wanted.get(code)
+        if target is None:
+            continue
+        changes = {
+            name: target[name]
+            for name, value in zip(ENTITY_FIELDS, values, strict=True)
+            if target[name] != value
+        }
+        if changes:
+            update[code] = changes
+    for code, values in wanted.items():
+        if code not in ids:
+            create[code] = values
+    return ids
+
+
+def _current_rules(roles: dict, elements: dict) -> dict:
+    """Правила из БД: (код роли, код элемента) -> (ID, маска)."""
+    role_codes = {role_id: code for code, role_id in roles.items()}
+    element_codes = {element_id: code for code, element_id in elements.items()}
+    rows = AccessRule.objects.order_by().values_list(
+        'id', 'role_id', 'element_id', 'permissions',
+    )
+    return {
+        (role_codes[role_id], element_codes[element_id]): (rule_id, mask)
+        for rule_id, role_id, element_id, mask in rows
+    }
+
+
+def _diff_rules(
+    diff: PolicyDiff, rules: dict, current: dict, roles: dict, elements: dict
+) -> None:
+    """Создание и изменение правил из блоков rules."""
+    known_roles = (set(roles) | set(diff.create_roles)) - set(diff.delete_roles)
+    known_elements = (
+        set(elements) | set(diff.create_elements)
+    ) - set(diff.delete_elements)
+    for role_code, role_rules in rules.items():
+        if role_code not in known_roles:
+            raise PolicyError(f'rules.{role_code}: неизвестная роль')
+        for element_code, mask in role_rules.items():
+            if element_code not in known_elements:
+                raise PolicyError(
+                    f'rules.{role_code}.{element_code}: '
+                    'неизвестный бизнес-элемент'
+                )
+            _diff_rule(diff, (role_code, element_code), mask, current)
+
+
+def _diff_rule(diff: PolicyDiff, key: tuple, mask: int, current: dict) -> None:
+    existing = current.get(key)
+    if existing is None:
+        diff.create_rules[key] = mask
+    elif existing[1] != mask:
+        diff.update_rules[key] = (existing[0], existing[1], mask)
+
+
+def _prune_rules(
+    diff: PolicyDiff, rules: dict, current: dict, prune: bool
+) -> None:
+    """
+    Удаление правил, которых нет в политике.
+
+    Правила роли с блоком в rules удаляются всегда, остальные -
+    только с prune=True.
+    """
+    deleted_roles = set(diff.delete_roles)
+    deleted_elements = set(diff.delete_elements)
+    for (role_code, element_code), (rule_id, _) in current.items():
+        if element_code in rules.get(role_code, ()):
+            continue
+        # Правила удаляемых ролей и элементов удалит каскад
+        if role_code in deleted_roles or element_code in deleted_elements:
+            continue
+        if role_code in rules or prune:
+            diff.delete_rules[role_code, element_code] = rule_id
+
+
+def _apply_entities(model, create: dict, update: dict, delete: list) -> None:
+    if delete:
+        model.objects.filter(code__in=delete).delete()
+    if update:
+        objects = list(model.objects.filter(code__in=list(update)))
+        for obj in objects:
+            for name, value in update[obj.code].items():
+                setattr(obj, name, value)
+        model.objects.bulk_update(
+            objects, list(ENTITY_FIELDS), batch_size=BATCH_SIZE
+        )
+    if create:
+        model.objects.bulk_create(
+            [model(code=code, **values) for code, values in create.items()],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def _names(mask: int) -> str:
+    return ', '.join(mask_to_names(mask)) or '-'
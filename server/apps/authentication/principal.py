@@ -0,0 +1,243 @@
+"""
+Скомпилированный снимок прав пользователя (Principal).
+
+Principal строится один раз на пользователя: ID, роли и маска прав
+для каждого кода бизнес-элемента. Снимок хранится в процессном кеше
+и помечается версией прав. Версия состоит из глобальной части
+(меняется при изменении ролей, элементов и правил доступа)
+и пользовательской (меняется при назначении и отзыве ролей).
+Смена версии в любом воркере доходит до остальных через канал
+инвалидации (см. versions.py), поэтому снимок устаревает во всех
+воркерах сразу, а не по истечении TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.conf import settings
+
+from .engine import get_engine
+from .models import UserRole
+from .versions import get_config, get_permission_version, split_version
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Неизменяемый снимок прав пользователя."""
+
+    user_id: int
+    role_ids: frozenset[int]
+    role_codes: frozenset[str]
+    permissions: MappingProxyType
+    version: str
+
+    def mask(self, element_code: str) -> int:
+        """Маска прав на бизнес-элемент."""
+        return self.permissions.get(element_code, 0)
+
+    def has_role(self, role_code: str) -> bool:
+        """Есть ли у пользователя роль с указанным кодом."""
+        return role_code in self.role_codes
+
+
+def build_principal(user_id: int, version: str = '') -> Principal:
+    """
+    Построение снимка прав.
+
+    Выполняет один запрос (роли пользователя), маски прав берутся
+    из матрицы движка прав.
+
+    Args:
+        user_id: ID пользователя
+        version: версия прав, под которой строится снимок
+
+    Returns:
+        Principal
+    """
+    global_version = split_version(version)[0] if version else None
+    matrix = get_engine().snapshot(global_version)
+    role_ids = frozenset(
+        UserRole.objects.filter(user_id=user_id).values_list(
+            'role_id', flat=True
+        )
+    )
+
+    return Principal(
+        user_id=user_id,
+        role_ids=role_ids,
+        role_codes=frozenset(
+            matrix.role_codes[role_id]
+            for role_id in role_ids
+            if role_id in matrix.role_codes
+        ),
+        permissions=MappingProxyType(matrix.masks(role_ids)),
+        version=version,
+    )
+
+
+class PrincipalCache:
+    """Процессный LRU-кеш снимков прав с проверкой версии и TTL."""
+
+    def __init__(self, max_size: int = 10000, ttl: int = 60):
+        """Кеш на max_size снимков, каждый живет ttl секунд."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[Principal, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, version: str) -> Principal | None:
+        """Снимок прав, если он построен для текущей версии и не устарел."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, deadline = entry
+            if principal.version != version or deadline <= time.monotonic():
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        return principal
+
+    def set(self, principal: Principal) -> None:
+        """Сохранение снимка прав."""
+        with self._lock:
+            self._entries[principal.user_id] = (
+                principal,
+                time.monotonic() + self.ttl,
+            )
+            self._entries.move_to_end(principal.user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Счетчики попаданий и промахов и текущий размер."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """Очистка кеша."""
+        with self._lock:
+            self._entries.clear()
+
+
+_principal_cache = None
+
+
+def _get_principal_cache() -> PrincipalCache:
+    """Кеш снимков прав текущего процесса."""
+    global _principal_cache  # noqa: PLW0603
+    if _principal_cache is None:
+        config = get_config()
+        _principal_cache = PrincipalCache(
+            max_size=config['MAX_SIZE'], ttl=config['TTL']
+        )
+    return _principal_cache
+
+
+def reset_principal_cache() -> None:
+    """Сброс кеша (например, при изменении настроек в тестах)."""
+    global _principal_cache  # noqa: PLW0603
+    _principal_cache = None
+
+
+def get_principal_cache_stats() -> dict:
+    """Счетчики кеша снимков прав текущего процесса."""
+    return _get_principal_cache().stats()
+
+
+def get_principal(user_id: int) -> Principal:
+    """
+    Получение актуального снимка прав пользователя.
+
+    На теплом кеше не выполняет запросов к БД.
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        Principal
+    """
+    version = get_permission_version(user_id)
+    principal_cache = _get_principal_cache()
+    principal = principal_cache.get(user_id, version)
+    if principal is None:
+        principal = build_principal(user_id, version)
+        principal_cache.set(principal)
+    return principal
+
+
+def permission_claims(user_id: int) -> dict | None:
+    """
+    Claims с правами для встраивания в access токен.
+
+    Включается настройкой JWT_EMBED_PERMISSIONS. Маска прав на элемент
+    занимает 7 бит, поэтому хранится числом: в JSON это не длиннее base64.
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        {'rid': [...], 'roles': [...], 'perms': {код: маска}, 'pv': версия}
+        или None, если режим выключен
+    """
+    if not getattr(settings, 'JWT_EMBED_PERMISSIONS', False):
+        return None
+    principal = get_principal(user_id)
+    return {
+        'rid': sorted(principal.role_ids),
+        'roles': sorted(principal.role_codes),
+        'perms': dict(principal.permissions),
+        'pv': principal.version,
+    }
+
+
+def principal_from_claims(payload: dict) -> Principal | None:
+    """
+    Снимок прав из claims токена.
+
+    Сверяет версию прав токена с текущей версией, которую воркер получает
+    через канал инвалидации (см. versions.py).
+
+    Args:
+        payload: декодированный access токен
+
+    Returns:
+        Principal или None, если claims нет или права успели измениться
+    """
+    version = payload.get('pv')
+    if version is None:
+        return None
+    user_id = payload['user_id']
+    if version != get_permission_version(user_id):
+        return None
+    return Principal(
+        user_id=user_id,
+        role_ids=frozenset(payload.get('rid', ())),
+        role_codes=frozenset(payload.get('roles', ())),
+        permissions=MappingProxyType(payload.get('perms', {})),
+        version=version,
+    )
+
+
+def get_user_principal(user) -> Principal:
+    """
+    Снимок прав, прикрепленный к пользователю.
+
+    JWTAuthentication прикрепляет его к request.user; для пользователей,
+    аутентифицированных иначе, снимок строится и прикрепляется здесь.
+    """
+    principal = getattr(user, 'principal', None)
+    if principal is None:
+        principal = get_principal(user.id)
+        user.principal = principal
+    return principal
@@ -0,0 +1,268 @@
+"""
+Список отозванных access токенов для режима проверки без обращения к БД.
+
+В режиме JWT_SESSION_VALIDATION = 'revocation' JWTAuthentication
+не ищет активную сессию в БД, а проверяет, что токен не отозван.
+Отозванных токенов, срок действия которых еще не истек, намного
+меньше, чем живых сессий: в список попадают только сессии,
+деактивированные раньше своего expires_at, и только до этого момента.
+
+Кроме токенов список хранит ID неактивных пользователей: в этом режиме
+пользователь не загружается из БД при аутентификации (см. LazyUser
+в authentication.py), поэтому деактивация и удаление пользователя
+тоже рассылаются событиями канала.
+
+Список токенов состоит из фильтра Блума (быстрый отрицательный ответ
+для подавляющего большинства токенов) и точного словаря
+token_hash -> время истечения, подтверждающего положительный ответ.
+При старте воркер загружает отозванные сессии и неактивных
+пользователей из БД и накопленные события канала инвалидации, дальше
+обновляется по событиям канала (logout, refresh, удаление аккаунта,
+деактивация сессии или пользователя в админке).
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Session, User
+from .session_cache import (
+    TOKEN_EVENT,
+    USER_STATE_EVENT,
+    BaseInvalidationChannel,
+    build_channel,
+)
+
+DEFAULT_REVOCATION_LIST = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 0.001,
+    'PURGE_INTERVAL': 60,  # секунды
+}
+
+
+class BloomFilter:
+    """
+    Фильтр Блума по hex-хешам токенов.
+
+    Индексы битов получаются двойным хешированием из одного
+    128-битного blake2b дайджеста элемента.
+    """
+
+    __slots__ = ('bits', 'hash_count', 'size')
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Создание фильтра.
+
+        Args:
+            capacity: ожидаемое число элементов
+            error_rate: допустимая доля ложноположительных ответов
+        """
+        self.size = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _indexes(self, token_hash: str):
+        """Номера битов элемента."""
+        digest = hashlib.blake2b(token_hash.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8])
+        second = int.from_bytes(digest[8:]) | 1
+        for number in range(self.hash_count):
+            yield (first + number * second) % self.size
+
+    def add(self, token_hash: str) -> None:
+        """Добавление элемента."""
+        for index in self._indexes(token_hash):
+            self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, token_hash: str) -> bool:
+        """Возможно отозван (ложные срабатывания допустимы)."""
+        return all(
+            self.bits[index >> 3] & (1 << (index & 7))
+            for index in self._indexes(token_hash)
+        )
+
+
+class RevocationList:
+    """Отозванные, но еще не истекшие access токены."""
+
+    def __init__(
+        self,
+        channel: BaseInvalidationChannel,
+        lifetime: float,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        purge_interval: float = 60,
+    ):
+        """
+        Создание списка.
+
+        Args:
+            channel: канал инвалидации (обычно с replay=True)
+            lifetime: время жизни access токена в секундах
+            capacity: ожидаемое число отозванных токенов
+            error_rate: доля ложноположительных ответов фильтра
+            purge_interval: период удаления истекших записей в секундах
+        """
+        self.channel = channel
+        self.lifetime = lifetime
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.purge_interval = purge_interval
+        self._tokens: dict[str, float] = {}
+        self._inactive_users: set[int] = set()
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._purged_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Число отозванных токенов."""
+        return len(self._tokens)
+
+    def is_revoked(self, token_hash: str, user_id: int | None = None) -> bool:
+        """
+        Проверка, отозван ли токен.
+
+        Args:
+            token_hash: SHA-256 хеш access токена
+            user_id: ID пользователя из токена
+
+        Returns:
+            True, если сессия токена деактивирована
+            или пользователь неактивен либо удален
+        """
+        self.sync()
+        if user_id is not None and user_id in self._inactive_users:
+            return True
+        if not self._tokens or token_hash not in self._bloom:
+            return False
+        expires_at = self._tokens.get(token_hash)
+        return expires_at is not None and expires_at > time.time()
+
+    def revoke(self, token_hashes, expires_at: float | None = None) -> None:
+        """
+        Добавление отозванных токенов.
+
+        Args:
+            token_hashes: хеши access токенов
+            expires_at: время истечения токенов (unix timestamp);
+                по умолчанию - текущее время плюс время жизни токена,
+                позже которого выданный ранее токен истечь не может
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.lifetime
+        with self._lock:
+            for token_hash in token_hashes:
+                if expires_at > self._tokens.get(token_hash, 0):
+                    self._tokens[token_hash] = expires_at
+                self._bloom.add(token_hash)
+            if len(self._tokens) > self.capacity:
+                self._rebuild()
+
+    def load(self) -> None:
+        """Загрузка неактивных пользователей и отозванных сессий из БД."""
+        inactive_users = set(
+            User.objects.filter(is_active=False).values_list('id', flat=True)
+        )
+        with self._lock:
+            self._inactive_users = inactive_users
+        sessions = Session.objects.filter(
+            is_active=False,
+            expires_at__gt=timezone.now(),
+        ).values_list('token_hash', 'expires_at')
+        for token_hash, expires_at in sessions.iterator():
+            self.revoke([token_hash], expires_at.timestamp())
+
+    def sync(self) -> None:
+        """Применение событий канала и удаление истекших записей."""
+        events = self.channel.poll()
+        if events is None:
+            # Часть событий потеряна: добираем отозванные сессии из БД
+            self.load()
+        elif events:
+            self._apply(events)
+        if time.monotonic() - self._purged_at >= self.purge_interval:
+            self.purge()
+
+    def _apply(self, events: list[str]) -> None:
+        """Применение событий по порядку журнала."""
+        token_hashes = []
+        with self._lock:
+            for event in events:
+                kind, _, value = event.partition(':')
+                if kind == TOKEN_EVENT:
+                    token_hashes.append(value)
+                elif kind == USER_STATE_EVENT:
+                    user_id, _, is_active = value.partition(':')
+                    if is_active == '1':
+                        self._inactive_users.discard(int(user_id))
+                    else:
+                        self._inactive_users.add(int(user_id))
+        if token_hashes:
+            self.revoke(token_hashes)
+
+    def purge(self) -> None:
+        """Удаление истекших записей с перестроением фильтра."""
+        now = time.time()
+        with self._lock:
+            self._purged_at = time.monotonic()
+            expired = [
+                token_hash
+                for token_hash, expires_at in self._tokens.items()
+                if expires_at <= now
+            ]
+            if expired:
+                for token_hash in expired:
+                    del self._tokens[token_hash]
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Перестроение фильтра под текущий набор записей."""
+        while len(self._tokens) > self.capacity:
+            self.capacity *= 2
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        for token_hash in self._tokens:
+            self._bloom.add(token_hash)
+
+
+_revocation_list = None
+_revocation_list_lock = threading.Lock()
+
+
+def get_revocation_list() -> RevocationList:
+    """Список отозванных токенов текущего процесса."""
+    global _revocation_list  # noqa: PLW0603
+    if _revocation_list is None:
+        with _revocation_list_lock:
+            if _revocation_list is None:
+                _revocation_list = _build_revocation_list()
+    return _revocation_list
+
+
+def reset_revocation_list() -> None:
+    """Сброс списка (например, при изменении настроек в тестах)."""
+    global _revocation_list  # noqa: PLW0603
+    with _revocation_list_lock:
+        _revocation_list = None
+
+
+def _build_revocation_list() -> RevocationList:
+    """Создание и начальная загрузка списка по настройке JWT_REVOCATION_LIST."""
+    config = {
+        **DEFAULT_REVOCATION_LIST,
+        **getattr(settings, 'JWT_REVOCATION_LIST', {}),
+    }
+    revocation_list = RevocationList(
+        channel=build_channel(replay=True),
+        lifetime=getattr(settings, 'JWT_ACCESS_TOKEN_LIFETIME', 15) * 60,
+        capacity=config['CAPACITY'],
+        error_rate=config['ERROR_RATE'],
+        purge_interval=config['PURGE_INTERVAL'],
+    )
+    revocation_list.load()
+    return revocation_list
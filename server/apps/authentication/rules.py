@@ -0,0 +1,72 @@
+"""
+Массовое изменение правил доступа (матрица роль x бизнес-элемент).
+
+Ячейки матрицы вставляются или обновляются одним
+``INSERT ... ON CONFLICT (role_id, element_id) DO UPDATE``
+(bulk_create с update_conflicts) по ограничению unique_role_element.
+Права хранятся маской (AccessRule.permissions), поэтому переданные
+права ячейки накладываются на маску существующей строки: затронутые
+строки читаются одним SELECT ... FOR UPDATE, новые маски пишутся
+одним upsert. Версия прав меняется один раз на весь запрос.
+"""
+from django.db import transaction
+
+from .engine import get_engine
+from .masks import PERMISSION_FIELDS
+from .models import AccessRule
+from .versions import bump_global_version
+
+# Не больше стольких ячеек за запрос
+MAX_CELLS = 10000
+# Строк в одном INSERT
+BATCH_SIZE = 1000
+
+
+def upsert_rules(cells) -> None:
+    """
+    Вставка и обновление правил доступа.
+
+    Args:
+        cells: список dict с ключами role_id, element_id и любыми
+            из PERMISSION_FIELDS; отсутствующие права новой ячейки - False,
+            существующей - не меняются
+    """
+    cells = list(cells)
+    if not cells:
+        return
+
+    with transaction.atomic():
+        current = {
+            (role_id, element_id): mask
+            for role_id, element_id, mask in AccessRule.objects
+            .select_for_update()
+            .filter(
+                role_id__in={cell['role_id'] for cell in cells},
+                element_id__in={cell['element_id'] for cell in cells},
+            )
+            .order_by()
+            .values_list('role_id', 'element_id', 'permissions')
+        }
+        rules = []
+        for cell in cells:
+            mask = current.get((cell['role_id'], cell['element_id']), 0)
+            for name, bit in PERMISSION_FIELDS.items():
+                if name in cell:
+                    mask = mask | bit if cell[name] else mask & ~bit
+            rules.append(
+                AccessRule(
+                    role_id=cell['role_id'],
+                    element_id=cell['element_id'],
+                    permissions=mask,
+                )
+            )
+        AccessRule.objects.bulk_create(
+            rules,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['role', 'element'],
+            update_fields=['permissions', 'updated_at'],
+        )
+        # bulk_create не отправляет post_save - версия меняется здесь
+        bump_global_version()
+    get_engine().invalidate()
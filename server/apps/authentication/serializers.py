@@ -5,11 +5,25 @@ from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 
-from .models import User, Role, UserRole, BusinessElement, AccessRule
+from server.common.timing import phase
 
+from .assignments import MAX_PAIRS
+from .introspection import get_config as get_introspection_config
+from .masks import PERMISSION_FIELDS
+from .models import User, Role, UserRole, BusinessElement, AccessRule, Session
+from .rules import MAX_CELLS
 
-@extend_schema_field(serializers.ListField(child=serializers.DictField()))
-class UserSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """Замер времени сериализации ответа (фаза serialize)."""
+
+    def to_representation(self, instance):
+        """Сериализация объекта с замером."""
+        with phase('serialize'):
+            return super().to_representation(instance)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для модели пользователя."""
 
     roles = serializers.SerializerMethodField()
@@ -31,16 +45,25 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-    @extend_schema_field(serializers.IntegerField())
+    @extend_schema_field(serializers.ListField(child=serializers.DictField()))
     def get_roles(self, obj):
-        """Получение ролей пользователя."""
+        """
+        Получение ролей пользователя.
+
+        Использует prefetch_related('user_roles__role') из queryset
+        представления; для одиночного объекта без prefetch роли
+        загружаются одним запросом.
+        """
+        user_roles = obj.user_roles.all()
+        if 'user_roles' not in getattr(obj, '_prefetched_objects_cache', {}):
+            user_roles = user_roles.select_related('role')
         return [
             {
                 'id': ur.role.id,
                 'name': ur.role.name,
                 'code': ur.role.code,
             }
-            for ur in obj.user_roles.select_related('role').all()
+            for ur in user_roles
         ]
 
 
@@ -144,7 +167,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         ]
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для роли."""
 
     users_count = serializers.SerializerMethodField()
@@ -163,11 +186,19 @@ class RoleSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField())
     def get_users_count(self, obj):
-        """Количество пользователей с этой ролью."""
-        return obj.user_roles.count()
+        """
+        Количество пользователей с этой ролью.
 
+        Берется из аннотации users_count queryset представления,
+        для объекта без аннотации (после создания) - отдельным запросом.
+        """
+        users_count = getattr(obj, 'users_count', None)
+        if users_count is None:
+            users_count = obj.user_roles.count()
+        return users_count
 
-class UserRoleSerializer(serializers.ModelSerializer):
+
+class UserRoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для назначения роли пользователю."""
 
     user_email = serializers.EmailField(source='user.email', read_only=True)
@@ -193,7 +224,90 @@ class UserRoleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'assigned_at', 'assigned_by']
 
 
-class BusinessElementSerializer(serializers.ModelSerializer):
+class RolePairSerializer(serializers.Serializer):
+    """Пара пользователь - роль."""
+
+    user_id = serializers.IntegerField()
+    role_id = serializers.IntegerField()
+
+
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    """
+    Запрос массового назначения или отзыва ролей.
+
+    Либо явные пары (pairs), либо роли role_ids для пользователей
+    из user_ids и/или с email в домене email_domain.
+    """
+
+    pairs = RolePairSerializer(many=True, required=False, allow_empty=False)
+    role_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    email_domain = serializers.CharField(required=False)
+
+    def validate_email_domain(self, value):
+        """Домен без ведущего '@'."""
+        domain = value.lstrip('@')
+        if not domain:
+            raise serializers.ValidationError('Укажите домен email')
+        return domain
+
+    def validate(self, attrs):
+        """Сборка списка пар (user_id, role_id), размер ограничен."""
+        if 'pairs' in attrs:
+            pairs = self._explicit_pairs(attrs)
+        else:
+            pairs = self._selected_pairs(attrs)
+        if len(pairs) > MAX_PAIRS:
+            raise serializers.ValidationError(
+                f'Не больше {MAX_PAIRS} пар за запрос'
+            )
+        return {'pairs': pairs}
+
+    def _explicit_pairs(self, attrs):
+        """Пары из pairs; выборка пользователей вместе с ними запрещена."""
+        if {'role_ids', 'user_ids', 'email_domain'} & set(attrs):
+            raise serializers.ValidationError(
+                'Передайте pairs или role_ids с выборкой пользователей'
+            )
+        return [(pair['user_id'], pair['role_id']) for pair in attrs['pairs']]
+
+    def _selected_pairs(self, attrs):
+        """Каждая роль из role_ids для каждого выбранного пользователя."""
+        if 'role_ids' not in attrs or not {'user_ids', 'email_domain'} & set(
+            attrs
+        ):
+            raise serializers.ValidationError(
+                'Передайте pairs или role_ids с user_ids/email_domain'
+            )
+        return [
+            (user_id, role_id)
+            for user_id in self._selected_user_ids(attrs)
+            for role_id in attrs['role_ids']
+        ]
+
+    def _selected_user_ids(self, attrs):
+        """ID из user_ids, при email_domain - только с email в домене."""
+        user_ids = attrs.get('user_ids')
+        if 'email_domain' not in attrs:
+            return user_ids
+        users = User.objects.filter(
+            email__iendswith=f'@{attrs["email_domain"]}'
+        )
+        if user_ids is not None:
+            users = users.filter(id__in=user_ids)
+        # Одна лишняя строка - чтобы заметить превышение MAX_PAIRS
+        return users.order_by('id').values_list('id', flat=True)[
+            : MAX_PAIRS + 1
+        ]
+
+
+class BusinessElementSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для бизнес-элемента."""
 
     rules_count = serializers.SerializerMethodField()
@@ -212,15 +326,56 @@ class BusinessElementSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.IntegerField())
     def get_rules_count(self, obj):
-        """Количество правил доступа к этому элементу."""
-        return obj.access_rules.count()
+        """
+        Количество правил доступа к этому элементу.
+
+        Берется из аннотации rules_count queryset представления,
+        для объекта без аннотации - отдельным запросом.
+        """
+        rules_count = getattr(obj, 'rules_count', None)
+        if rules_count is None:
+            rules_count = obj.access_rules.count()
+        return rules_count
+
+
+class PermissionFlagField(serializers.BooleanField):
+    """
+    Право правила доступа - бит маски AccessRule.permissions.
+
+    Пишется через одноименное свойство модели, в строке ``.values()``
+    читается из столбца permissions.
+    """
+
+    values_source = 'permissions'
+
+    def __init__(self, **kwargs):
+        """Право необязательно при записи."""
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        """Бит права по имени поля."""
+        super().bind(field_name, parent)
+        self.bit = PERMISSION_FIELDS[self.source]
+
+    def from_values(self, mask: int) -> bool:
+        """Значение права из столбца permissions."""
+        return bool(mask & self.bit)
 
 
-class AccessRuleSerializer(serializers.ModelSerializer):
+class AccessRuleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для правила доступа."""
 
     role_name = serializers.CharField(source='role.name', read_only=True)
     element_name = serializers.CharField(source='element.name', read_only=True)
+    # Права - свойства над маской permissions, а не поля модели
+    read_permission = PermissionFlagField()
+    read_all_permission = PermissionFlagField()
+    create_permission = PermissionFlagField()
+    update_permission = PermissionFlagField()
+    update_all_permission = PermissionFlagField()
+    delete_permission = PermissionFlagField()
+    delete_all_permission = PermissionFlagField()
 
     class Meta:
         model = AccessRule
@@ -243,6 +398,91 @@ class AccessRuleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class AccessRuleCellSerializer(serializers.Serializer):
+    """Ячейка матрицы прав: роль, бизнес-элемент и переданные права."""
+
+    role = serializers.IntegerField()
+    element = serializers.IntegerField()
+    read_permission = serializers.BooleanField(required=False)
+    read_all_permission = serializers.BooleanField(required=False)
+    create_permission = serializers.BooleanField(required=False)
+    update_permission = serializers.BooleanField(required=False)
+    update_all_permission = serializers.BooleanField(required=False)
+    delete_permission = serializers.BooleanField(required=False)
+    delete_all_permission = serializers.BooleanField(required=False)
+
+
+class BulkAccessRuleSerializer(serializers.Serializer):
+    """
+    Запрос массового изменения правил доступа.
+
+    Матрица передается полностью или частично.
+    """
+
+    rules = AccessRuleCellSerializer(
+        many=True, allow_empty=False, max_length=MAX_CELLS
+    )
+
+    def validate_rules(self, rules):
+        """Ячейки без повторов, роли и элементы существуют (два запроса)."""
+        cells = {}
+        for rule in rules:
+            key = (rule.pop('role'), rule.pop('element'))
+            if key in cells:
+                raise serializers.ValidationError(
+                    f'Повтор ячейки role={key[0]}, element={key[1]}'
+                )
+            cells[key] = rule
+
+        role_ids = {role_id for role_id, _ in cells}
+        element_ids = {element_id for _, element_id in cells}
+        missing_roles = role_ids - set(
+            Role.objects
+            .filter(id__in=role_ids)
+            .order_by()
+            .values_list('id', flat=True)
+        )
+        missing_elements = element_ids - set(
+            BusinessElement.objects
+            .filter(id__in=element_ids)
+            .order_by()
+            .values_list('id', flat=True)
+        )
+        if missing_roles:
+            raise serializers.ValidationError(
+                f'Роли не найдены: {sorted(missing_roles)}'
+            )
+        if missing_elements:
+            raise serializers.ValidationError(
+                f'Бизнес-элементы не найдены: {sorted(missing_elements)}'
+            )
+        return [
+            {'role_id': role_id, 'element_id': element_id, **flags}
+            for (role_id, element_id), flags in cells.items()
+        ]
+
+
+class SessionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Сериализатор для сессии (без хешей токенов)."""
+
+    user_email = serializers.EmailField(source='user.email', read_only=True)
+
+    class Meta:
+        model = Session
+        fields = [
+            'id',
+            'user',
+            'user_email',
+            'ip_address',
+            'user_agent',
+            'is_active',
+            'expires_at',
+            'refresh_expires_at',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+
 class TokenSerializer(serializers.Serializer):
     """Сериализатор для токенов."""
 
@@ -267,6 +507,29 @@ class RefreshTokenSerializer(serializers.Serializer):
     refresh_token = serializers.CharField(required=True)
 
 
+class IntrospectionSerializer(serializers.Serializer):
+    """Сериализатор запроса интроспекции: один токен или пачка."""
+
+    token = serializers.CharField(required=False)
+    tokens = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=False,
+    )
+
+    def validate(self, attrs):
+        """Ровно одно из полей token и tokens, размер пачки ограничен."""
+        if ('token' in attrs) == ('tokens' in attrs):
+            raise serializers.ValidationError('Передайте token или tokens')
+
+        batch_size = get_introspection_config()['BATCH_SIZE']
+        if len(attrs.get('tokens', ())) > batch_size:
+            raise serializers.ValidationError(
+                f'Не больше {batch_size} токенов за запрос'
+            )
+        return attrs
+
+
 class LoginResponseSerializer(serializers.Serializer):
     """Сериализатор для ответа на запрос логина."""
 
@@ -275,16 +538,17 @@ class LoginResponseSerializer(serializers.Serializer):
     tokens = TokenSerializer()
 
 
-class MockProductSerializer(serializers.Serializer):
+class MockProductSerializer(TimedSerializerMixin, serializers.Serializer):
     """Сериализатор для mock продукта."""
     id = serializers.IntegerField()
     name = serializers.CharField()
     price = serializers.DecimalField(max_digits=10, decimal_places=2)
     owner_id = serializers.IntegerField()
     is_mine = serializers.BooleanField()
+    can_edit = serializers.BooleanField()
 
 
-class MockStoreSerializer(serializers.Serializer):
+class MockStoreSerializer(TimedSerializerMixin, serializers.Serializer):
     """Сериализатор для mock магазина."""
     id = serializers.IntegerField()
     name = serializers.CharField()
@@ -293,7 +557,7 @@ class MockStoreSerializer(serializers.Serializer):
     is_mine = serializers.BooleanField()
 
 
-class MockOrderSerializer(serializers.Serializer):
+class MockOrderSerializer(TimedSerializerMixin, serializers.Serializer):
     """Сериализатор для mock заказа."""
     id = serializers.IntegerField()
     product = serializers.CharField()
@@ -0,0 +1,515 @@
+"""
+Процессный кеш валидных сессий для JWTAuthentication.
+
+Кеш хранит пары (user_id, token_hash), для которых уже была найдена
+активная сессия в БД. Время жизни записи ограничено TTL и сроком
+действия токена (``exp``). Отзыв сессий (logout, refresh, удаление
+аккаунта, деактивация в админке) рассылается всем воркерам через
+подключаемый канал инвалидации.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+# Префиксы событий инвалидации
+TOKEN_EVENT = 't'
+USER_EVENT = 'u'
+# Смена признака is_active пользователя (см. revocation.py)
+USER_STATE_EVENT = 'a'
+
+# Признак отсутствующего файла журнала
+_MISSING_INODE = -1
+
+DEFAULT_SESSION_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TTL': 60,  # секунды
+    'CHANNEL': (
+        'server.apps.authentication.session_cache.FileInvalidationChannel'
+    ),
+    'CHANNEL_OPTIONS': {},
+}
+
+
+class BaseInvalidationChannel:
+    """
+    Канал доставки событий инвалидации между воркерами.
+
+    Событие - строка вида ``t:<token_hash>``, ``u:<user_id>``
+    или ``a:<user_id>:<0|1>`` (события смены версий прав -
+    см. versions.py).
+    Канал с ``replay=True`` при первом чтении отдает и уже накопленные
+    события (нужно списку отозванных токенов, см. revocation.py).
+    ``complete_replay`` - накопленные события отдаются без пропусков.
+    """
+
+    complete_replay = False
+
+    def publish(self, events: list[str]) -> None:
+        """Отправка событий всем подписчикам."""
+        raise NotImplementedError
+
+    def poll(self) -> list[str] | None:
+        """
+        Получение новых событий с момента прошлого вызова.
+
+        Returns:
+            Список событий или None, если часть событий потеряна
+            и локальный кеш нужно полностью сбросить
+        """
+        raise NotImplementedError
+
+
+class LocalInvalidationChannel(BaseInvalidationChannel):
+    """
+    Канал в пределах одного процесса.
+
+    Все экземпляры разделяют общий журнал событий, поэтому несколько
+    кешей в одном процессе ведут себя как отдельные воркеры.
+    Используется в тестах и при запуске в один процесс.
+    """
+
+    complete_replay = True
+    _log: list[str] = []
+    _lock = threading.Lock()
+
+    def __init__(self, replay: bool = False):
+        """replay=True - чтение журнала с начала, иначе только новые события."""
+        self._cursor = 0 if replay else len(self._log)
+
+    def publish(self, events: list[str]) -> None:
+        """Добавление событий в общий журнал."""
+        with self._lock:
+            self._log.extend(events)
+
+    def poll(self) -> list[str] | None:
+        """Чтение событий, появившихся после курсора."""
+        if self._cursor == len(self._log):
+            return []
+        with self._lock:
+            events = self._log[self._cursor:]
+            self._cursor = len(self._log)
+        return events
+
+
+class FileInvalidationChannel(BaseInvalidationChannel):
+    """
+    Канал на основе журнала в разделяемой памяти (``/dev/shm``).
+
+    Все воркеры gunicorn одного узла дописывают события в общий файл
+    и читают его хвост. Проверка новых событий стоит один ``stat``.
+    При переполнении файл пересоздается, а читатели, заметив смену
+    inode, полностью сбрасывают свой кеш. Накопленные события
+    воспроизводятся с начала текущего файла.
+    """
+
+    complete_replay = True
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_bytes: int = 1 << 20,
+        replay: bool = False,
+    ):
+        """Журнал в файле path; после max_bytes файл пересоздается."""
+        if path is None:
+            base_dir = (
+                '/dev/shm'
+                if os.path.isdir('/dev/shm')
+                else tempfile.gettempdir()
+            )  # noqa: S108
+            path = os.path.join(base_dir, 'rolegate-session-invalidation.log')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._inode = None
+        self._offset = None
+
+    def publish(self, events: list[str]) -> None:
+        """Дозапись событий в журнал."""
+        data = ''.join(f'{event}\n' for event in events).encode()
+        try:
+            if os.stat(self.path).st_size > self.max_bytes:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        # O_APPEND гарантирует атомарность небольших записей
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def poll(self) -> list[str] | None:
+        """Чтение новых строк журнала."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            lost = self._inode not in {None, _MISSING_INODE}
+            self._inode, self._offset = _MISSING_INODE, 0
+            return None if lost else []
+
+        if self._inode is None:
+            # Новый читатель: прошлые события к его кешу не относятся
+            self._inode = stat.st_ino
+            self._offset = 0 if self.replay else stat.st_size
+        elif self._inode == _MISSING_INODE:
+            # Журнал создан после прошлой проверки - читаем с начала
+            self._inode = stat.st_ino
+        elif stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._inode, self._offset = stat.st_ino, stat.st_size
+            return None
+        return self._read(stat.st_size)
+
+    def _read(self, size: int) -> list[str]:
+        """Строки журнала от текущей позиции до size."""
+        if size == self._offset:
+            return []
+
+        with open(self.path, 'rb') as log_file:
+            log_file.seek(self._offset)
+            chunk = log_file.read(size - self._offset)
+
+        # Учитываем только полностью записанные строки
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        self._offset += len(complete)
+        return complete.decode().splitlines()
+
+
+class CacheInvalidationChannel(BaseInvalidationChannel):
+    """
+    Канал на основе Django cache.
+
+    Подходит для нескольких узлов, если cache общий (например, Redis).
+    События хранятся под последовательными номерами, номер последнего
+    события хранится в отдельном ключе.
+    """
+
+    def __init__(
+        self,
+        alias: str = 'default',
+        key_prefix: str = 'rolegate:session-invalidation',
+        timeout: int = 300,
+        window: int = 1000,
+        replay: bool = False,
+    ):
+        """Журнал в кеше alias, хранятся последние window событий."""
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.window = window
+        self.replay = replay
+        self._seq_key = f'{key_prefix}:seq'
+        self._last_seq = None
+
+    @property
+    def cache(self):
+        """Используемый backend кеша."""
+        return caches[self.alias]
+
+    def publish(self, events: list[str]) -> None:
+        """Сохранение события под следующим номером."""
+        self.cache.add(self._seq_key, 0, timeout=None)
+        seq = self.cache.incr(self._seq_key)
+        self.cache.set(f'{self.key_prefix}:{seq}', events, timeout=self.timeout)
+
+    def poll(self) -> list[str] | None:
+        """Чтение событий между последним прочитанным и текущим номером."""
+        seq = self.cache.get(self._seq_key, 0)
+        if self._last_seq is None and self.replay:
+            # Накопленные события: часть из них могла истечь, это не потеря
+            self._last_seq = seq
+            first = max(seq - self.window, 0) + 1
+            keys = [
+                f'{self.key_prefix}:{number}'
+                for number in range(first, seq + 1)
+            ]
+            batches = self.cache.get_many(keys)
+            return [
+                event
+                for key in keys
+                if key in batches
+                for event in batches[key]
+            ]
+        if self._last_seq is None or seq < self._last_seq:
+            self._last_seq = seq
+            return []
+        if seq == self._last_seq:
+            return []
+
+        last_seq, self._last_seq = self._last_seq, seq
+        if seq - last_seq > self.window:
+            return None
+
+        keys = [
+            f'{self.key_prefix}:{number}'
+            for number in range(last_seq + 1, seq + 1)
+        ]
+        batches = self.cache.get_many(keys)
+        if len(batches) != len(keys):
+            # Событие еще не записано или уже вытеснено
+            return None
+        return [event for key in keys for event in batches[key]]
+
+
+class SessionCache:
+    """
+    Ограниченный LRU-кеш валидных сессий с TTL.
+
+    Ключ - хеш access токена, значение - (user_id, срок годности записи).
+
+    generation меняется при каждом отзыве и очистке. Проверка сессии
+    запоминает его до чтения БД и передает в add: если за время чтения
+    сессию отозвали, устаревшая запись не добавляется.
+    """
+
+    def __init__(
+        self,
+        channel: BaseInvalidationChannel,
+        max_size: int = 10000,
+        ttl: int = 60,
+    ):
+        """Кеш на max_size сессий, каждая живет ttl секунд."""
+        self.channel = channel
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Число сессий в кеше."""
+        return len(self._entries)
+
+    def contains(self, user_id: int, token_hash: str) -> bool:
+        """
+        Проверка, что сессия уже была подтверждена и не отозвана.
+
+        Args:
+            user_id: ID пользователя из токена
+            token_hash: SHA-256 хеш access токена
+
+        Returns:
+            True, если сессию можно не проверять в БД
+        """
+        self.sync()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                self.misses += 1
+                return False
+            cached_user_id, deadline = entry
+            if cached_user_id != user_id or deadline <= time.time():
+                del self._entries[token_hash]
+                self.misses += 1
+                return False
+            self._entries.move_to_end(token_hash)
+            self.hits += 1
+        return True
+
+    def add(
+        self,
+        user_id: int,
+        token_hash: str,
+        expires_at: float,
+        generation: int | None = None,
+    ) -> None:
+        """
+        Запоминание подтвержденной сессии.
+
+        Args:
+            user_id: ID пользователя
+            token_hash: SHA-256 хеш access токена
+            expires_at: время истечения токена (unix timestamp)
+            generation: значение generation до чтения сессии из БД;
+                если с тех пор был отзыв, запись не добавляется
+        """
+        deadline = min(time.time() + self.ttl, expires_at)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[token_hash] = (user_id, deadline)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_tokens(self, token_hashes: list[str]) -> None:
+        """Отзыв сессий по хешам токенов во всех воркерах."""
+        events = [
+            f'{TOKEN_EVENT}:{token_hash}'
+            for token_hash in token_hashes
+            if token_hash
+        ]
+        if events:
+            self._apply(events)
+            self.channel.publish(events)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Отзыв всех сессий пользователя во всех воркерах."""
+        events = [f'{USER_EVENT}:{user_id}']
+        self._apply(events)
+        self.channel.publish(events)
+
+    def stats(self) -> dict:
+        """Счетчики попаданий и промахов и текущий размер."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """Полная очистка локального кеша."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def sync(self) -> None:
+        """Применение событий инвалидации от других воркеров."""
+        events = self.channel.poll()
+        if events is None:
+            self.clear()
+        elif events:
+            self._apply(events)
+
+    def _apply(self, events: list[str]) -> None:
+        """Удаление записей, затронутых событиями."""
+        token_hashes, user_ids = _parse_events(events)
+        if not token_hashes and not user_ids:
+            return
+        with self._lock:
+            self.generation += 1
+            for token_hash in token_hashes:
+                self._entries.pop(token_hash, None)
+            if user_ids:
+                stale = [
+                    token_hash
+                    for token_hash, (user_id, _) in self._entries.items()
+                    if user_id in user_ids
+                ]
+                for token_hash in stale:
+                    del self._entries[token_hash]
+
+
+def _parse_events(events: list[str]) -> tuple[set[str], set[int]]:
+    """Хеши токенов и ID пользователей из событий инвалидации."""
+    token_hashes = set()
+    user_ids = set()
+    for event in events:
+        kind, _, value = event.partition(':')
+        if kind == TOKEN_EVENT:
+            token_hashes.add(value)
+        elif kind == USER_EVENT:
+            user_ids.add(int(value))
+    return token_hashes, user_ids
+
+
+_session_cache = None
+_session_cache_lock = threading.Lock()
+
+
+def get_session_cache() -> SessionCache | None:
+    """
+    Получение кеша сессий текущего процесса.
+
+    Returns:
+        SessionCache или None, если кеш отключен в настройках
+    """
+    global _session_cache  # noqa: PLW0603
+    if _session_cache is None:
+        with _session_cache_lock:
+            if _session_cache is None:
+                _session_cache = _build_session_cache()
+    return _session_cache if _session_cache is not False else None
+
+
+_publisher = None
+
+
+def get_config() -> dict:
+    """Настройки кеша сессий и канала инвалидации."""
+    return {
+        **DEFAULT_SESSION_CACHE,
+        **getattr(settings, 'JWT_SESSION_CACHE', {}),
+    }
+
+
+def build_channel(replay: bool = False) -> BaseInvalidationChannel:
+    """
+    Создание канала инвалидации по настройке JWT_SESSION_CACHE.
+
+    Args:
+        replay: отдать при первом чтении уже накопленные события
+
+    Returns:
+        Новый экземпляр канала со своим курсором чтения
+    """
+    config = get_config()
+    channel_class = import_string(config['CHANNEL'])
+    return channel_class(**config['CHANNEL_OPTIONS'], replay=replay)
+
+
+def _publish(events: list[str]) -> None:
+    """
+    Рассылка событий инвалидации.
+
+    События получают кеш сессий и список отозванных токенов всех
+    воркеров, включая текущий, поэтому они публикуются даже
+    при выключенном кеше сессий.
+    """
+    global _publisher  # noqa: PLW0603
+    if not events:
+        return
+    session_cache = get_session_cache()
+    if session_cache is not None:
+        session_cache._apply(events)
+    if _publisher is None:
+        _publisher = build_channel()
+    _publisher.publish(events)
+
+
+def invalidate_session_tokens(token_hashes: list[str]) -> None:
+    """Отзыв сессий по хешам access токенов."""
+    _publish([
+        f'{TOKEN_EVENT}:{token_hash}'
+        for token_hash in token_hashes
+        if token_hash
+    ])
+
+
+def invalidate_user_sessions(user_id: int) -> None:
+    """Отзыв всех сессий пользователя."""
+    _publish([f'{USER_EVENT}:{user_id}'])
+
+
+def publish_user_state(user_id: int, is_active: bool) -> None:
+    """Рассылка признака is_active пользователя спискам отозванных токенов."""
+    _publish([f'{USER_STATE_EVENT}:{user_id}:{int(is_active)}'])
+
+
+def reset_session_cache() -> None:
+    """Сброс кеша (например, при изменении настроек в тестах)."""
+    global _session_cache, _publisher  # noqa: PLW0603
+    with _session_cache_lock:
+        _session_cache = None
+        _publisher = None
+
+
+def _build_session_cache():
+    """Создание кеша по настройке JWT_SESSION_CACHE."""
+    config = get_config()
+    if not config['ENABLED']:
+        return False
+    return SessionCache(
+        channel=build_channel(),
+        max_size=config['MAX_SIZE'],
+        ttl=config['TTL'],
+    )
@@ -0,0 +1,107 @@
+"""
+Обработчики сигналов приложения authentication.
+"""
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .engine import get_engine, reset_engine
+from .forward_auth import resolve_route
+from .keys import reset_key_ring
+from .models import AccessRule, BusinessElement, Role, Session, User, UserRole
+from .principal import reset_principal_cache
+from .revocation import reset_revocation_list
+from .session_cache import (
+    invalidate_session_tokens,
+    publish_user_state,
+    reset_session_cache,
+)
+from .utils import reset_verified_token_cache
+from .versions import bump_global_version, bump_user_versions, reset_versions
+
+
+@receiver(post_save, sender=Session)
+def invalidate_deactivated_session(sender, instance, **kwargs):
+    """Отзыв сессии, деактивированной через save() (например, в админке)."""
+    if not instance.is_active:
+        invalidate_session_tokens([instance.token_hash])
+
+
+@receiver(post_delete, sender=Session)
+def invalidate_deleted_session(sender, instance, **kwargs):
+    """Отзыв удаленной сессии."""
+    invalidate_session_tokens([instance.token_hash])
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=BusinessElement)
+@receiver(post_delete, sender=BusinessElement)
+@receiver(post_save, sender=AccessRule)
+@receiver(post_delete, sender=AccessRule)
+def bump_permissions_on_rules_change(sender, **kwargs):
+    """Устаревание матрицы прав и снимков прав всех пользователей."""
+    bump_global_version()
+    get_engine().invalidate()
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def bump_permissions_on_role_assignment(sender, instance, **kwargs):
+    """Устаревание снимка прав пользователя при назначении или отзыве роли."""
+    bump_user_versions([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def bump_permissions_on_user_created(sender, instance, created, **kwargs):
+    """Новому пользователю не достается снимок прав с тем же ID."""
+    if created:
+        bump_user_versions([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def publish_user_state_on_save(
+    sender, instance, created, update_fields, **kwargs,
+):
+    """
+    Рассылка признака is_active спискам отозванных токенов.
+
+    Событие уходит после коммита, чтобы откат транзакции
+    не оставил пользователя заблокированным.
+    """
+    if created and instance.is_active:
+        return
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    user_id, is_active = instance.pk, instance.is_active
+    transaction.on_commit(lambda: publish_user_state(user_id, is_active))
+
+
+@receiver(post_delete, sender=User)
+def publish_user_state_on_delete(sender, instance, **kwargs):
+    """Токены удаленного пользователя больше не принимаются."""
+    user_id = instance.pk
+    transaction.on_commit(lambda: publish_user_state(user_id, False))
+
+
+# Процессные кеши, зависящие от настройки
+SETTING_RESETS = {
+    'JWT_SESSION_CACHE': (
+        reset_session_cache, reset_revocation_list, reset_versions,
+    ),
+    'JWT_SESSION_VALIDATION': (reset_revocation_list,),
+    'JWT_REVOCATION_LIST': (reset_revocation_list,),
+    'JWT_VERIFIED_TOKEN_CACHE': (reset_verified_token_cache,),
+    'JWT_ACCEPT_SECRET_KEY_TOKENS': (reset_verified_token_cache,),
+    'JWT_SIGNING_KEYS': (reset_key_ring, reset_verified_token_cache),
+    'ROOT_URLCONF': (resolve_route.cache_clear,),
+    'PERMISSION_CACHE': (reset_principal_cache, reset_engine),
+}
+
+
+@receiver(setting_changed)
+def reset_caches_on_setting_change(setting, **kwargs):
+    """Пересоздание процессных кешей при изменении настроек (в тестах)."""
+    for reset in SETTING_RESETS.get(setting, ()):
+        reset()
@@ -1,13 +1,63 @@
 """
 Тесты для системы аутентификации и авторизации.
 """
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from server.common import metrics
+from server.common.django.queries import QueryInspector
 
-from .models import User, Role, UserRole, BusinessElement, AccessRule
-from .utils import generate_access_token, decode_token
+from . import principal as principal_module
+from . import versions
+from .compiled import compile_serializer
+from .engine import PermissionEngine, PermissionMatrix
+from .filters import ResourcePermissionFilterBackend
+from .masks import CREATE, DELETE, READ, READ_ALL, UPDATE, UPDATE_ALL
+from .metrics import AUTHENTICATIONS, PERMISSION_DECISIONS
+from .models import AccessRule, BusinessElement, Role, Session, User, UserRole
+from .permissions import HasResourcePermission
+from .policy import PolicyError, apply_diff, diff_policy, parse_policy
+from .principal import (
+    PrincipalCache,
+    build_principal,
+    get_principal,
+    principal_from_claims,
+)
+from .revocation import BloomFilter, RevocationList
+from .serializers import AccessRuleSerializer, RoleSerializer, UserSerializer
+from .session_cache import (
+    FileInvalidationChannel,
+    LocalInvalidationChannel,
+    SessionCache,
+    build_channel,
+    reset_session_cache,
+)
+from .utils import (
+    VerifiedTokenCache,
+    decode_token,
+    generate_access_token,
+    hash_token,
+)
+from .views import UserViewSet
 
 
 class UserModelTest(TestCase):
@@ -276,3 +326,2132 @@ class PermissionsTest(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SessionCacheTest(SimpleTestCase):
+    """Тесты для процессного кеша сессий."""
+
+    def test_token_invalidation_reaches_other_workers(self):
+        """Тест: отзыв токена в одном воркере виден в другом."""
+        worker_a = SessionCache(LocalInvalidationChannel())
+        worker_b = SessionCache(LocalInvalidationChannel())
+        expires_at = time.time() + 60
+        worker_a.add(1, 'hash', expires_at)
+        worker_b.add(1, 'hash', expires_at)
+
+        worker_a.invalidate_tokens(['hash'])
+
+        self.assertFalse(worker_a.contains(1, 'hash'))
+        self.assertFalse(worker_b.contains(1, 'hash'))
+
+    def test_user_invalidation(self):
+        """Тест: отзыв всех сессий пользователя."""
+        worker_a = SessionCache(LocalInvalidationChannel())
+        worker_b = SessionCache(LocalInvalidationChannel())
+        expires_at = time.time() + 60
+        worker_b.add(1, 'first', expires_at)
+        worker_b.add(1, 'second', expires_at)
+        worker_b.add(2, 'other', expires_at)
+
+        worker_a.invalidate_user(1)
+
+        self.assertFalse(worker_b.contains(1, 'first'))
+        self.assertFalse(worker_b.contains(1, 'second'))
+        self.assertTrue(worker_b.contains(2, 'other'))
+
+    def test_invalidation_during_lookup_is_not_overwritten(self):
+        """Тест: сессия, отозванная во время чтения БД, не кешируется."""
+        session_cache = SessionCache(LocalInvalidationChannel())
+        self.assertFalse(session_cache.contains(1, 'hash'))
+        generation = session_cache.generation
+
+        # Отзыв между чтением сессии из БД и add
+        session_cache.invalidate_tokens(['hash'])
+        session_cache.add(1, 'hash', time.time() + 60, generation)
+
+        self.assertFalse(session_cache.contains(1, 'hash'))
+
+    def test_entry_is_capped_by_token_exp(self):
+        """Тест: запись не живет дольше токена."""
+        session_cache = SessionCache(LocalInvalidationChannel(), ttl=60)
+        session_cache.add(1, 'hash', time.time() - 1)
+
+        self.assertFalse(session_cache.contains(1, 'hash'))
+
+    def test_size_is_bounded(self):
+        """Тест: вытеснение самых старых записей."""
+        session_cache = SessionCache(LocalInvalidationChannel(), max_size=2)
+        expires_at = time.time() + 60
+        for token_hash in ('a', 'b', 'c'):
+            session_cache.add(1, token_hash, expires_at)
+
+        self.assertEqual(len(session_cache), 2)
+        self.assertFalse(session_cache.contains(1, 'a'))
+
+    def test_file_channel(self):
+        """Тест: события передаются через файл журнала."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = f'{tmp_dir}/invalidation.log'
+            publisher = FileInvalidationChannel(path)
+            subscriber = FileInvalidationChannel(path)
+            self.assertEqual(subscriber.poll(), [])
+
+            publisher.publish(['t:hash', 'u:1'])
+
+            self.assertEqual(subscriber.poll(), ['t:hash', 'u:1'])
+            self.assertEqual(subscriber.poll(), [])
+
+
+class VerifiedTokenCacheTest(SimpleTestCase):
+    """Тесты для кеша проверенных токенов."""
+
+    def test_repeated_token_is_not_decoded_again(self):
+        """Тест: повторный токен берется из кеша вместе с хешем."""
+        verified_tokens = VerifiedTokenCache()
+        token, _ = generate_access_token(1)
+
+        first = verified_tokens.verify(token)
+        with mock.patch(
+            'server.apps.authentication.utils.decode_token'
+        ) as decode:
+            second = verified_tokens.verify(token)
+
+        decode.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(second[1], hash_token(token))
+        self.assertEqual(
+            verified_tokens.stats(), {'hits': 1, 'misses': 1, 'size': 1}
+        )
+
+    def test_entry_is_dropped_at_exp(self):
+        """Тест: после exp токен проверяется заново."""
+        verified_tokens = VerifiedTokenCache()
+        token, expires_at = generate_access_token(1)
+        verified_tokens.verify(token)
+
+        with mock.patch('time.time', return_value=expires_at.timestamp() + 1):
+            with mock.patch(
+                'server.apps.authentication.utils.decode_token'
+            ) as decode:
+                decode.return_value = {'exp': expires_at.timestamp() + 60}
+                verified_tokens.verify(token)
+
+        decode.assert_called_once_with(token)
+        self.assertEqual(verified_tokens.misses, 2)
+
+    def test_size_is_bounded(self):
+        """Тест: вытеснение самых старых записей."""
+        verified_tokens = VerifiedTokenCache(max_size=2)
+        for user_id in (1, 2, 3):
+            verified_tokens.verify(generate_access_token(user_id)[0])
+
+        self.assertEqual(len(verified_tokens), 2)
+
+
+def make_signing_key(kid, algorithm='RS256', **options):
+    """Элемент JWT_SIGNING_KEYS с новым ключом."""
+    if algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return {'KID': kid, 'ALGORITHM': algorithm, 'PRIVATE_KEY': pem, **options}
+
+
+class SigningKeysTest(APITestCase):
+    """Тесты для асимметричной подписи и JWKS."""
+
+    def test_token_is_signed_with_current_key(self):
+        """Тест: токен подписан действующим ключом и проверяется по JWKS."""
+        keys = [
+            make_signing_key('old', NOT_BEFORE='2020-01-01T00:00:00+00:00'),
+            make_signing_key(
+                'current', 'EdDSA', NOT_BEFORE='2021-01-01T00:00:00+00:00'
+            ),
+            make_signing_key('next', NOT_BEFORE='2999-01-01T00:00:00+00:00'),
+        ]
+        with override_settings(JWT_SIGNING_KEYS=keys):
+            token, _ = generate_access_token(1)
+            self.assertEqual(decode_token(token)['user_id'], 1)
+
+            response = self.client.get(
+                reverse('authentication:auth-jwks'),
+                HTTP_AUTHORIZATION='Bearer invalid',
+            )
+
+        self.assertEqual(jwt.get_unverified_header(token)['kid'], 'current')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('max-age=', response['Cache-Control'])
+        jwks = jwt.PyJWKSet.from_dict(response.json())
+        self.assertEqual(
+            {key.key_id for key in jwks.keys}, {'old', 'current', 'next'}
+        )
+        payload = jwt.decode(token, jwks['current'].key, algorithms=['EdDSA'])
+        self.assertEqual(payload['user_id'], 1)
+
+    def test_unknown_kid_is_rejected(self):
+        """Тест: токен с неизвестным kid не принимается."""
+        with override_settings(JWT_SIGNING_KEYS=[make_signing_key('removed')]):
+            token, _ = generate_access_token(1)
+        with override_settings(JWT_SIGNING_KEYS=[make_signing_key('other')]):
+            with self.assertRaises(jwt.InvalidTokenError):
+                decode_token(token)
+
+    def test_secret_key_tokens_can_be_disabled(self):
+        """Тест: после отключения HS256 токены без kid не принимаются."""
+        legacy_token, _ = generate_access_token(1)
+        keys = [make_signing_key('current')]
+        with override_settings(
+            JWT_SIGNING_KEYS=keys, JWT_ACCEPT_SECRET_KEY_TOKENS=False
+        ):
+            token, _ = generate_access_token(1)
+
+            self.assertEqual(decode_token(token)['user_id'], 1)
+            with self.assertRaises(jwt.InvalidTokenError):
+                decode_token(legacy_token)
+
+
+class IntrospectionAPITest(APITestCase):
+    """Тесты для интроспекции токенов."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        user_role = Role.objects.create(name='Пользователь', code='user')
+        products = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=user_role,
+            element=products,
+            read_all_permission=True,
+            update_permission=True,
+        )
+        self.gateway = User.objects.create_user(
+            email='gateway@example.com', password='TestPass123!'
+        )
+        UserRole.objects.create(user=self.gateway, role=admin_role)
+        self.user = User.objects.create_user(
+            email='user@example.com', password='TestPass123!'
+        )
+        UserRole.objects.create(user=self.user, role=user_role)
+
+    def tearDown(self):
+        """Сброс кешей, чтобы записи не пережили откат БД."""
+        reset_session_cache()
+        caches['default'].clear()
+
+    def login(self, email):
+        """Вход и получение access токена."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': email, 'password': 'TestPass123!'},
+            format='json',
+        )
+        return response.data['tokens']['access_token']
+
+    def introspect(self, data):
+        """Запрос интроспекции от имени gateway."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.login("gateway@example.com")}'
+        )
+        return self.client.post(
+            reverse('authentication:auth-introspect'), data, format='json'
+        )
+
+    def test_single_token(self):
+        """Тест: активный токен возвращает роли и права."""
+        token = self.login('user@example.com')
+
+        response = self.introspect({'token': token})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['active'])
+        self.assertEqual(response.data['user_id'], self.user.id)
+        self.assertEqual(response.data['roles'], ['user'])
+        self.assertEqual(
+            response.data['permissions'], {'products': ['read_all', 'update']}
+        )
+
+    def test_batch(self):
+        """Тест: пачка токенов, невалидный токен неактивен."""
+        token = self.login('user@example.com')
+
+        response = self.introspect({'tokens': [token, 'invalid', token]})
+
+        results = response.data['results']
+        self.assertEqual(
+            [result['active'] for result in results], [True, False, True]
+        )
+
+    def test_result_is_cached(self):
+        """Тест: повторная интроспекция берется из кеша."""
+        token = self.login('user@example.com')
+        self.introspect({'token': token})
+
+        with mock.patch(
+            'server.apps.authentication.introspection.introspect_token'
+        ) as check:
+            response = self.introspect({'token': token})
+
+        check.assert_not_called()
+        self.assertTrue(response.data['active'])
+
+    def test_requires_introspection_role(self):
+        """Тест: без роли из INTROSPECTION['ROLES'] - 403."""
+        token = self.login('user@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.post(
+            reverse('authentication:auth-introspect'),
+            {'token': token},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ForwardAuthTest(APITestCase):
+    """Тесты для forward auth endpoint."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.client = APIClient()
+        role = Role.objects.create(name='Пользователь', code='user')
+        products = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=role, element=products, read_all_permission=True
+        )
+        self.user = User.objects.create_user(
+            email='test@example.com', password='TestPass123!'
+        )
+        UserRole.objects.create(user=self.user, role=role)
+
+    def tearDown(self):
+        """Сброс кеша сессий, чтобы записи не пережили откат БД."""
+        reset_session_cache()
+
+    def check(self, method, uri, token=None):
+        """Подзапрос прокси."""
+        headers = {
+            'HTTP_X_FORWARDED_METHOD': method,
+            'HTTP_X_FORWARDED_URI': uri,
+        }
+        if token:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return self.client.get('/api/auth/check/', **headers)
+
+    def login(self):
+        """Вход и получение access токена."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'test@example.com', 'password': 'TestPass123!'},
+            format='json',
+        )
+        return response.data['tokens']['access_token']
+
+    def test_allowed_request(self):
+        """Тест: разрешенный запрос получает 204 с заголовками пользователя."""
+        response = self.check('GET', '/api/mock/products/?page=2', self.login())
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response['X-User-Id'], str(self.user.id))
+        self.assertEqual(response['X-Roles'], 'user')
+        self.assertEqual(response.content, b'')
+
+    def test_forbidden_request(self):
+        """Тест: запрос без права на элемент получает 403."""
+        response = self.check('DELETE', '/api/mock/products/1/', self.login())
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unauthenticated_request(self):
+        """Тест: анонимный запрос к ресурсу - 401, к открытому пути - 204."""
+        self.assertEqual(
+            self.check('GET', '/api/mock/products/').status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self.check('POST', '/api/auth/login/').status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(
+            self.check('GET', '/api/auth/me/', 'invalid').status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_public_paths_ignore_expired_token(self):
+        """Тест: истекший токен не закрывает вход, обновление токена и JWKS."""
+        issued_at = timezone.now() - timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=issued_at):
+            access_token = self.login()
+
+        for method, uri in (
+            ('GET', '/api/auth/jwks/'),
+            ('POST', '/api/auth/login/'),
+            ('POST', '/api/auth/refresh/'),
+        ):
+            response = self.check(method, uri, access_token)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertNotIn('X-User-Id', response)
+        self.assertEqual(
+            self.check('GET', '/api/mock/products/', access_token).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self.check('GET', '/api/auth/me/', access_token).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+
+class MetricsTest(APITestCase):
+    """Тесты для метрик Prometheus."""
+
+    def setUp(self):
+        """Подготовка тестовых данных и отдельного каталога метрик."""
+        self.client = APIClient()
+        role = Role.objects.create(name='Пользователь', code='user')
+        products = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=role, element=products, read_all_permission=True
+        )
+        user = User.objects.create_user(
+            email='test@example.com', password='TestPass123!'
+        )
+        UserRole.objects.create(user=user, role=role)
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(
+            override_settings(METRICS={'DIRECTORY': self.directory})
+        )
+        metrics.registry.clear()
+
+    def tearDown(self):
+        """Сброс кеша сессий и метрик."""
+        reset_session_cache()
+        metrics.registry.clear()
+
+    def login(self):
+        """Вход и получение access токена."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'test@example.com', 'password': 'TestPass123!'},
+            format='json',
+        )
+        return response.data['tokens']['access_token']
+
+    def test_authentication_and_permission_counters(self):
+        """Тест: исходы аутентификации и решения о доступе учитываются."""
+        url = reverse('authentication:mock-product-list')
+        access_token = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.client.get(url)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.client.get(url)
+        self.client.post(url, {'name': 'Продукт'}, format='json')
+
+        self.assertEqual(AUTHENTICATIONS.value(outcome='invalid'), 1)
+        self.assertEqual(AUTHENTICATIONS.value(outcome='success'), 2)
+        self.assertEqual(
+            PERMISSION_DECISIONS.value(
+                resource='products',
+                method='GET',
+                scope='view',
+                decision='allow',
+            ),
+            1,
+        )
+        self.assertEqual(
+            PERMISSION_DECISIONS.value(
+                resource='products',
+                method='POST',
+                scope='view',
+                decision='deny',
+            ),
+            1,
+        )
+        self.assertEqual(
+            metrics.REQUEST_DURATION.count(
+                route='authentication:mock-product-list', method='GET'
+            ),
+            2,
+        )
+        # Число запросов к БД - из замера QueryBudgetMiddleware
+        self.assertEqual(
+            metrics.REQUEST_QUERIES.count(
+                route='authentication:mock-product-list'
+            ),
+            3,
+        )
+
+    def test_endpoint_sums_workers(self):
+        """Тест: /metrics суммирует снимки всех воркеров."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()}')
+        self.client.get(reverse('authentication:mock-product-list'))
+        # Снимок другого воркера с теми же значениями
+        path = os.path.join(self.directory, '1.json')
+        with open(path, 'w', encoding='utf-8') as worker_file:
+            json.dump(metrics.registry.snapshot(), worker_file)
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            'rolegate_permission_decisions_total{resource="products",'
+            'method="GET",scope="view",decision="allow"} 2\n',
+            body,
+        )
+        self.assertIn(
+            'rolegate_http_request_duration_seconds_count'
+            '{route="authentication:mock-product-list",method="GET"} 2\n',
+            body,
+        )
+        self.assertIn(
+            'rolegate_cache_requests_total{cache="sessions",result="hit"}', body
+        )
+
+    def test_exited_workers_are_archived(self):
+        """Тест: счетчики завершившихся воркеров переносятся в архив."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()}')
+        self.client.get(reverse('authentication:mock-product-list'))
+        # Два завершившихся воркера с теми же значениями
+        for pid in (1, 2):
+            path = os.path.join(self.directory, f'{pid}.json')
+            with open(path, 'w', encoding='utf-8') as worker_file:
+                json.dump(metrics.registry.snapshot(), worker_file)
+            metrics.archive(pid, self.directory)
+
+        self.assertEqual(os.listdir(self.directory), [metrics.ARCHIVE_FILE])
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn(
+            'rolegate_http_request_duration_seconds_count'
+            '{route="authentication:mock-product-list",method="GET"} 3\n',
+            body,
+        )
+
+    def test_unknown_method_label(self):
+        """Тест: произвольный метод запроса не создает новую метку."""
+        self.client.generic(
+            'PROPFIND', reverse('authentication:mock-product-list')
+        )
+
+        self.assertEqual(
+            metrics.REQUEST_DURATION.count(
+                route='authentication:mock-product-list', method='other',
+            ),
+            1,
+        )
+
+
+@override_settings(QUERY_BUDGET={'SAMPLE_RATE': 1.0})
+class QueryBudgetTest(APITestCase):
+    """Тесты для бюджета запросов к БД."""
+
+    def setUp(self):
+        """Подготовка администратора."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=self.admin, role=admin_role)
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def test_budget_overrun_is_logged(self):
+        """Тест: превышение бюджета логируется с местами вызова."""
+        with mock.patch.object(UserViewSet, 'query_budget', 1, create=True):
+            with self.assertLogs('django.queries', 'WARNING') as logs:
+                response = self.client.get(reverse('authentication:user-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = logs.records[0].msg
+        self.assertEqual(event['event'], 'query_budget_exceeded')
+        self.assertEqual(event['route'], 'authentication:user-list')
+        self.assertEqual(event['budget'], 1)
+        self.assertGreater(event['queries'], 1)
+        self.assertTrue(event['sampled'])
+
+    def test_repeated_queries_are_detected(self):
+        """Тест: одинаковые по форме запросы находятся с местом вызова."""
+        inspector = QueryInspector(sampled=True)
+        with connection.execute_wrapper(inspector):
+            for user_id in range(5):
+                User.objects.filter(id=user_id).exists()
+            User.objects.filter(id__in=[1, 2]).exists()
+            User.objects.filter(id__in=[1, 2, 3]).exists()
+
+        repeated = inspector.repeated(threshold=2)
+        self.assertEqual(inspector.count, 7)
+        self.assertEqual([entry['count'] for entry in repeated], [5, 2])
+        self.assertIn('tests.py', repeated[0]['call_site'])
+        self.assertIn(
+            'test_repeated_queries_are_detected', repeated[0]['call_site']
+        )
+
+
+class SerializerQueryCountTest(APITestCase):
+    """Тесты: число запросов списков не зависит от размера страницы."""
+
+    def setUp(self):
+        """Подготовка администратора и прогрев кешей аутентификации."""
+        self.client = APIClient()
+        self.admin_role = Role.objects.create(
+            name='Администратор', code='admin'
+        )
+        admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=admin, role=self.admin_role)
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.client.get(reverse('authentication:auth-me'))
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def add_rows(self, count):
+        """Роли, элементы и пользователи с ролями и правилами."""
+        start = Role.objects.count()
+        for number in range(start, start + count):
+            role = Role.objects.create(
+                name=f'Роль {number}', code=f'role_{number}'
+            )
+            element = BusinessElement.objects.create(
+                name=f'Элемент {number}', code=f'el_{number}'
+            )
+            AccessRule.objects.create(
+                role=role, element=element, read_permission=True
+            )
+            user = User.objects.create_user(
+                email=f'user{number}@example.com', password='x'
+            )
+            UserRole.objects.create(user=user, role=role)
+            UserRole.objects.create(user=user, role=self.admin_role)
+
+    def assert_constant_queries(self, url_name, num):
+        """Одинаковое число запросов для страниц из 3 и 10 строк."""
+        url = reverse(f'authentication:{url_name}')
+        for rows in (2, 7):
+            self.add_rows(rows)
+            # Новые роли и правила меняют версию прав - прогреваем кеши
+            self.client.get(url)
+            with self.assertNumQueries(num):
+                response = self.client.get(url, {'page_size': 100})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_users_list(self):
+        """Тест: роли пользователей берутся из prefetch."""
+        response = self.assert_constant_queries('user-list', 5)
+
+        roles = response.data['results'][0]['roles']
+        self.assertEqual(
+            sorted(role['code'] for role in roles), ['admin', 'role_9']
+        )
+
+    def test_roles_list(self):
+        """Тест: users_count берется из аннотации."""
+        response = self.assert_constant_queries('role-list', 3)
+
+        counts = {
+            role['code']: role['users_count']
+            for role in response.data['results']
+        }
+        self.assertEqual(counts['admin'], 10)
+        self.assertEqual(counts['role_1'], 1)
+
+    def test_business_elements_list(self):
+        """Тест: rules_count берется из аннотации."""
+        response = self.assert_constant_queries('business-element-list', 3)
+
+        self.assertEqual(
+            {element['rules_count'] for element in response.data['results']},
+            {1},
+        )
+
+    def test_access_rules_list(self):
+        """Тест: правила из .values() совпадают с DRF сериализатором."""
+        response = self.assert_constant_queries('access-rule-list', 3)
+
+        rules = AccessRule.objects.select_related('role', 'element')
+        self.assertEqual(
+            response.data['results'],
+            AccessRuleSerializer(rules, many=True).data,
+        )
+
+    def test_me_without_compiled_serializer(self):
+        """Тест: без компиляции профиль отдает DRF сериализатор."""
+        url = reverse('authentication:auth-me')
+        expected = self.client.get(url).data
+
+        with mock.patch(
+            'server.apps.authentication.views.compile_serializer',
+            return_value=None,
+        ):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected)
+
+
+class CompiledSerializerTest(TestCase):
+    """Тесты: скомпилированные сериализаторы совпадают с DRF."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.role = Role.objects.create(name='Пользователь', code='user')
+        element = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=self.role, element=element, read_permission=True
+        )
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='x',
+            first_name='Иван',
+            last_name='Петров',
+        )
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def test_user(self):
+        """Тест: пользователь с ролями из prefetch."""
+        user = User.objects.prefetch_related('user_roles__role').get(
+            id=self.user.id
+        )
+
+        self.assertEqual(
+            compile_serializer(UserSerializer).to_representation(user),
+            UserSerializer(user).data,
+        )
+
+    def test_access_rule_from_values(self):
+        """Тест: правило из модели и из строки .values()."""
+        compiled = compile_serializer(AccessRuleSerializer)
+        rule = AccessRule.objects.select_related('role', 'element').get()
+        row = AccessRule.objects.values(*compiled.values_fields).get()
+
+        expected = AccessRuleSerializer(rule).data
+        self.assertEqual(compiled.to_representation(rule), expected)
+        self.assertEqual(compiled.from_values(row), expected)
+
+    def test_method_field_without_values(self):
+        """Тест: SerializerMethodField исключает ответ из .values()."""
+        compiled = compile_serializer(RoleSerializer)
+
+        self.assertIsNone(compiled.values_fields)
+        self.assertEqual(
+            compiled.to_representation(self.role),
+            RoleSerializer(self.role).data,
+        )
+
+
+class KeysetPaginationTest(APITestCase):
+    """Тесты для пагинации по курсору."""
+
+    def setUp(self):
+        """Подготовка администратора и пользователей с одинаковым created_at."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=admin, role=admin_role)
+        for number in range(6):
+            User.objects.create_user(
+                email=f'user{number}@example.com', password='x'
+            )
+        # Одинаковое время создания - порядок определяет id
+        User.objects.exclude(id=admin.id).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.url = reverse('authentication:user-list')
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def test_pages_follow_created_at_and_id(self):
+        """Тест: страницы по курсору проходят все строки без повторов."""
+        expected = list(
+            User.objects.order_by('-created_at', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+        ids = []
+        pages = []
+        response = self.client.get(
+            self.url, {'pagination': 'cursor', 'page_size': 3}
+        )
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            ids.extend(user['id'] for user in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(pages[1]['previous'])
+        self.assertEqual(previous.data['results'], pages[0]['results'])
+
+    def test_mixed_directions(self):
+        """Тест: поля с разным направлением сортировки."""
+        ordering = ('-created_at', 'id')
+        expected = list(
+            User.objects.order_by(*ordering).values_list('id', flat=True)
+        )
+
+        ids = []
+        pages = []
+        with mock.patch.object(UserViewSet, 'keyset_ordering', ordering):
+            response = self.client.get(
+                self.url, {'pagination': 'cursor', 'page_size': 2}
+            )
+            while True:
+                pages.append(response.data)
+                ids.extend(user['id'] for user in response.data['results'])
+                if response.data['next'] is None:
+                    break
+                response = self.client.get(response.data['next'])
+            previous = self.client.get(pages[2]['previous'])
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(previous.data['results'], pages[1]['results'])
+
+    def test_estimated_count(self):
+        """Тест: ?count=estimated возвращает оценку числа строк."""
+        response = self.client.get(
+            self.url, {'pagination': 'cursor', 'count': 'estimated'}
+        )
+
+        self.assertEqual(response.data['count'], 7)
+        self.assertTrue(response.data['count_estimated'])
+
+    def test_invalid_cursor(self):
+        """Тест: поврежденный курсор - 404."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExportTest(APITestCase):
+    """Тесты потоковой выгрузки."""
+
+    def setUp(self):
+        """Администратор и пользователь с ролью и правом на товары."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=admin, role=admin_role)
+        manager = Role.objects.create(name='Менеджер', code='manager')
+        products = BusinessElement.objects.create(
+            name='Товары', code='products'
+        )
+        AccessRule.objects.create(
+            role=manager,
+            element=products,
+            read_permission=True,
+            read_all_permission=True,
+        )
+        self.user = User.objects.create_user(
+            email='user@example.com', password='x'
+        )
+        UserRole.objects.create(user=self.user, role=manager, assigned_by=admin)
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def export(self, dataset, export_format):
+        """Ответ эндпоинта выгрузки."""
+        url = reverse(
+            'authentication:export',
+            kwargs={'dataset': dataset, 'export_format': export_format},
+        )
+        return self.client.get(url)
+
+    def test_users_ndjson(self):
+        """Тест: пользователи с ролями и эффективными правами."""
+        response = self.export('users', 'ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        user = next(row for row in rows if row['id'] == self.user.id)
+        self.assertEqual(user['roles'], ['manager'])
+        self.assertEqual(
+            user['permissions'], {'products': ['read', 'read_all']}
+        )
+        self.assertEqual(len(rows), 2)
+
+    def test_access_rules_csv(self):
+        """Тест: CSV с заголовком."""
+        response = self.export('access-rules', 'csv')
+
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['role'], 'manager')
+        self.assertEqual(rows[0]['read_all_permission'], 'True')
+
+    def test_csv_formulas_are_escaped(self):
+        """Тест: ячейки, похожие на формулы, экранируются только в CSV."""
+        formula = '=HYPERLINK("http://example.com")'
+        self.user.first_name = formula
+        self.user.last_name = '-1+2'
+        self.user.save()
+
+        content = b''.join(self.export('users', 'csv').streaming_content)
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        user = next(row for row in rows if row['id'] == str(self.user.id))
+        self.assertEqual(user['first_name'], f"'{formula}")
+        self.assertEqual(user['last_name'], "'-1+2")
+
+        content = b''.join(self.export('users', 'ndjson').streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        user = next(row for row in rows if row['id'] == self.user.id)
+        self.assertEqual(user['first_name'], formula)
+
+    def test_unknown_dataset(self):
+        """Тест: неизвестный набор данных - 404."""
+        self.assertEqual(
+            self.export('sessions', 'csv').status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_regular_user_forbidden(self):
+        """Тест: выгрузка недоступна без роли администратора."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'user@example.com', 'password': 'x'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+        self.assertEqual(
+            self.export('users', 'ndjson').status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+
+    def test_command(self):
+        """Тест: команда пишет ту же выгрузку в stdout."""
+        output = io.StringIO()
+        call_command(
+            'export_auth_data',
+            'user-roles',
+            '--format',
+            'csv',
+            '--chunk-size',
+            '1',
+            stdout=output,
+        )
+
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual([row['role'] for row in rows], ['admin', 'manager'])
+        self.assertEqual(rows[1]['assigned_by'], 'admin@example.com')
+
+
+class ImportUsersTest(TestCase):
+    """Тесты команды import_users."""
+
+    def setUp(self):
+        """Роли и временный каталог для файлов импорта."""
+        Role.objects.create(name='Пользователь', code='user')
+        Role.objects.create(name='Менеджер', code='manager')
+        User.objects.create_user(email='existing@example.com', password='x')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        """Файл импорта во временном каталоге."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_users(self, path, *args):
+        """Запуск команды без пула процессов."""
+        output = io.StringIO()
+        call_command(
+            'import_users', path, '--workers', '0', '--chunk-size', '2', *args,
+            stdout=output, stderr=output,
+        )
+        return output.getvalue()
+
+    def test_import_csv(self):
+        """Тест: пользователи, роли, хеши и пропуск существующих."""
+        password_hash = make_password('Hashed123!')
+        path = self.write('users.csv', (
+            'email,password,password_hash,first_name,roles\n'
+            'anna@example.com,Secret123!,,Анна,manager;user\n'
+            f'boris@example.com,,{password_hash},Борис,\n'
+            'existing@example.com,Secret123!,,,\n'
+            'not-an-email,Secret123!,,,\n'
+        ))
+
+        output = self.import_users(path)
+
+        anna = User.objects.get(email='anna@example.com')
+        boris = User.objects.get(email='boris@example.com')
+        self.assertTrue(anna.check_password('Secret123!'))
+        self.assertEqual(anna.first_name, 'Анна')
+        self.assertEqual(
+            sorted(anna.user_roles.values_list('role__code', flat=True)),
+            ['manager', 'user'],
+        )
+        self.assertEqual(boris.password, password_hash)
+        self.assertEqual(
+            list(boris.user_roles.values_list('role__code', flat=True)),
+            ['user'],
+        )
+        self.assertIn('создано 2, пропущено 1, ошибок 1', output)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_resume_from_checkpoint(self):
+        """Тест: повторный запуск продолжает с контрольной точки."""
+        path = self.write(
+            'users.ndjson',
+            ''.join(
+                json.dumps({
+                    'email': f'user{number}@example.com',
+                    'roles': ['manager'],
+                })
+                + '\n'
+                for number in range(5)
+            ),
+        )
+        with open(f'{path}.checkpoint', 'w', encoding='utf-8') as file:
+            json.dump({'input': os.path.abspath(path), 'processed': 3}, file)
+
+        self.import_users(path)
+
+        emails = set(
+            User.objects.filter(email__startswith='user').values_list(
+                'email', flat=True
+            )
+        )
+        self.assertEqual(emails, {'user3@example.com', 'user4@example.com'})
+        user = User.objects.get(email='user3@example.com')
+        self.assertFalse(user.has_usable_password())
+
+    def test_malformed_ndjson_rows(self):
+        """Тест: некорректные строки NDJSON учитываются как ошибки строк."""
+        path = self.write('users.ndjson', '\n'.join((
+            '{"email": "first@example.com"}',
+            '{"email": "broken@example.com",',
+            '{"email": "roles@example.com", "roles": 5}',
+            '["not", "an", "object"]',
+            '{"email": "last@example.com", "roles": ["manager"]}',
+        )) + '\n')
+
+        output = self.import_users(path)
+
+        imported = User.objects.exclude(email='existing@example.com')
+        self.assertEqual(
+            set(imported.values_list('email', flat=True)),
+            {'first@example.com', 'last@example.com'},
+        )
+        self.assertIn('Строка 2: некорректный JSON', output)
+        self.assertIn('Строка 3: roles должен быть списком кодов ролей', output)
+        self.assertIn('Строка 4: строка должна быть JSON объектом', output)
+        self.assertIn('создано 2, пропущено 0, ошибок 3', output)
+
+
+class PolicyTest(TestCase):
+    """Тесты декларативных политик доступа."""
+
+    def setUp(self):
+        """Политика с двумя ролями и двумя элементами."""
+        self.policy = {
+            'roles': [
+                {'code': 'manager', 'name': 'Менеджер'},
+                {'code': 'guest', 'name': 'Гость'},
+            ],
+            'elements': [
+                {'code': 'products', 'name': 'Товары'},
+                {'code': 'orders', 'name': 'Заказы'},
+            ],
+            'rules': {
+                'manager': {
+                    'products': ['read_all', 'create'],
+                    'orders': ['read'],
+                },
+                'guest': {'products': ['read_all']},
+            },
+        }
+
+    def apply(self, data, prune=False):
+        """Применение политики, возвращает разницу."""
+        diff = diff_policy(parse_policy(data), prune=prune)
+        apply_diff(diff)
+        return diff
+
+    def test_apply_then_unchanged(self):
+        """Тест: повторное применение - три запроса и ни одной записи."""
+        self.apply(self.policy)
+
+        rule = AccessRule.objects.get(
+            role__code='manager', element__code='products'
+        )
+        self.assertTrue(rule.read_all_permission and rule.create_permission)
+        self.assertFalse(rule.read_permission)
+        with self.assertNumQueries(3):
+            diff = diff_policy(parse_policy(self.policy))
+        self.assertFalse(diff)
+
+    def test_update_and_delete_rules(self):
+        """Тест: блок роли заменяет все ее правила."""
+        self.apply(self.policy)
+        self.policy['rules']['manager'] = {'products': ['read']}
+
+        diff = self.apply(self.policy)
+
+        self.assertEqual(diff.lines(), [
+            '~ rule manager/products: read_all, create -> read',
+            '- rule manager/orders',
+        ])
+        self.assertFalse(
+            AccessRule.objects.filter(
+                role__code='manager', element__code='orders'
+            ).exists()
+        )
+
+    def test_prune(self):
+        """Тест: роли вне политики удаляются только с prune."""
+        self.apply(self.policy)
+        del self.policy['roles'][1]
+        del self.policy['rules']['guest']
+
+        self.assertFalse(self.apply(self.policy))
+        self.assertEqual(
+            self.apply(self.policy, prune=True).delete_roles, ['guest']
+        )
+        self.assertFalse(Role.objects.filter(code='guest').exists())
+
+    def test_single_version_bump(self):
+        """Тест: удаление роли с пользователями - одна смена версий."""
+        self.apply(self.policy)
+        guest = Role.objects.get(code='guest')
+        for number in range(3):
+            user = User.objects.create_user(
+                email=f'guest{number}@example.com', password='x'
+            )
+            UserRole.objects.create(user=user, role=guest)
+        del self.policy['roles'][1]
+        del self.policy['rules']['guest']
+
+        with mock.patch.object(
+            versions, '_new_version', return_value='v'
+        ) as new_version:
+            self.apply(self.policy, prune=True)
+
+        # Одна глобальная версия: новая эпоха заменяет и версии пользователей
+        self.assertEqual(new_version.call_count, 1)
+
+    def test_invalid_policy(self):
+        """Тест: неизвестное право или роль - PolicyError."""
+        self.policy['rules']['manager']['orders'] = ['fly']
+        with self.assertRaises(PolicyError):
+            parse_policy(self.policy)
+
+        self.policy['rules'] = {'admin': {'orders': []}}
+        with self.assertRaises(PolicyError):
+            diff_policy(parse_policy(self.policy))
+
+    def test_dry_run_command(self):
+        """Тест: --dry-run выводит изменения и ничего не пишет."""
+        with tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', suffix='.json', delete=False
+        ) as file:
+            json.dump(self.policy, file)
+        self.addCleanup(os.remove, file.name)
+        output = io.StringIO()
+
+        call_command('apply_policy', file.name, '--dry-run', stdout=output)
+
+        self.assertIn(
+            '+ rule manager/products: read_all, create', output.getvalue()
+        )
+        self.assertFalse(Role.objects.exists())
+
+
+class BulkRoleAssignmentTest(APITestCase):
+    """Тесты массового назначения и отзыва ролей."""
+
+    def setUp(self):
+        """Администратор, роли и пользователи отдела."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=self.admin, role=admin_role)
+        self.manager = Role.objects.create(name='Менеджер', code='manager')
+        self.guest = Role.objects.create(name='Гость', code='guest')
+        self.users = [
+            User.objects.create_user(
+                email=f'user{number}@sales.example.com', password='x'
+            )
+            for number in range(3)
+        ]
+        UserRole.objects.create(user=self.users[0], role=self.manager)
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def post(self, name, data):
+        """POST на действие UserViewSet."""
+        return self.client.post(
+            reverse(f'authentication:user-{name}'), data, format='json'
+        )
+
+    def test_assign_pairs(self):
+        """Тест: результат для каждой пары."""
+        response = self.post('bulk-assign-roles', {'pairs': [
+            {'user_id': self.users[0].id, 'role_id': self.manager.id},
+            {'user_id': self.users[1].id, 'role_id': self.manager.id},
+            {'user_id': self.users[1].id, 'role_id': 999999},
+            {'user_id': 999999, 'role_id': self.manager.id},
+        ]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [
+                'already_assigned',
+                'assigned',
+                'role_not_found',
+                'user_not_found',
+            ],
+        )
+        self.assertEqual(response.data['summary']['assigned'], 1)
+        assignment = UserRole.objects.get(user=self.users[1], role=self.manager)
+        self.assertEqual(assignment.assigned_by, self.admin)
+
+    def test_assign_by_email_domain(self):
+        """Тест: роли пользователям домена за постоянное число запросов."""
+        # Прогрев кешей аутентификации
+        self.client.get(reverse('authentication:auth-me'))
+        with self.assertNumQueries(8):
+            response = self.post('bulk-assign-roles', {
+                'email_domain': 'sales.example.com',
+                'role_ids': [self.manager.id, self.guest.id],
+            })
+
+        self.assertEqual(
+            response.data['summary'], {'assigned': 5, 'already_assigned': 1}
+        )
+        self.assertEqual(
+            UserRole.objects.filter(
+                user__email__endswith='@sales.example.com'
+            ).count(),
+            6,
+        )
+
+    def test_revoke_bumps_versions_once(self):
+        """Тест: отзыв одним удалением и одна смена версий пользователей."""
+        self.post(
+            'bulk-assign-roles',
+            {
+                'user_ids': [user.id for user in self.users],
+                'role_ids': [self.guest.id],
+            },
+        )
+
+        with mock.patch.object(
+            versions, 'bump_user_versions', wraps=versions.bump_user_versions
+        ) as bump:
+            response = self.post('bulk-revoke-roles', {
+                'user_ids': [user.id for user in self.users],
+                'role_ids': [self.guest.id, self.manager.id],
+            })
+
+        self.assertEqual(
+            response.data['summary'], {'revoked': 4, 'not_assigned': 2}
+        )
+        self.assertFalse(UserRole.objects.filter(user__in=self.users).exists())
+        bump.assert_called_once()
+        self.assertEqual(
+            set(bump.call_args.args[0]), {user.id for user in self.users}
+        )
+
+    def test_invalid_request(self):
+        """Тест: нужна выборка пользователей вместе с role_ids."""
+        response = self.post(
+            'bulk-assign-roles', {'role_ids': [self.manager.id]}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkAccessRuleUpsertTest(APITestCase):
+    """Тесты массового изменения матрицы прав."""
+
+    def setUp(self):
+        """Администратор, роль менеджера и три бизнес-элемента."""
+        self.client = APIClient()
+        admin_role = Role.objects.create(name='Администратор', code='admin')
+        admin = User.objects.create_user(
+            email='admin@example.com', password='AdminPass123!'
+        )
+        UserRole.objects.create(user=admin, role=admin_role)
+        self.manager = Role.objects.create(name='Менеджер', code='manager')
+        self.elements = [
+            BusinessElement.objects.create(
+                name=f'Элемент {number}', code=f'el_{number}'
+            )
+            for number in range(3)
+        ]
+        AccessRule.objects.create(
+            role=self.manager,
+            element=self.elements[0],
+            read_permission=True,
+            create_permission=True,
+        )
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'admin@example.com', 'password': 'AdminPass123!'},
+            format='json',
+        )
+        access_token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.url = reverse('authentication:access-rule-bulk-upsert')
+
+    def tearDown(self):
+        """Сброс кеша сессий."""
+        reset_session_cache()
+
+    def test_upsert(self):
+        """Тест: новые ячейки вставляются, в старых меняются права."""
+        with mock.patch.object(
+            versions, '_new_version', return_value='v'
+        ) as new_version:
+            response = self.client.post(
+                self.url,
+                {
+                    'rules': [
+                        {
+                            'role': self.manager.id,
+                            'element': self.elements[0].id,
+                            'read_all_permission': True,
+                        },
+                        {
+                            'role': self.manager.id,
+                            'element': self.elements[1].id,
+                            'read_permission': True,
+                        },
+                        {
+                            'role': self.manager.id,
+                            'element': self.elements[2].id,
+                        },
+                    ]
+                },
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(new_version.call_count, 1)
+        results = {rule['element']: rule for rule in response.data['results']}
+        self.assertEqual(len(results), 3)
+        first = results[self.elements[0].id]
+        self.assertTrue(
+            first['read_permission']
+            and first['create_permission']
+            and first['read_all_permission']
+        )
+        self.assertTrue(results[self.elements[1].id]['read_permission'])
+        self.assertFalse(results[self.elements[2].id]['read_permission'])
+        self.assertEqual(AccessRule.objects.count(), 3)
+
+    def test_upsert_without_compiled_serializer(self):
+        """Тест: без компиляции ответ строит DRF сериализатор."""
+        data = {
+            'rules': [
+                {
+                    'role': self.manager.id,
+                    'element': self.elements[1].id,
+                    'read_permission': True,
+                },
+            ]
+        }
+        expected = self.client.post(self.url, data, format='json').data
+
+        with mock.patch(
+            'server.apps.authentication.views.compile_serializer',
+            return_value=None,
+        ):
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Повторный upsert меняет только updated_at
+        self.assertEqual(
+            [{**rule, 'updated_at': None} for rule in response.data['results']],
+            [{**rule, 'updated_at': None} for rule in expected['results']],
+        )
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_upsert_applies_to_permissions(self):
+        """Тест: движок прав видит изменения сразу."""
+        engine = PermissionEngine(check_interval=60)
+        self.assertFalse(
+            engine.has_permission([self.manager.id], 'el_1', 'GET')
+        )
+
+        self.client.post(
+            self.url,
+            {
+                'rules': [
+                    {
+                        'role': self.manager.id,
+                        'element': self.elements[1].id,
+                        'read_all_permission': True,
+                    },
+                ]
+            },
+            format='json',
+        )
+        engine.invalidate()
+
+        self.assertTrue(engine.has_permission([self.manager.id], 'el_1', 'GET'))
+
+    def test_unknown_element(self):
+        """Тест: неизвестный бизнес-элемент - 400 и никаких изменений."""
+        response = self.client.post(
+            self.url,
+            {
+                'rules': [
+                    {
+                        'role': self.manager.id,
+                        'element': 999999,
+                        'read_permission': True,
+                    },
+                ]
+            },
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(AccessRule.objects.count(), 1)
+
+
+class AccessRuleMaskTest(TestCase):
+    """Тесты хранения прав маской."""
+
+    def setUp(self):
+        """Роль и два правила с разными правами."""
+        role = Role.objects.create(name='Менеджер', code='manager')
+        self.reader = AccessRule.objects.create(
+            role=role,
+            element=BusinessElement.objects.create(
+                name='Товары', code='products'
+            ),
+            read_permission=True,
+            read_all_permission=True,
+        )
+        self.writer = AccessRule.objects.create(
+            role=role,
+            element=BusinessElement.objects.create(
+                name='Заказы', code='orders'
+            ),
+            create_permission=True,
+            update_permission=True,
+        )
+
+    def test_flags(self):
+        """Тест: булевы права читаются и пишутся битами маски."""
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.permissions, READ | READ_ALL)
+
+        self.reader.read_permission = False
+        self.reader.delete_permission = True
+        self.reader.save()
+        self.reader.refresh_from_db()
+
+        self.assertEqual(self.reader.permissions, READ_ALL | DELETE)
+        self.assertFalse(self.reader.read_permission)
+        self.assertTrue(self.reader.delete_permission)
+
+    def test_granting(self):
+        """Тест: фильтры по всем и хотя бы одному праву из маски."""
+        self.assertEqual(
+            list(AccessRule.objects.granting(READ | READ_ALL)), [self.reader]
+        )
+        self.assertEqual(list(AccessRule.objects.granting(READ | CREATE)), [])
+        self.assertEqual(
+            set(AccessRule.objects.granting_any(READ | CREATE)),
+            {self.reader, self.writer},
+        )
+        self.assertEqual(list(AccessRule.objects.granting_any(UPDATE_ALL)), [])
+
+
+class SessionRevocationAPITest(APITestCase):
+    """Тесты отзыва закешированных сессий."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='TestPass123!',
+        )
+
+    def tearDown(self):
+        """Сброс кеша сессий, чтобы записи не пережили откат БД."""
+        reset_session_cache()
+
+    def login(self):
+        """Вход и получение пары токенов."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'test@example.com', 'password': 'TestPass123!'},
+            format='json',
+        )
+        return response.data['tokens']
+
+    def get_me(self, access_token):
+        """Запрос профиля с указанным токеном."""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        return self.client.get(reverse('authentication:auth-me'))
+
+    def test_logout_revokes_cached_session(self):
+        """Тест: после выхода закешированный токен не принимается."""
+        tokens = self.login()
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code, status.HTTP_200_OK
+        )
+
+        self.client.post(reverse('authentication:auth-logout'))
+
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    @override_settings(REQUEST_TIMING={'SERVER_TIMING_HEADER': True})
+    def test_server_timing_header(self):
+        """Тест: время фаз запроса отдается в заголовке Server-Timing."""
+        tokens = self.login()
+        self.client = APIClient()
+
+        response = self.get_me(tokens['access_token'])
+
+        server_timing = response['Server-Timing'].split(', ')
+        phases = [item.split(';')[0] for item in server_timing]
+        expected = (
+            'token', 'session', 'user', 'principal',
+            'serialize', 'view', 'render', 'total',
+        )
+        for name in expected:
+            self.assertIn(name, phases)
+
+    def test_refresh_revokes_previous_access_token(self):
+        """Тест: после обновления старый access токен не принимается."""
+        tokens = self.login()
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code, status.HTTP_200_OK
+        )
+
+        # Сдвигаем время, чтобы новый токен отличался от старого
+        later = timezone.now() + timedelta(seconds=5)
+        self.client.credentials()
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.client.post(
+                reverse('authentication:auth-refresh'),
+                {'refresh_token': tokens['refresh_token']},
+                format='json',
+            )
+
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_admin_deactivation_revokes_cached_session(self):
+        """Тест: деактивация сессии через save() отзывает ее из кеша."""
+        tokens = self.login()
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code, status.HTTP_200_OK
+        )
+
+        session = Session.objects.get(
+            token_hash=hash_token(tokens['access_token'])
+        )
+        session.is_active = False
+        session.save()
+
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+
+@override_settings(JWT_SESSION_VALIDATION='revocation')
+class RevocationModeAPITest(SessionRevocationAPITest):
+    """Тесты отзыва сессий в режиме без обращения к БД."""
+
+    def setUp(self):
+        """Отдельный журнал канала, чтобы события других тестов не мешали."""
+        super().setUp()
+        tmp_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JWT_SESSION_CACHE={
+            'ENABLED': False,
+            'CHANNEL_OPTIONS': {'path': f'{tmp_dir}/invalidation.log'},
+        }))
+
+    def test_session_table_is_not_queried(self):
+        """Тест: токен проверяется без поиска сессии в БД."""
+        tokens = self.login()
+        Session.objects.filter(user=self.user).update(token_hash='unknown')
+
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code, status.HTTP_200_OK
+        )
+
+    def test_delete_account_revokes_tokens(self):
+        """Тест: после удаления аккаунта токен не принимается."""
+        tokens = self.login()
+        self.get_me(tokens['access_token'])
+
+        self.client.delete(reverse('authentication:auth-me'))
+
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_user_is_not_queried(self):
+        """Тест: повторный запрос с токеном не обращается к БД."""
+        access_token = self.login()['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        url = reverse('authentication:mock-product-list')
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.get_me(access_token)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_user_deactivation_revokes_tokens(self):
+        """Тест: токены неактивного пользователя не принимаются."""
+        tokens = self.login()
+        self.get_me(tokens['access_token'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(
+            self.get_me(tokens['access_token']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        response = self.get_me(tokens['access_token'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RevocationListTest(SimpleTestCase):
+    """Тесты для списка отозванных токенов."""
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Тест: добавленные хеши всегда находятся фильтром."""
+        bloom = BloomFilter(capacity=100, error_rate=0.01)
+        token_hashes = [hash_token(str(number)) for number in range(100)]
+        for token_hash in token_hashes:
+            bloom.add(token_hash)
+
+        self.assertTrue(all(token_hash in bloom for token_hash in token_hashes))
+        self.assertNotIn(hash_token('other'), bloom)
+
+    def test_revocation_reaches_other_workers(self):
+        """Тест: отозванный токен виден воркеру, запущенному позже."""
+        worker_a = RevocationList(
+            LocalInvalidationChannel(replay=True), lifetime=60
+        )
+        worker_a.channel.publish([f't:{hash_token("token")}'])
+        worker_b = RevocationList(
+            LocalInvalidationChannel(replay=True), lifetime=60
+        )
+
+        self.assertTrue(worker_a.is_revoked(hash_token('token')))
+        self.assertTrue(worker_b.is_revoked(hash_token('token')))
+        self.assertFalse(worker_b.is_revoked(hash_token('live')))
+
+    def test_expired_entries_are_purged(self):
+        """Тест: записи удаляются после истечения токена."""
+        revocation_list = RevocationList(
+            LocalInvalidationChannel(), lifetime=60
+        )
+        revocation_list.revoke([hash_token('old')], expires_at=time.time() - 1)
+        revocation_list.revoke([hash_token('new')])
+
+        revocation_list.purge()
+
+        self.assertEqual(len(revocation_list), 1)
+        self.assertFalse(revocation_list.is_revoked(hash_token('old')))
+        self.assertTrue(revocation_list.is_revoked(hash_token('new')))
+
+
+class PrincipalTest(APITestCase):
+    """Тесты для скомпилированного снимка прав."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.client = APIClient()
+        self.role = Role.objects.create(name='Пользователь', code='user')
+        self.guest_role = Role.objects.create(name='Гость', code='guest')
+        self.products = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=self.role,
+            element=self.products,
+            read_all_permission=True,
+            update_permission=True,
+        )
+        AccessRule.objects.create(
+            role=self.guest_role,
+            element=self.products,
+            create_permission=True,
+        )
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            password='TestPass123!',
+        )
+        self.user_role = UserRole.objects.create(user=self.user, role=self.role)
+        UserRole.objects.create(user=self.user, role=self.guest_role)
+
+    def tearDown(self):
+        """Сброс кеша сессий, чтобы записи не пережили откат БД."""
+        reset_session_cache()
+
+    def authenticate(self):
+        """Вход и установка заголовка Authorization."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'test@example.com', 'password': 'TestPass123!'},
+            format='json',
+        )
+        token = response.data['tokens']['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_build_principal_merges_roles(self):
+        """Тест: маски нескольких ролей объединяются."""
+        principal = build_principal(self.user.id)
+
+        self.assertEqual(principal.role_codes, frozenset({'user', 'guest'}))
+        self.assertEqual(principal.mask('products'), READ_ALL | UPDATE | CREATE)
+        self.assertEqual(principal.mask('orders'), 0)
+
+    def test_warm_request_has_no_authorization_queries(self):
+        """Тест: теплый запрос загружает только пользователя."""
+        self.authenticate()
+        url = reverse('authentication:mock-product-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_revocation_invalidates_principal(self):
+        """Тест: отзыв роли сразу отражается в правах."""
+        self.authenticate()
+        url = reverse('authentication:mock-product-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user_role.delete()
+
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_role_revocation_invalidates_principal_in_other_workers(self):
+        """Тест: отзыв роли в одном воркере устаревает снимок в другом."""
+        tmp_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JWT_SESSION_CACHE={
+            'CHANNEL_OPTIONS': {'path': f'{tmp_dir}/invalidation.log'},
+        }))
+        # Второй воркер: свои кеш снимков и состояние версий,
+        # общий только журнал канала
+        other_cache = PrincipalCache()
+        other_worker = versions.VersionState(build_channel(replay=True))
+
+        def other_principal():
+            with (
+                mock.patch.object(versions, '_state', other_worker),
+                mock.patch.object(
+                    principal_module, '_principal_cache', other_cache
+                ),
+            ):
+                return get_principal(self.user.id)
+
+        self.assertEqual(other_principal().role_codes, {'user', 'guest'})
+        self.user_role.delete()
+
+        self.assertEqual(other_principal().role_codes, {'guest'})
+
+
+class PermissionEngineTest(TestCase):
+    """Тесты для движка прав на основе матрицы."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.user_role = Role.objects.create(name='Пользователь', code='user')
+        self.admin_role = Role.objects.create(
+            name='Администратор', code='admin'
+        )
+        self.orders = BusinessElement.objects.create(
+            name='Заказы', code='orders'
+        )
+        self.rule = AccessRule.objects.create(
+            role=self.user_role,
+            element=self.orders,
+            read_permission=True,
+            update_permission=True,
+        )
+        AccessRule.objects.create(
+            role=self.admin_role,
+            element=self.orders,
+            read_all_permission=True,
+            delete_all_permission=True,
+        )
+
+    def test_matrix_ors_role_masks(self):
+        """Тест: маска нескольких ролей - ИЛИ масок ячеек."""
+        matrix = PermissionMatrix(
+            role_codes={1: 'user', 5: 'admin'},
+            element_codes={10: 'orders', 20: 'products'},
+            rules=[(1, 10, READ | UPDATE), (5, 10, READ_ALL), (5, 20, CREATE)],
+            version='1',
+        )
+
+        self.assertEqual(
+            matrix.mask({1, 5}, 'orders'), READ | UPDATE | READ_ALL
+        )
+        self.assertEqual(matrix.mask({1}, 'products'), 0)
+        self.assertEqual(matrix.mask({1, 99}, 'unknown'), 0)
+        self.assertEqual(
+            matrix.masks({5}), {'orders': READ_ALL, 'products': CREATE}
+        )
+        self.assertTrue(matrix.has_role({1, 5}, 'admin'))
+
+    def test_object_permission_decisions(self):
+        """Тест: права на свои и на все объекты."""
+        engine = PermissionEngine()
+        user_roles = {self.user_role.id}
+
+        self.assertTrue(engine.has_permission(user_roles, 'orders', 'GET'))
+        self.assertFalse(engine.has_permission(user_roles, 'orders', 'POST'))
+        self.assertTrue(
+            engine.has_object_permission(
+                user_roles, 'orders', 'PUT', is_owner=True
+            )
+        )
+        self.assertFalse(
+            engine.has_object_permission(
+                user_roles, 'orders', 'PUT', is_owner=False
+            )
+        )
+        self.assertTrue(
+            engine.has_object_permission(
+                {self.admin_role.id}, 'orders', 'DELETE', is_owner=False
+            ),
+        )
+        self.assertFalse(engine.has_role(user_roles, 'admin'))
+
+    def test_reload_on_rule_change(self):
+        """Тест: изменение правила пересобирает матрицу."""
+        engine = PermissionEngine(check_interval=0)
+        user_roles = {self.user_role.id}
+        self.assertFalse(engine.mask(user_roles, 'orders') & UPDATE_ALL)
+
+        self.rule.update_all_permission = True
+        self.rule.save()
+
+        self.assertTrue(engine.mask(user_roles, 'orders') & UPDATE_ALL)
+        self.assertFalse(engine.mask(user_roles, 'orders') & DELETE)
+
+    def test_rule_change_reloads_matrix_in_other_workers(self):
+        """Тест: изменение правила пересобирает матрицу и в другом воркере."""
+        tmp_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JWT_SESSION_CACHE={
+            'CHANNEL_OPTIONS': {'path': f'{tmp_dir}/invalidation.log'},
+        }))
+        user_roles = {self.user_role.id}
+        # Второй воркер: свои движок и состояние версий,
+        # общий только журнал канала
+        other_engine = PermissionEngine(check_interval=0)
+        other_worker = versions.VersionState(build_channel(replay=True))
+        self.enterContext(mock.patch.object(versions, '_state', other_worker))
+        self.assertFalse(other_engine.mask(user_roles, 'orders') & UPDATE_ALL)
+
+        with mock.patch.object(versions, '_state', None):
+            self.rule.update_all_permission = True
+            self.rule.save()
+
+        self.assertTrue(other_engine.mask(user_roles, 'orders') & UPDATE_ALL)
+
+
+class ResourcePermissionFilterBackendTest(TestCase):
+    """Тесты для фильтрации выборок по правам."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.element = BusinessElement.objects.create(
+            name='Сессии', code='sessions'
+        )
+        self.owner_role = Role.objects.create(name='Владелец', code='owner')
+        self.auditor_role = Role.objects.create(name='Аудитор', code='auditor')
+        self.guest_role = Role.objects.create(name='Гость', code='guest')
+        AccessRule.objects.create(
+            role=self.owner_role, element=self.element, read_permission=True
+        )
+        AccessRule.objects.create(
+            role=self.auditor_role,
+            element=self.element,
+            read_all_permission=True,
+        )
+
+        self.users = {}
+        for role in (self.owner_role, self.auditor_role, self.guest_role):
+            user = User.objects.create_user(
+                email=f'{role.code}@example.com', password='test'
+            )
+            UserRole.objects.create(user=user, role=role)
+            Session.objects.create(
+                user=user,
+                token_hash=f'{role.code}-access',
+                refresh_token_hash=f'{role.code}-refresh',
+                expires_at=timezone.now(),
+                refresh_expires_at=timezone.now(),
+            )
+            self.users[role.code] = user
+
+        self.view = type(
+            'SessionView',
+            (),
+            {'resource_code': 'sessions', 'owner_field': 'user'},
+        )()
+
+    def filter_for(self, role_code):
+        """Выборка сессий, доступная пользователю с ролью."""
+        request = APIRequestFactory().get('/')
+        request.user = self.users[role_code]
+        return ResourcePermissionFilterBackend().filter_queryset(
+            request, Session.objects.all(), self.view,
+        )
+
+    def test_read_all_is_unfiltered(self):
+        """Тест: read_all видит все объекты."""
+        self.assertEqual(self.filter_for('auditor').count(), 3)
+
+    def test_read_own_is_filtered_by_owner(self):
+        """Тест: read видит только свои объекты."""
+        queryset = self.filter_for('owner')
+
+        self.assertEqual(
+            list(queryset.values_list('user_id', flat=True)),
+            [self.users['owner'].id],
+        )
+        self.assertIn('"user_id" =', str(queryset.query))
+
+    def test_no_permission_is_empty(self):
+        """Тест: без прав выборка пуста."""
+        queryset = self.filter_for('guest')
+
+        self.assertTrue(queryset.query.is_empty())
+
+
+class BulkObjectPermissionTest(TestCase):
+    """Тесты для пакетной проверки прав на объекты."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        element = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        role = Role.objects.create(name='Пользователь', code='user')
+        AccessRule.objects.create(
+            role=role,
+            element=element,
+            read_all_permission=True,
+            update_permission=True,
+        )
+        self.user = User.objects.create_user(
+            email='user@example.com', password='test'
+        )
+        UserRole.objects.create(user=self.user, role=role)
+        self.view = type(
+            'ProductView',
+            (),
+            {'resource_code': 'products', 'owner_field': 'owner'},
+        )()
+        self.request = APIRequestFactory().get('/')
+        self.request.user = self.user
+
+    def check(self, **kwargs):
+        """Пакетная проверка прав."""
+        return HasResourcePermission().has_bulk_object_permission(
+            self.request, self.view, **kwargs
+        )
+
+    def test_all_permission_allows_every_object(self):
+        """Тест: read_all разрешает все объекты."""
+        self.assertEqual(
+            self.check(owner_ids=[self.user.id, 0, 42]), [True, True, True]
+        )
+
+    def test_own_permission_compares_owner_ids(self):
+        """Тест: update разрешает только свои объекты."""
+        objects = [{'owner': self.user.id}, {'owner': 0}, {'owner': self.user}]
+
+        self.assertEqual(
+            self.check(objects=objects, method='PUT'), [True, False, True]
+        )
+
+    def test_no_permission_denies_every_object(self):
+        """Тест: без delete/delete_all все объекты запрещены."""
+        self.assertEqual(
+            self.check(owner_ids=[self.user.id], method='DELETE'), [False]
+        )
+
+
+@override_settings(JWT_EMBED_PERMISSIONS=True)
+class PermissionClaimsTest(APITestCase):
+    """Тесты для прав, встроенных в access токен."""
+
+    def setUp(self):
+        """Подготовка тестовых данных."""
+        self.client = APIClient()
+        self.role = Role.objects.create(name='Пользователь', code='user')
+        self.manager_role = Role.objects.create(name='Менеджер', code='manager')
+        element = BusinessElement.objects.create(
+            name='Продукты', code='products'
+        )
+        AccessRule.objects.create(
+            role=self.role, element=element, read_all_permission=True
+        )
+        self.user = User.objects.create_user(
+            email='user@example.com', password='TestPass123!'
+        )
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def tearDown(self):
+        """Сброс кеша сессий, чтобы записи не пережили откат БД."""
+        reset_session_cache()
+
+    def login_payload(self):
+        """Вход и декодирование выданного access токена."""
+        response = self.client.post(
+            reverse('authentication:auth-login'),
+            {'email': 'user@example.com', 'password': 'TestPass123!'},
+            format='json',
+        )
+        return decode_token(response.data['tokens']['access_token'])
+
+    def test_token_contains_permission_claims(self):
+        """Тест: токен содержит роли, маски прав и версию."""
+        payload = self.login_payload()
+
+        self.assertEqual(payload['roles'], ['user'])
+        self.assertEqual(payload['perms'], {'products': READ_ALL})
+        principal = principal_from_claims(payload)
+        self.assertEqual(principal.mask('products'), READ_ALL)
+
+    def test_role_assignment_outdates_claims(self):
+        """Тест: назначение роли делает claims токена неактуальными."""
+        payload = self.login_payload()
+
+        UserRole.objects.create(user=self.user, role=self.manager_role)
+
+        self.assertIsNone(principal_from_claims(payload))
+
+    def test_role_revocation_outdates_claims_in_other_workers(self):
+        """Тест: после отзыва роли claims устаревают и в другом воркере."""
+        tmp_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JWT_SESSION_CACHE={
+            'CHANNEL_OPTIONS': {'path': f'{tmp_dir}/invalidation.log'},
+        }))
+        payload = self.login_payload()
+        # Второй воркер: свое состояние версий, общий только журнал канала
+        other_worker = versions.VersionState(build_channel(replay=True))
+
+        with mock.patch.object(versions, '_state', other_worker):
+            self.assertIsNotNone(principal_from_claims(payload))
+        UserRole.objects.filter(user=self.user).delete()
+        with mock.patch.object(versions, '_state', other_worker):
+            self.assertIsNone(principal_from_claims(payload))
+
+    def test_lost_events_start_new_epoch(self):
+        """Тест: при потере событий старые версии устаревают."""
+        payload = self.login_payload()
+        state = versions._get_state()  # noqa: SLF001
+
+        with mock.patch.object(state.channel, 'poll', return_value=None):
+            self.assertIsNone(principal_from_claims(payload))
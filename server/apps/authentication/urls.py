@@ -2,6 +2,7 @@
 URL конфигурация для приложения authentication.
 """
 from django.urls import path, include
+from rest_framework.permissions import AllowAny
 from rest_framework.routers import DefaultRouter
 
 from .views import (
@@ -10,7 +11,10 @@ from .views import (
     RoleViewSet,
     BusinessElementViewSet,
     AccessRuleViewSet,
+    SessionViewSet,
+    ExportView,
 )
+from .permissions import IsAuthenticated, IsIntrospectionClient
 from .mock_views import MockProductViewSet, MockStoreViewSet, MockOrderViewSet
 
 # Создаем router для ViewSets
@@ -21,6 +25,7 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'roles', RoleViewSet, basename='role')
 router.register(r'business-elements', BusinessElementViewSet, basename='business-element')
 router.register(r'access-rules', AccessRuleViewSet, basename='access-rule')
+router.register(r'sessions', SessionViewSet, basename='session')
 
 # Mock ViewSets
 router.register(r'mock/products', MockProductViewSet, basename='mock-product')
@@ -33,6 +38,16 @@ auth_patterns = [
     path('login/', AuthViewSet.as_view({'post': 'login'}), name='auth-login'),
     path('logout/', AuthViewSet.as_view({'post': 'logout'}), name='auth-logout'),
     path('refresh/', AuthViewSet.as_view({'post': 'refresh'}), name='auth-refresh'),
+    path('introspect/', AuthViewSet.as_view(
+        {'post': 'introspect'},
+        permission_classes=[IsAuthenticated, IsIntrospectionClient],
+    ), name='auth-introspect'),
+    # Без аутентификации: невалидный заголовок Authorization не должен мешать
+    path('jwks/', AuthViewSet.as_view(
+        {'get': 'jwks'},
+        authentication_classes=[],
+        permission_classes=[AllowAny],
+    ), name='auth-jwks'),
     path('me/', AuthViewSet.as_view({
         'get': 'me',
         'put': 'update_profile',
@@ -45,6 +60,11 @@ app_name = 'authentication'
 
 urlpatterns = [
     path('auth/', include(auth_patterns)),
+    path(
+        'export/<slug:dataset>.<slug:export_format>',
+        ExportView.as_view(),
+        name='export',
+    ),
     path('', include(router.urls)),
     # path('', include(mock_patterns)),
 ]
@@ -2,11 +2,18 @@
 Утилиты для работы с JWT токенами и безопасностью.
 """
 import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.utils import timezone
 
+from .keys import get_key_ring
+
 
 # Настройки JWT
 JWT_SECRET_KEY = getattr(settings, 'JWT_SECRET_KEY', settings.SECRET_KEY)
@@ -14,13 +21,21 @@ JWT_ALGORITHM = getattr(settings, 'JWT_ALGORITHM', 'HS256')
 JWT_ACCESS_TOKEN_LIFETIME = getattr(settings, 'JWT_ACCESS_TOKEN_LIFETIME', 15)  # минуты
 JWT_REFRESH_TOKEN_LIFETIME = getattr(settings, 'JWT_REFRESH_TOKEN_LIFETIME', 7)  # дни
 
+DEFAULT_VERIFIED_TOKEN_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+}
 
-def generate_access_token(user_id: int) -> tuple[str, datetime]:
+
+def generate_access_token(
+    user_id: int, claims: dict | None = None
+) -> tuple[str, datetime]:
     """
     Генерация access токена.
     
     Args:
         user_id: ID пользователя
+        claims: дополнительные claims (например, права из permission_claims)
         
     Returns:
         Кортеж (токен, время истечения)
@@ -28,13 +43,14 @@ def generate_access_token(user_id: int) -> tuple[str, datetime]:
     expires_at = timezone.now() + timedelta(minutes=JWT_ACCESS_TOKEN_LIFETIME)
     
     payload = {
+        **(claims or {}),
         'user_id': user_id,
         'exp': expires_at,
         'iat': timezone.now(),
         'type': 'access',
     }
     
-    token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    token = encode_token(payload)
     return token, expires_at
 
 
@@ -57,10 +73,43 @@ def generate_refresh_token(user_id: int) -> tuple[str, datetime]:
         'type': 'refresh',
     }
     
-    token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    token = encode_token(payload)
     return token, expires_at
 
 
+def encode_token(payload: dict) -> str:
+    """
+    Подпись токена.
+
+    Если задан JWT_SIGNING_KEYS, токен подписывается действующим
+    асимметричным ключом и получает его kid в заголовке,
+    иначе - общим секретом JWT_SECRET_KEY.
+
+    Args:
+        payload: данные токена
+
+    Returns:
+        JWT токен
+
+    Raises:
+        ImproperlyConfigured: нет действующего ключа, а подпись общим
+            секретом отключена (JWT_ACCEPT_SECRET_KEY_TOKENS)
+    """
+    signing_key = get_key_ring().signing_key()
+    if signing_key is None:
+        if not _accept_secret_key_tokens():
+            raise ImproperlyConfigured(
+                'JWT_SIGNING_KEYS: нет действующего ключа подписи'
+            )
+        return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return jwt.encode(
+        payload,
+        signing_key.private_key,
+        algorithm=signing_key.algorithm,
+        headers={'kid': signing_key.kid},
+    )
+
+
 def decode_token(token: str) -> dict:
     """
     Декодирование и валидация токена.
@@ -76,7 +125,18 @@ def decode_token(token: str) -> dict:
         jwt.InvalidTokenError: Невалидный токен
     """
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            # Токен подписан общим секретом
+            if not _accept_secret_key_tokens():
+                raise jwt.InvalidTokenError('токены без kid не принимаются')
+            key, algorithms = JWT_SECRET_KEY, [JWT_ALGORITHM]
+        else:
+            signing_key = get_key_ring().verification_key(kid)
+            if signing_key is None:
+                raise jwt.InvalidTokenError('неизвестный ключ подписи')
+            key, algorithms = signing_key.public_key, [signing_key.algorithm]
+        payload = jwt.decode(token, key, algorithms=algorithms)
         return payload
     except jwt.ExpiredSignatureError:
         raise jwt.ExpiredSignatureError('Токен истек')
@@ -84,6 +144,11 @@ def decode_token(token: str) -> dict:
         raise jwt.InvalidTokenError(f'Невалидный токен: {str(e)}')
 
 
+def _accept_secret_key_tokens() -> bool:
+    """Принимаются ли токены, подписанные общим секретом JWT_SECRET_KEY."""
+    return getattr(settings, 'JWT_ACCEPT_SECRET_KEY_TOKENS', True)
+
+
 def hash_token(token: str) -> str:
     """
     Хеширование токена для хранения в БД.
@@ -97,6 +162,134 @@ def hash_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кеш уже проверенных токенов.
+
+    Клиент повторяет один и тот же токен до его истечения, поэтому
+    проверку подписи и SHA-256 хеширование достаточно выполнить один раз.
+    Ключ - короткий blake2b дайджест токена (сам токен не хранится),
+    значение - (payload, token_hash, exp). Запись удаляется в момент exp.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        """Кеш на max_size токенов."""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, str, float]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Число токенов в кеше."""
+        return len(self._entries)
+
+    def verify(self, token: str) -> tuple[dict, str]:
+        """
+        Декодирование токена с запоминанием результата.
+
+        Args:
+            token: JWT токен
+
+        Returns:
+            Кортеж (payload, SHA-256 хеш токена); payload общий
+            для всех обращений и не должен изменяться
+
+        Raises:
+            jwt.ExpiredSignatureError: Токен истек
+            jwt.InvalidTokenError: Невалидный токен
+        """
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, token_hash, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload, token_hash
+                del self._entries[key]
+            self.misses += 1
+
+        payload = decode_token(token)
+        token_hash = hash_token(token)
+        if 'exp' in payload:
+            with self._lock:
+                self._entries[key] = (payload, token_hash, payload['exp'])
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return payload, token_hash
+
+    def stats(self) -> dict:
+        """Счетчики попаданий и промахов и текущий размер."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """Очистка кеша и счетчиков."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_verified_tokens = None
+
+
+def get_verified_token_cache() -> VerifiedTokenCache | None:
+    """
+    Кеш проверенных токенов текущего процесса.
+
+    Returns:
+        VerifiedTokenCache или None, если кеш отключен в настройках
+    """
+    global _verified_tokens  # noqa: PLW0603
+    if _verified_tokens is None:
+        config = {
+            **DEFAULT_VERIFIED_TOKEN_CACHE,
+            **getattr(settings, 'JWT_VERIFIED_TOKEN_CACHE', {}),
+        }
+        _verified_tokens = (
+            VerifiedTokenCache(config['MAX_SIZE'])
+            if config['ENABLED']
+            else False
+        )
+    return _verified_tokens if _verified_tokens is not False else None
+
+
+def reset_verified_token_cache() -> None:
+    """Сброс кеша (например, при изменении настроек в тестах)."""
+    global _verified_tokens  # noqa: PLW0603
+    _verified_tokens = None
+
+
+def verify_token(token: str) -> tuple[dict, str]:
+    """
+    Декодирование токена и вычисление его хеша.
+
+    Повторная проверка того же токена берется из кеша проверенных
+    токенов (JWT_VERIFIED_TOKEN_CACHE).
+
+    Args:
+        token: JWT токен
+
+    Returns:
+        Кортеж (payload, SHA-256 хеш токена)
+
+    Raises:
+        jwt.ExpiredSignatureError: Токен истек
+        jwt.InvalidTokenError: Невалидный токен
+    """
+    verified_tokens = get_verified_token_cache()
+    if verified_tokens is None:
+        return decode_token(token), hash_token(token)
+    return verified_tokens.verify(token)
+
+
 def get_client_ip(request) -> str:
     """
     Получение IP адреса клиента из запроса.
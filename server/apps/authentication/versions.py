@@ -0,0 +1,245 @@
+"""
+Версии прав доступа.
+
+Глобальная версия меняется при изменении ролей, бизнес-элементов
+и правил доступа, пользовательская - при назначении и отзыве ролей.
+Значение версии - случайная строка, поэтому смена версии не требует
+атомарного инкремента.
+
+Смена версии - событие канала инвалидации (см. session_cache.py),
+общего для всех воркеров: ``g:<версия>`` или ``v:<user_id>:<версия>``.
+Каждый воркер восстанавливает текущие версии из журнала канала
+и перед каждым чтением применяет новые события, поэтому смена
+версии в одном воркере сразу видна остальным.
+
+Глобальное событие открывает эпоху: версии пользователей в ней
+начинаются заново. Пользователь без событий в эпохе имеет версию
+INITIAL_USER_VERSION - это верно только потому, что воркер видел
+все события эпохи. Если часть событий потеряна (журнал пересоздан)
+или канал не гарантирует полного воспроизведения накопленных событий,
+воркер открывает новую эпоху, и все выданные ранее версии устаревают.
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from .session_cache import BaseInvalidationChannel, build_channel
+
+# Префиксы событий смены версий
+GLOBAL_EVENT = 'g'
+USER_EVENT = 'v'
+
+# Версия пользователя, для которого в текущей эпохе не было событий
+INITIAL_USER_VERSION = '0'
+
+# Больше стольких пользователей за раз - одна смена глобальной версии
+MAX_USER_EVENTS = 1000
+
+DEFAULT_PERMISSION_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,  # секунды
+    'ENGINE_CHECK_INTERVAL': 1.0,  # секунды
+}
+
+# Отложенные смены версий (см. deferred_bumps)
+_deferred = threading.local()
+
+
+def get_config() -> dict:
+    """Настройки кеша прав."""
+    return {
+        **DEFAULT_PERMISSION_CACHE,
+        **getattr(settings, 'PERMISSION_CACHE', {}),
+    }
+
+
+def _new_version() -> str:
+    """Новое значение версии."""
+    return uuid.uuid4().hex[:12]
+
+
+class VersionState:
+    """Версии прав процесса, восстановленные из журнала канала инвалидации."""
+
+    def __init__(self, channel: BaseInvalidationChannel):
+        """
+        Создание состояния.
+
+        Args:
+            channel: канал инвалидации с replay=True
+        """
+        self.channel = channel
+        self.global_version: str | None = None
+        self._users: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def version(self, user_id: int | None = None) -> str:
+        """
+        Текущая версия прав.
+
+        Args:
+            user_id: ID пользователя; без него - только глобальная версия
+
+        Returns:
+            Глобальная версия или '<глобальная версия>.<версия пользователя>'
+        """
+        self.sync()
+        with self._lock:
+            if user_id is None:
+                return self.global_version
+            user_version = self._users.get(user_id, INITIAL_USER_VERSION)
+            return f'{self.global_version}.{user_version}'
+
+    def publish(self, events: list[str]) -> None:
+        """Применение событий в текущем процессе и рассылка остальным."""
+        with self._lock:
+            self._apply(events)
+        self.channel.publish(events)
+
+    def sync(self) -> None:
+        """Применение событий других воркеров."""
+        events = self.channel.poll()
+        with self._lock:
+            if events is None or (
+                self.global_version is None and not self.channel.complete_replay
+            ):
+                # Пропущенные события не восстановить -
+                # текущая эпоха недостоверна
+                self.global_version = None
+            elif events:
+                self._apply(events)
+            if self.global_version is not None:
+                return
+            events = [f'{GLOBAL_EVENT}:{_new_version()}']
+            self._apply(events)
+        self.channel.publish(events)
+
+    def _apply(self, events: list[str]) -> None:
+        """Применение событий по порядку журнала."""
+        for event in events:
+            kind, _, value = event.partition(':')
+            if kind == GLOBAL_EVENT:
+                self.global_version = value
+                self._users.clear()
+            elif kind == USER_EVENT:
+                user_id, _, version = value.partition(':')
+                self._users[int(user_id)] = version
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def _get_state() -> VersionState:
+    """Версии прав текущего процесса."""
+    global _state  # noqa: PLW0603
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = VersionState(build_channel(replay=True))
+    return _state
+
+
+def reset_versions() -> None:
+    """Сброс состояния (например, при изменении канала в тестах)."""
+    global _state  # noqa: PLW0603
+    with _state_lock:
+        _state = None
+
+
+def get_global_version() -> str:
+    """Текущая глобальная версия прав."""
+    return _get_state().version()
+
+
+def get_permission_version(user_id: int) -> str:
+    """
+    Текущая версия прав пользователя.
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        Строка вида '<глобальная версия>.<версия пользователя>'
+    """
+    return _get_state().version(user_id)
+
+
+def split_version(version: str) -> tuple[str, str]:
+    """Разбор версии на глобальную и пользовательскую части."""
+    global_version, _, user_version = version.partition('.')
+    return global_version, user_version
+
+
+def bump_global_version() -> None:
+    """
+    Смена глобальной версии прав во всех воркерах.
+
+    Версия меняется сразу и повторно после коммита транзакции, чтобы
+    снимки, построенные другими воркерами по незакоммиченным данным,
+    тоже устарели.
+    """
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending['global'] = True
+        return
+
+    def bump():
+        _get_state().publish([f'{GLOBAL_EVENT}:{_new_version()}'])
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def bump_user_versions(user_ids) -> None:
+    """Смена версий прав пользователей одним событием канала на пачку."""
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending['users'].update(user_ids)
+        return
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    if len(user_ids) > MAX_USER_EVENTS:
+        # Новая эпоха дешевле тысяч событий в журнале
+        bump_global_version()
+        return
+
+    def bump():
+        version = _new_version()
+        _get_state().publish([
+            f'{USER_EVENT}:{user_id}:{version}' for user_id in user_ids
+        ])
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@contextmanager
+def deferred_bumps():
+    """
+    Одна смена версий на весь блок массовых изменений.
+
+    Внутри блока bump_global_version и bump_user_versions (в том числе
+    из сигналов post_delete при удалении QuerySet) только запоминают
+    изменения; при выходе глобальная версия меняется один раз, версии
+    пользователей - одним событием. Блок вызывается внутри
+    transaction.atomic, чтобы повторная смена прошла после коммита.
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+    pending = _deferred.pending = {'global': False, 'users': set()}
+    try:
+        yield
+    finally:
+        _deferred.pending = None
+        if pending['global']:
+            # Новая эпоха заменяет и версии пользователей
+            bump_global_version()
+        else:
+            bump_user_versions(pending['users'])
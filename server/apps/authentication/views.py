@@ -2,13 +2,26 @@
 Views для API аутентификации и авторизации.
 """
 import jwt
+from django.conf import settings
+from django.db.models import Count
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiExample, extend_schema, OpenApiResponse, OpenApiParameter
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
 
+from server.common.django import queries
+from server.common.timing import phase
+
+from .assignments import assign_roles, revoke_roles
+from .compiled import CompiledReadMixin, compile_serializer
+from .export import CONTENT_TYPES, DATASETS, stream_export
+from .introspection import introspect_tokens
+from .keys import get_key_ring
 from .models import User, Role, UserRole, BusinessElement, AccessRule, Session
 from .serializers import (
     UserSerializer,
@@ -19,9 +32,21 @@ from .serializers import (
     UserRoleSerializer,
     BusinessElementSerializer,
     AccessRuleSerializer,
+    BulkAccessRuleSerializer,
+    BulkRoleAssignmentSerializer,
+    IntrospectionSerializer,
+    SessionSerializer,
     RefreshTokenSerializer, TokenSerializer, LoginResponseSerializer, AuthSerializer,
 )
-from .permissions import IsAuthenticated, IsAdminRole, HasResourcePermission
+from .permissions import (
+    IsAuthenticated,
+    IsAdminRole,
+    IsIntrospectionClient,
+    HasResourcePermission,
+)
+from .principal import permission_claims
+from .rules import upsert_rules
+from .session_cache import invalidate_session_tokens, invalidate_user_sessions
 from .utils import (
     generate_access_token,
     generate_refresh_token,
@@ -101,7 +126,9 @@ class AuthViewSet(viewsets.ViewSet):
         user = serializer.validated_data['user']
 
         # Генерируем токены
-        access_token, access_expires = generate_access_token(user.id)
+        access_token, access_expires = generate_access_token(
+            user.id, permission_claims(user.id),
+        )
         refresh_token, refresh_expires = generate_refresh_token(user.id)
 
         # Создаем сессию
@@ -159,6 +186,7 @@ class AuthViewSet(viewsets.ViewSet):
                 token_hash=token_hash,
                 is_active=True,
             ).update(is_active=False)
+            invalidate_session_tokens([token_hash])
 
         return Response({'message': 'Успешный выход'})
 
@@ -212,15 +240,19 @@ class AuthViewSet(viewsets.ViewSet):
                 )
 
             # Генерируем новые токены
-            access_token, access_expires = generate_access_token(user_id)
+            access_token, access_expires = generate_access_token(
+                user_id, permission_claims(user_id),
+            )
             new_refresh_token, refresh_expires = generate_refresh_token(user_id)
 
-            # Обновляем сессию
+            # Обновляем сессию, старый access токен больше не действует
+            old_token_hash = session.token_hash
             session.token_hash = hash_token(access_token)
             session.refresh_token_hash = hash_token(new_refresh_token)
             session.expires_at = access_expires
             session.refresh_expires_at = refresh_expires
             session.save()
+            invalidate_session_tokens([old_token_hash])
 
             token_data = {
                 'access_token': access_token,
@@ -237,6 +269,71 @@ class AuthViewSet(viewsets.ViewSet):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
+    @extend_schema(
+        request=IntrospectionSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiResponse(description='Ошибка валидации'),
+        },
+        tags=['Аутентификация'],
+        summary='Интроспекция токенов',
+        description='Проверка access токена (token) или пачки токенов (tokens) '
+        'в стиле RFC 7662: active, user_id, роли и права по кодам '
+        "бизнес-элементов. Доступно ролям из INTROSPECTION['ROLES']",
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated, IsIntrospectionClient],
+    )
+    def introspect(self, request):
+        """
+        Интроспекция токенов.
+
+        POST /api/auth/introspect/
+        """
+        serializer = IntrospectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if 'token' in serializer.validated_data:
+            return Response(
+                introspect_tokens([serializer.validated_data['token']])[0]
+            )
+        return Response({
+            'results': introspect_tokens(serializer.validated_data['tokens'])
+        })
+
+    @extend_schema(
+        request=None,
+        responses={200: OpenApiTypes.OBJECT},
+        tags=['Аутентификация'],
+        summary='Публичные ключи подписи (JWKS)',
+        description=(
+            'Публичные ключи из JWT_SIGNING_KEYS для локальной проверки '
+            'токенов другими сервисами. Ответ кешируется '
+            'на JWKS_MAX_AGE секунд'
+        ),
+    )
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[AllowAny],
+        authentication_classes=[],
+    )
+    def jwks(self, request):
+        """
+        Публикация публичных ключей подписи.
+
+        GET /api/auth/jwks/
+        """
+        response = Response(get_key_ring().jwks())
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=getattr(settings, 'JWKS_MAX_AGE', 86400),
+        )
+        return response
+
     @extend_schema(
         request=None,
         responses={
@@ -252,8 +349,13 @@ class AuthViewSet(viewsets.ViewSet):
 
         GET /api/auth/me/
         """
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        compiled = compile_serializer(UserSerializer)
+        with phase('serialize'):
+            if compiled is None:
+                data = UserSerializer(request.user).data
+            else:
+                data = compiled.to_representation(request.user)
+        return Response(data)
 
     @action(detail=False, methods=['put', 'patch'], permission_classes=[IsAuthenticated])
     def update_profile(self, request):
@@ -290,19 +392,28 @@ class AuthViewSet(viewsets.ViewSet):
         user.save()
 
         # Деактивируем все сессии пользователя
-        Session.objects.filter(user=user, is_active=True).update(is_active=False)
+        # (хеши токенов нужны спискам отозванных токенов воркеров)
+        sessions = Session.objects.filter(user=user, is_active=True)
+        token_hashes = list(sessions.values_list('token_hash', flat=True))
+        sessions.update(is_active=False)
+        invalidate_session_tokens(token_hashes)
+        invalidate_user_sessions(user.id)
 
         return Response({
             'message': 'Аккаунт успешно удален',
         })
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(CompiledReadMixin, viewsets.ModelViewSet):
     """ViewSet для управления пользователями (только для администраторов)."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdminRole]
+    # Запросов к БД на HTTP запрос (см. QUERY_BUDGET)
+    query_budget = 10
+    # Порядок для пагинации по курсору (?pagination=cursor)
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """Получение queryset с prefetch для оптимизации."""
@@ -391,26 +502,183 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+    @extend_schema(
+        request=BulkRoleAssignmentSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiResponse(description='Ошибка валидации'),
+        },
+        summary='Массовое назначение ролей',
+        description='Назначение ролей по списку пар pairs или ролей role_ids '
+                    'пользователям из user_ids/email_domain. В ответе - итог '
+                    'по статусам и результат для каждой пары',
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-assign-roles')
+    @queries.query_budget(15)
+    def bulk_assign_roles(self, request):
+        """
+        Назначить роли многим пользователям.
+
+        POST /api/users/bulk-assign-roles/
+        """
+        serializer = BulkRoleAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.bulk_response(
+            assign_roles(serializer.validated_data['pairs'], request.user)
+        )
+
+    @extend_schema(
+        request=BulkRoleAssignmentSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiResponse(description='Ошибка валидации'),
+        },
+        summary='Массовый отзыв ролей',
+        description=(
+            'Отзыв ролей по тем же правилам выборки, что и bulk-assign-roles'
+        ),
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-revoke-roles')
+    @queries.query_budget(15)
+    def bulk_revoke_roles(self, request):
+        """
+        Отозвать роли у многих пользователей.
+
+        POST /api/users/bulk-revoke-roles/
+        """
+        serializer = BulkRoleAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.bulk_response(
+            revoke_roles(serializer.validated_data['pairs'])
+        )
+
+    def bulk_response(self, results):
+        """Итог по статусам и результаты по парам."""
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        return Response({'summary': summary, 'results': results})
+
 
 class RoleViewSet(viewsets.ModelViewSet):
     """ViewSet для управления ролями (только для администраторов)."""
 
-    queryset = Role.objects.all()
+    # users_count для RoleSerializer - одним запросом на страницу
+    queryset = Role.objects.annotate(users_count=Count('user_roles')).order_by(
+        'name'
+    )
     serializer_class = RoleSerializer
     permission_classes = [IsAuthenticated, IsAdminRole]
+    query_budget = 6
 
 
 class BusinessElementViewSet(viewsets.ModelViewSet):
     """ViewSet для управления бизнес-элементами (только для администраторов)."""
 
-    queryset = BusinessElement.objects.all()
+    # rules_count для BusinessElementSerializer - одним запросом на страницу
+    queryset = BusinessElement.objects.annotate(
+        rules_count=Count('access_rules')
+    ).order_by('name')
     serializer_class = BusinessElementSerializer
     permission_classes = [IsAuthenticated, IsAdminRole]
+    query_budget = 6
 
 
-class AccessRuleViewSet(viewsets.ModelViewSet):
+class AccessRuleViewSet(CompiledReadMixin, viewsets.ModelViewSet):
     """ViewSet для управления правилами доступа (только для администраторов)."""
 
     queryset = AccessRule.objects.select_related('role', 'element').all()
     serializer_class = AccessRuleSerializer
     permission_classes = [IsAuthenticated, IsAdminRole]
+    query_budget = 6
+    # Список строится из .values() с именами роли и элемента
+    compiled_values = True
+    keyset_ordering = ('-created_at', '-id')
+
+    @extend_schema(
+        request=BulkAccessRuleSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiResponse(description='Ошибка валидации'),
+        },
+        summary='Массовое изменение матрицы прав',
+        description='Вставка или обновление ячеек роль x бизнес-элемент одним '
+        'INSERT ... ON CONFLICT. У существующих ячеек меняются только '
+        'переданные права. В ответе - все правила затронутых ролей',
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    @queries.query_budget(10)
+    def bulk_upsert(self, request):
+        """
+        Вставить или обновить правила доступа.
+
+        POST /api/access-rules/bulk-upsert/
+        """
+        serializer = BulkAccessRuleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cells = serializer.validated_data['rules']
+        upsert_rules(cells)
+
+        compiled = compile_serializer(AccessRuleSerializer)
+        rules = AccessRule.objects.filter(
+            role_id__in={cell['role_id'] for cell in cells},
+        ).order_by('role_id', 'element_id')
+        with phase('serialize'):
+            if compiled is None or compiled.values_fields is None:
+                data = AccessRuleSerializer(
+                    rules.select_related('role', 'element'), many=True,
+                ).data
+            else:
+                data = [
+                    compiled.from_values(rule)
+                    for rule in rules.values(*compiled.values_fields)
+                ]
+        return Response({'results': data})
+
+
+class SessionViewSet(CompiledReadMixin, viewsets.ReadOnlyModelViewSet):
+    """ViewSet для просмотра сессий (только для администраторов)."""
+
+    queryset = Session.objects.select_related('user').all()
+    serializer_class = SessionSerializer
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    filterset_fields = ['user', 'is_active']
+    query_budget = 6
+    keyset_ordering = ('-created_at', '-id')
+
+
+class ExportView(APIView):
+    """
+    Потоковая выгрузка для аудита (только для администраторов).
+
+    GET /api/export/{users|user-roles|access-rules}.{ndjson|csv}
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    query_budget = 6
+
+    def perform_content_negotiation(self, request, force=False):
+        """Формат задается в пути, ошибки отдаются первым рендерером (JSON)."""
+        return super().perform_content_negotiation(request, force=True)
+
+    @extend_schema(
+        responses={
+            (200, content_type): OpenApiTypes.BINARY
+            for content_type in CONTENT_TYPES.values()
+        },
+        tags=['Администрирование'],
+        summary='Выгрузка пользователей, ролей и правил доступа',
+    )
+    def get(self, request, dataset, export_format):
+        """Выгрузка набора данных в NDJSON или CSV."""
+        if dataset not in DATASETS or export_format not in CONTENT_TYPES:
+            raise Http404
+        response = StreamingHttpResponse(
+            stream_export(dataset, export_format),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{dataset}.{export_format}"'
+        )
+        patch_cache_control(response, no_store=True)
+        return response
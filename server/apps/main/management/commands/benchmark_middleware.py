@@ -0,0 +1,81 @@
+"""
+Management команда для сравнения стоимости цепочек middleware.
+
+Прогоняет один и тот же запрос через API_MIDDLEWARE и FULL_MIDDLEWARE
+с пустым представлением, поэтому время отражает только middleware.
+
+Пример:
+    python manage.py benchmark_middleware --requests 20000 --path /api/auth/me/
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.views.decorators.csrf import csrf_exempt
+
+from server.common.django.middleware import MiddlewareChain
+
+
+@csrf_exempt
+def _empty_view(request):
+    """Представление без работы (как APIView, освобождено от CSRF)."""
+    return HttpResponse(b'{}', content_type='application/json')
+
+
+def _get_response(request):
+    """Конец цепочки: хуки process_view и пустое представление."""
+    chain = request._middleware_chain  # noqa: SLF001
+    for process_view in chain.view_middleware:
+        response = process_view(request, _empty_view, (), {})
+        if response is not None:
+            return response
+    return _empty_view(request)
+
+
+class Command(BaseCommand):
+    """Команда для замера стоимости middleware на запрос."""
+
+    help = 'Сравнение облегченной (API) и полной цепочек middleware'
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--requests', type=int, default=10000, help='Число запросов'
+        )
+        parser.add_argument(
+            '--path', default='/api/auth/me/', help='Путь запроса'
+        )
+
+    def handle(self, *args, **options):
+        """Выполнение команды."""
+        factory = RequestFactory()
+        path = options['path']
+        count = options['requests']
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer token',
+            'HTTP_ACCEPT': 'application/json',
+        }
+
+        timings = {}
+        for name, middleware in (
+            ('API_MIDDLEWARE', settings.API_MIDDLEWARE),
+            ('FULL_MIDDLEWARE', settings.FULL_MIDDLEWARE),
+        ):
+            chain = MiddlewareChain(middleware, _get_response)
+            requests = [factory.get(path, **headers) for _ in range(count)]
+            started = time.perf_counter()
+            for request in requests:
+                chain(request)
+            timings[name] = (time.perf_counter() - started) / count * 1e6
+            self.stdout.write(
+                f'{name}: {len(middleware)} middleware, '
+                f'{timings[name]:.1f} мкс/запрос'
+            )
+
+        saved = timings['FULL_MIDDLEWARE'] - timings['API_MIDDLEWARE']
+        self.stdout.write(self.style.SUCCESS(
+            f'Экономия: {saved:.1f} мкс/запрос '
+            f'({saved / timings["FULL_MIDDLEWARE"]:.0%})',
+        ))
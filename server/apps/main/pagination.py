@@ -1,6 +1,223 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+#: Below this estimate an exact ``COUNT(*)`` is cheap and more accurate.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """
+    Returns the planner's row estimate for a queryset.
+
+    Unfiltered tables use ``pg_class.reltuples``, other querysets use
+    the row estimate of ``EXPLAIN``. Small results and non-PostgreSQL
+    databases fall back to an exact ``COUNT(*)``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    query = queryset.query
+    if not query.where and query.group_by is None and not query.distinct:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],  # noqa: SLF001
+            )
+            row = cursor.fetchone()
+        estimate = row[0] if row else -1
+    else:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    # reltuples is -1 for tables that were never analyzed
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """Django paginator that uses :func:`estimate_count` for totals."""
+
+    @cached_property
+    def count(self) -> int:
+        """Estimated number of objects."""
+        return estimate_count(self.object_list)
 
 
 class AppPagination(PageNumberPagination):
-    page_size_query_param = "page_size"
+    """
+    Page number pagination with opt-in keyset (cursor) mode.
+
+    Views that declare ``keyset_ordering`` (for example
+    ``('-created_at', '-id')``) can be paginated by cursor:
+    ``?pagination=cursor`` returns the first page, then clients follow
+    the opaque ``next`` / ``previous`` links (``?cursor=...``).
+    Cursor pages use neither ``COUNT(*)`` nor ``OFFSET``.
+
+    ``?count=estimated`` replaces the exact total with the planner's
+    estimate in both modes.
+    """
+
+    page_size_query_param = 'page_size'
     max_page_size = 1000
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Returns the page in the requested mode (page number or cursor)."""
+        self.request = request
+        self.keyset_ordering = None
+        self.estimated = (
+            request.query_params.get(self.count_query_param) == 'estimated'
+        )
+
+        ordering = getattr(view, 'keyset_ordering', None)
+        cursor_requested = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if ordering and cursor_requested:
+            return self.paginate_keyset(queryset, request, tuple(ordering))
+
+        if self.estimated:
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Adds cursor links or the estimated count to the response."""
+        if self.keyset_ordering is None:
+            response = super().get_paginated_response(data)
+            if self.estimated:
+                response.data['count_estimated'] = True
+            return response
+
+        payload = OrderedDict()
+        if self.estimated:
+            payload['count'] = self.count
+            payload['count_estimated'] = True
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def paginate_keyset(
+        self, queryset, request, ordering: tuple[str, ...]
+    ) -> list:
+        """Returns the page after (or before) the cursor position."""
+        page_size = self.get_page_size(request)
+        self.keyset_ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+
+        if self.estimated:
+            self.count = estimate_count(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        if reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(_after(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message) from None
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        """Link to the next page."""
+        if self.keyset_ordering is None:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.cursor_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Link to the previous page."""
+        if self.keyset_ordering is None:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.cursor_link(self.rows[0], reverse=True)
+
+    def cursor_link(self, row: Any, reverse: bool) -> str:
+        """Link to the page after (or before) ``row``."""
+        position = [_serialize(_value(row, field)) for field in self.fields]
+        payload = json.dumps(
+            {'p': position, 'r': int(reverse)}, separators=(',', ':')
+        )
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request) -> tuple[list | None, bool]:
+        """Position and direction from the ``cursor`` query parameter."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message) from None
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+
+def _after(ordering: tuple[str, ...], position: list) -> Q:
+    """
+    Rows strictly after ``position`` in ``ordering``.
+
+    Each field is compared in its own direction, so mixed orderings
+    such as ``('-created_at', 'id')`` expand to
+    ``created_at < a OR (created_at = a AND id > b)``.
+    """
+    condition = Q()
+    equal: dict[str, Any] = {}
+    for field, value in zip(ordering, position, strict=True):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def _invert(field: str) -> str:
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _value(row: Any, field: str) -> Any:
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def _serialize(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, 'isoformat') else value
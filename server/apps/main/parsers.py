@@ -0,0 +1,28 @@
+"""
+Fast JSON parser for the REST API.
+
+Parses request bodies with ``orjson`` straight from ``bytes``.
+"""
+
+from typing import Any, final
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+@final
+class ORJSONParser(JSONParser):
+    """Parses JSON request bodies with ``orjson``."""
+
+    def parse(
+        self,
+        stream: Any,
+        media_type: str | None = None,
+        parser_context: dict | None = None,
+    ) -> Any:
+        """Parses the incoming bytestream as JSON."""
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}') from exc
@@ -0,0 +1,77 @@
+"""
+Fast JSON renderer for the REST API.
+
+``orjson`` serializes straight to ``bytes`` and natively handles
+``datetime``, ``date``, ``time`` and ``UUID``. Everything else that
+DRF's ``JSONEncoder`` knows (``Decimal``, lazy translation strings,
+querysets, ...) goes through :func:`default`, so the output matches
+``rest_framework.renderers.JSONRenderer`` (except that U+2028/U+2029
+are not escaped, which is valid JSON since ES2019).
+"""
+
+import datetime
+import decimal
+from collections.abc import Callable
+from typing import Any, final
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+#: ``Z`` instead of ``+00:00`` and integer dict keys, like DRF's encoder.
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+#: Converters for types unknown to ``orjson``, keyed by class.
+_CONVERTERS: dict[type, Callable[[Any], Any]] = {
+    Promise: force_str,
+    # Serializers coerce decimals to strings by default
+    decimal.Decimal: float,
+    datetime.timedelta: lambda value: str(value.total_seconds()),
+    QuerySet: list,
+    bytes: bytes.decode,
+}
+
+
+def default(obj: Any) -> Any:
+    """Converts types unknown to ``orjson`` like DRF's ``JSONEncoder``."""
+    # Walking the MRO picks up subclasses (e.g. lazy ``__proxy__`` strings)
+    for cls in type(obj).__mro__:
+        converter = _CONVERTERS.get(cls)
+        if converter is not None:
+            return converter(obj)
+    return _convert_by_protocol(obj)
+
+
+def _convert_by_protocol(obj: Any) -> Any:
+    """Falls back to duck typing: arrays, mappings, iterables, ``str``."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        return dict(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    return str(obj)
+
+
+@final
+class ORJSONRenderer(JSONRenderer):
+    """Renders API responses with ``orjson``."""
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None,
+    ) -> bytes:
+        """Serializes ``data`` to JSON bytes."""
+        if data is None:
+            return b''
+
+        options = _OPTIONS
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            # The browsable API asks for an indented representation
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=options)
@@ -0,0 +1,111 @@
+"""
+Диспетчер цепочек middleware по префиксу пути.
+
+Запросы к API с bearer токенами не используют сессии, CSRF, сообщения,
+локаль и CSP, но при общем MIDDLEWARE проходят через них. Диспетчер
+держит две цепочки, собранные так же, как это делает Django
+(``BaseHandler.load_middleware``), и выбирает цепочку по пути:
+API_MIDDLEWARE для API_PATH_PREFIXES и FULL_MIDDLEWARE для остального.
+
+Хуки process_view, process_exception и process_template_response
+middleware выбранной цепочки вызываются через одноименные методы
+диспетчера, поэтому CSRF и прочие проверки на уровне view работают
+как при обычном MIDDLEWARE.
+"""
+from collections.abc import Callable, Sequence
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+
+# Атрибут запроса с хуками выбранной цепочки
+_CHAIN_ATTR = '_middleware_chain'
+
+
+class MiddlewareChain:
+    """Цепочка middleware с хуками уровня view."""
+
+    def __init__(self, middleware_paths: Sequence[str], get_response: Callable):
+        """
+        Сборка цепочки.
+
+        Args:
+            middleware_paths: пути классов middleware в порядке MIDDLEWARE
+            get_response: обработчик, которым заканчивается цепочка
+        """
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        handler = convert_exception_to_response(get_response)
+        for middleware_path in reversed(middleware_paths):
+            middleware = import_string(middleware_path)
+            try:
+                mw_instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(mw_instance, 'process_view'):
+                self.view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self.template_response_middleware.append(
+                    mw_instance.process_template_response,
+                )
+            if hasattr(mw_instance, 'process_exception'):
+                self.exception_middleware.append(mw_instance.process_exception)
+            handler = convert_exception_to_response(mw_instance)
+        self.handler = handler
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Обработка запроса цепочкой."""
+        setattr(request, _CHAIN_ATTR, self)
+        return self.handler(request)
+
+
+class PathDispatchMiddleware:
+    """Выбор цепочки middleware по префиксу пути запроса."""
+
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response: Callable) -> None:
+        """Сборка облегченной и полной цепочек."""
+        self.prefixes = tuple(
+            getattr(settings, 'API_PATH_PREFIXES', ('/api/',))
+        )
+        self.api_chain = MiddlewareChain(settings.API_MIDDLEWARE, get_response)
+        self.full_chain = MiddlewareChain(
+            settings.FULL_MIDDLEWARE, get_response
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Передача запроса в цепочку по префиксу пути."""
+        if request.path_info.startswith(self.prefixes):
+            return self.api_chain(request)
+        return self.full_chain(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Хуки process_view выбранной цепочки."""
+        for process_view in getattr(request, _CHAIN_ATTR).view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        """Хуки process_template_response выбранной цепочки."""
+        chain = getattr(request, _CHAIN_ATTR)
+        for process_template_response in chain.template_response_middleware:
+            response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        """Хуки process_exception выбранной цепочки."""
+        for process_exception in getattr(
+            request, _CHAIN_ATTR
+        ).exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
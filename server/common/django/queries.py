@@ -0,0 +1,257 @@
+"""
+Бюджет запросов к БД и обнаружение N+1 в production.
+
+QueryBudgetMiddleware считает и замеряет все SQL запросы обработки
+HTTP запроса через ``connection.execute_wrapper`` и добавляет поля
+db_queries и db_time_ms в замер запроса (server/common/timing.py):
+LoggingContextVarsMiddleware связывает их с контекстом structlog
+вместе с длительностями фаз, до логов ответа.
+
+Представление объявляет бюджет атрибутом ``query_budget`` (класс,
+action DRF или функция) или декоратором ``@query_budget(n)``;
+для остальных действует QUERY_BUDGET['DEFAULT']. Для доли запросов
+SAMPLE_RATE дополнительно собираются формы SQL и места вызова
+в коде проекта: одинаковые по форме запросы, повторенные
+REPEAT_THRESHOLD и более раз, считаются N+1. Превышение бюджета
+и N+1 логируются не чаще раза в LOG_INTERVAL секунд на маршрут.
+Если превышение случилось в запросе без выборки, следующий запрос
+по тому же пути попадает в выборку, чтобы в логе были места вызова.
+"""
+import random
+import re
+import sys
+import threading
+import time
+from collections.abc import Callable
+
+import structlog
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+from server.common.timing import get_timings
+
+DEFAULT_QUERY_BUDGET = {
+    'ENABLED': True,
+    # Бюджет представлений без query_budget (None - без ограничения)
+    'DEFAULT': None,
+    # Доля запросов, для которых собираются формы SQL и места вызова
+    'SAMPLE_RATE': 0.01,
+    # Сколько одинаковых по форме запросов считается N+1
+    'REPEAT_THRESHOLD': 5,
+    # Не чаще одного сообщения на маршрут за интервал (секунды)
+    'LOG_INTERVAL': 60,
+    # Число кадров кода проекта в месте вызова
+    'STACK_DEPTH': 3,
+}
+
+# Списки параметров IN (%s, %s, ...) разной длины - одна форма запроса
+_IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+# Не больше стольких путей ждут принудительной выборки
+_MAX_PENDING = 1000
+
+logger = structlog.get_logger('django.queries')
+
+
+def query_budget(limit: int) -> Callable:
+    """
+    Декоратор бюджета запросов для представления или action DRF.
+
+    Args:
+        limit: допустимое число SQL запросов за HTTP запрос
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_config() -> dict:
+    """Настройки QUERY_BUDGET с значениями по умолчанию."""
+    return {**DEFAULT_QUERY_BUDGET, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+def normalize_sql(sql: str) -> str:
+    """Форма запроса: SQL с параметрами, списки IN свернуты."""
+    return _IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+class QueryInspector:
+    """Обертка выполнения SQL: число, время и (в выборке) формы запросов."""
+
+    def __init__(self, sampled: bool = False, stack_depth: int = 3):
+        """sampled=True - также собирать формы запросов."""
+        self.sampled = sampled
+        self.stack_depth = stack_depth
+        self.count = 0
+        self.duration = 0.0
+        # Форма запроса -> [число повторов, место первого вызова]
+        self.shapes: dict[str, list] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """Выполнение запроса с учетом числа и времени."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if self.sampled:
+                self._record(sql)
+
+    def _record(self, sql: str) -> None:
+        shape = normalize_sql(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, call_site(self.stack_depth)]
+        else:
+            entry[0] += 1
+
+    def repeated(self, threshold: int) -> list[dict]:
+        """Формы запросов, повторенные не менее threshold раз."""
+        repeated = [
+            {'sql': shape, 'count': count, 'call_site': site}
+            for shape, (count, site) in self.shapes.items()
+            if count >= threshold
+        ]
+        return sorted(repeated, key=lambda entry: entry['count'], reverse=True)
+
+
+def call_site(depth: int = 3) -> str:
+    """
+    Место вызова запроса в коде проекта.
+
+    Args:
+        depth: число ближайших кадров проекта
+
+    Returns:
+        Строка вида ``server/apps/x.py:10 in func <- ...``
+    """
+    root = str(settings.BASE_DIR.joinpath('server'))
+    # Обертки (метрики, замер фаз) не интересны как место вызова
+    common = str(settings.BASE_DIR.joinpath('server', 'common'))
+    prefix_length = len(str(settings.BASE_DIR)) + 1
+    frames = []
+    frame = sys._getframe(1)  # noqa: WPS437
+    while frame is not None and len(frames) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and not filename.startswith(common):
+            location = f'{filename[prefix_length:]}:{frame.f_lineno}'
+            frames.append(f'{location} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' <- '.join(frames) or '<unknown>'
+
+
+def resolve_budget(request: HttpRequest) -> int | None:
+    """
+    Бюджет представления, обработавшего запрос.
+
+    Порядок поиска: метод action DRF, класс представления, функция.
+    """
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return None
+    func = resolver_match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    handler = None
+    actions = getattr(func, 'actions', None)
+    if view_class is not None and actions:
+        handler = getattr(
+            view_class, actions.get(request.method.lower(), ''), None
+        )
+    for target in (handler, view_class, func):
+        budget = getattr(target, 'query_budget', None)
+        if budget is not None:
+            return budget
+    return None
+
+
+class QueryBudgetMiddleware:
+    """Учет запросов к БД, проверка бюджета и поиск N+1."""
+
+    def __init__(
+        self, get_response: Callable[[HttpRequest], HttpResponse]
+    ) -> None:
+        """Настройки QUERY_BUDGET; без ENABLED middleware отключается."""
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.default_budget = config['DEFAULT']
+        self.sample_rate = config['SAMPLE_RATE']
+        self.repeat_threshold = config['REPEAT_THRESHOLD']
+        self.log_interval = config['LOG_INTERVAL']
+        self.stack_depth = config['STACK_DEPTH']
+        self._last_logged: dict[tuple[str, bool], float] = {}
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Обработка запроса с учетом запросов к БД."""
+        path = request.path_info
+        sampled = random.random() < self.sample_rate  # noqa: S311
+        if self._pending and path in self._pending:
+            with self._lock:
+                self._pending.discard(path)
+            sampled = True
+
+        inspector = QueryInspector(sampled, self.stack_depth)
+        with connection.execute_wrapper(inspector):
+            response = self.get_response(request)
+
+        timings = get_timings()
+        if timings is not None:
+            db_time_ms = round(inspector.duration * 1000, 3)
+            timings.add_field('db_queries', inspector.count)
+            timings.add_field('db_time_ms', db_time_ms)
+        self.check(request, inspector)
+        return response
+
+    def check(self, request: HttpRequest, inspector: QueryInspector) -> None:
+        """Логирование превышения бюджета и N+1."""
+        budget = resolve_budget(request)
+        if budget is None:
+            budget = self.default_budget
+        over_budget = budget is not None and inspector.count > budget
+        repeated = (
+            inspector.repeated(self.repeat_threshold)
+            if inspector.sampled
+            else []
+        )
+        if not over_budget and not repeated:
+            return
+
+        if (
+            over_budget
+            and not inspector.sampled
+            and len(self._pending) < _MAX_PENDING
+        ):
+            with self._lock:
+                self._pending.add(request.path_info)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = (
+            resolver_match.view_name if resolver_match else request.path_info
+        )
+        # Отчет с местами вызова не подавляется отчетом без них
+        log_key = (route, inspector.sampled)
+        now = time.monotonic()
+        if (
+            now - self._last_logged.get(log_key, -self.log_interval)
+            < self.log_interval
+        ):
+            return
+        self._last_logged[log_key] = now
+
+        logger.warning(
+            'query_budget_exceeded' if over_budget else 'repeated_queries',
+            route=route,
+            method=request.method,
+            path=request.path,
+            queries=inspector.count,
+            budget=budget,
+            db_time_ms=round(inspector.duration * 1000, 3),
+            sampled=inspector.sampled,
+            repeated=repeated,
+        )
@@ -0,0 +1,458 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Каждый процесс (воркер gunicorn) копит счетчики и гистограммы
+в памяти и не чаще раза в FLUSH_INTERVAL секунд записывает их снимок
+в свой файл в каталоге METRICS['DIRECTORY'] (по умолчанию
+/dev/shm/rolegate-metrics). Ответ METRICS['PATH'] суммирует файлы
+всех воркеров узла, поэтому не зависит от того, какой воркер принял
+запрос скрейпера. Когда воркер завершается (в том числе при
+перезапуске по max_requests), мастер gunicorn переносит его счетчики
+в общий файл ARCHIVE_FILE и удаляет файл воркера (archive, хук
+child_exit), поэтому счетчики не уменьшаются, а число файлов
+не растет. Каталог очищается при запуске gunicorn.
+
+MetricsMiddleware стоит в начале MIDDLEWARE и для каждого запроса
+записывает длительность и число запросов к БД с меткой маршрута
+(``resolver_match.view_name``). Запросы к БД не считаются отдельно:
+число берется из поля db_queries замера запроса, которое добавляет
+QueryBudgetMiddleware (server/common/django/queries.py). Middleware,
+отвечающие до разрешения URL, задают маршрут атрибутом
+``request.metrics_route``. Метка method принимает значения
+из HTTP_METHODS, остальные методы учитываются как ``other``, чтобы
+произвольный метод запроса не создавал новых рядов.
+"""
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from server.common.timing import get_timings
+
+DEFAULT_METRICS = {
+    'ENABLED': True,
+    'PATH': '/metrics',
+    # None - /dev/shm/rolegate-metrics (или каталог временных файлов)
+    'DIRECTORY': None,
+    'FLUSH_INTERVAL': 1.0,
+}
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Снимок метрик завершившихся воркеров
+ARCHIVE_FILE = 'archive.json'
+
+# Значения метки method; прочие методы - OTHER_METHOD
+HTTP_METHODS = frozenset((
+    'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS',
+))
+OTHER_METHOD = 'other'
+
+
+class Metric:
+    """Базовый класс метрики с набором меток."""
+
+    kind = ''
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ):
+        """Метрика с описанием для /metrics и именами меток."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def describe(self) -> dict:
+        """Снимок метрики для записи в файл процесса."""
+        with self._lock:
+            samples = [
+                [list(key), _copy(value)] for key, value in self._values.items()
+            ]
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': samples,
+        }
+
+    def clear(self) -> None:
+        """Сброс значений."""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Монотонный счетчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Увеличение счетчика с указанными метками."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Установка значения счетчика, который ведет другой объект.
+
+        Используется коллекторами (например, для счетчиков попаданий кешей).
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        """Текущее значение в этом процессе."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        """Гистограмма с верхними границами корзин buckets."""
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        """Учет наблюдения."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики корзин (последняя - +Inf), сумма
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def describe(self) -> dict:
+        """Снимок метрики с границами корзин."""
+        return {**super().describe(), 'buckets': list(self.buckets)}
+
+    def count(self, **labels) -> int:
+        """Число наблюдений в этом процессе."""
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+
+def _copy(value):
+    return [list(value[0]), value[1]] if isinstance(value, list) else value
+
+
+class Registry:
+    """Реестр метрик процесса."""
+
+    def __init__(self):
+        """Пустой реестр."""
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> None:
+        """Регистрация метрики; имена уникальны."""
+        if metric.name in self.metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self.metrics[metric.name] = metric
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Регистрация коллектора.
+
+        Коллектор вызывается перед каждым снимком и обновляет
+        метрики значениями, которые ведут другие объекты.
+        """
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """Снимок всех метрик процесса."""
+        for collector in self.collectors:
+            collector()
+        return {
+            name: metric.describe() for name, metric in self.metrics.items()
+        }
+
+    def clear(self) -> None:
+        """Сброс значений всех метрик (например, в тестах)."""
+        for metric in self.metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+
+def get_config() -> dict:
+    """Настройки METRICS с значениями по умолчанию."""
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+def get_directory() -> str:
+    """Каталог файлов метрик воркеров."""
+    directory = get_config()['DIRECTORY']
+    if directory is None:
+        base_dir = (
+            '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        )  # noqa: S108
+        directory = os.path.join(base_dir, 'rolegate-metrics')
+    return directory
+
+
+_last_flush = 0.0
+
+
+def flush(directory: str | None = None) -> None:
+    """Запись снимка метрик процесса в его файл."""
+    global _last_flush  # noqa: PLW0603
+    directory = directory or get_directory()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    # Запись во временный файл и rename: читатель не увидит половину снимка
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(registry.snapshot(), tmp_file)
+    os.replace(tmp_path, path)
+    _last_flush = time.monotonic()
+
+
+def archive(pid: int, directory: str | None = None) -> None:
+    """
+    Перенос снимка завершившегося воркера в ARCHIVE_FILE.
+
+    Вызывается мастером gunicorn (хук child_exit), поэтому записи
+    архива не пересекаются.
+
+    Args:
+        pid: PID завершившегося воркера
+        directory: каталог файлов метрик
+    """
+    directory = directory or get_directory()
+    path = os.path.join(directory, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    snapshots = []
+    for snapshot_path in (archive_path, path):
+        try:
+            with open(snapshot_path, encoding='utf-8') as metrics_file:
+                snapshots.append(json.load(metrics_file))
+        except (FileNotFoundError, ValueError):
+            continue
+    merged = merge(snapshots)
+    for metric in merged.values():
+        metric['samples'] = [
+            [list(key), value] for key, value in metric['samples'].items()
+        ]
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp_file:
+        json.dump(merged, tmp_file)
+    os.replace(tmp_path, archive_path)
+    os.remove(path)
+
+
+def method_label(method: str) -> str:
+    """Значение метки method для метода HTTP запроса."""
+    return method if method in HTTP_METHODS else OTHER_METHOD
+
+
+def maybe_flush(interval: float) -> None:
+    """Запись снимка, если с прошлой записи прошло не меньше interval секунд."""
+    if time.monotonic() - _last_flush >= interval:
+        flush()
+
+
+def collect(directory: str | None = None) -> dict:
+    """
+    Сумма метрик всех воркеров.
+
+    Снимок текущего процесса берется из памяти, остальных - из файлов.
+    """
+    directory = directory or get_directory()
+    snapshots = [registry.snapshot()]
+    own_file = f'{os.getpid()}.json'
+    try:
+        file_names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        file_names = []
+    for file_name in file_names:
+        if not file_name.endswith('.json') or file_name == own_file:
+            continue
+        try:
+            snapshot_path = os.path.join(directory, file_name)
+            with open(snapshot_path, encoding='utf-8') as metrics_file:
+                snapshots.append(json.load(metrics_file))
+        except (FileNotFoundError, ValueError):
+            continue
+    return merge(snapshots)
+
+
+def merge(snapshots: list[dict]) -> dict:
+    """Суммирование снимков метрик по имени и меткам."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for labels, value in metric['samples']:
+                _merge_sample(target['samples'], tuple(labels), value)
+    return merged
+
+
+def _merge_sample(samples: dict, key: tuple, value) -> None:
+    """Добавление значения ряда (числа или гистограммы) к samples."""
+    current = samples.get(key)
+    if current is None:
+        samples[key] = _copy(value)
+    elif not isinstance(value, list):
+        samples[key] = current + value
+    elif len(current[0]) == len(value[0]):
+        current[0] = [
+            left + right
+            for left, right in zip(current[0], value[0], strict=True)
+        ]
+        current[1] += value[1]
+    # Иначе границы корзин изменились между версиями кода - ряд пропускается
+
+
+def render(metrics: dict) -> str:
+    """Текстовый формат Prometheus (exposition format 0.0.4)."""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f'# HELP {name} {_escape_help(metric["help"])}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        labelnames = metric['labelnames']
+        for key in sorted(metric['samples']):
+            value = metric['samples'][key]
+            labels = list(zip(labelnames, key, strict=True))
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            bounds = [*metric['buckets'], math.inf]
+            for bound, count in zip(bounds, counts, strict=True):
+                cumulative += count
+                bucket_labels = [*labels, ('le', _number(bound))]
+                lines.append(
+                    f'{name}_bucket{_labels(bucket_labels)} {cumulative}'
+                )
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: list[tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape_value(value)}"' for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_value(value: str) -> str:
+    return _escape_help(value).replace('"', r'\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value)) if isinstance(value, int) else f'{value:.1f}'
+    return repr(float(value))
+
+
+REQUEST_DURATION = Histogram(
+    'rolegate_http_request_duration_seconds',
+    'Длительность обработки HTTP запроса',
+    ['route', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'rolegate_http_request_db_queries',
+    'Число запросов к БД за HTTP запрос',
+    ['route'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """Отдача METRICS['PATH'] и учет длительности и запросов к БД."""
+
+    def __init__(self, get_response):
+        """Настройки METRICS; без ENABLED middleware отключается."""
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path = config['PATH']
+        self.flush_interval = config['FLUSH_INTERVAL']
+
+    def __call__(self, request):
+        """Отдача метрик или обработка запроса с учетом."""
+        if request.path_info == self.path:
+            return metrics_response()
+
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        route = getattr(request, 'metrics_route', None)
+        if route is None:
+            resolver_match = getattr(request, 'resolver_match', None)
+            route = (
+                resolver_match.view_name if resolver_match else '<unmatched>'
+            )
+        REQUEST_DURATION.observe(
+            duration, route=route, method=method_label(request.method),
+        )
+        # Запросы к БД считает QueryBudgetMiddleware (поле db_queries)
+        timings = get_timings()
+        if timings is not None and 'db_queries' in timings.fields:
+            REQUEST_QUERIES.observe(timings.fields['db_queries'], route=route)
+        maybe_flush(self.flush_interval)
+        return response
+
+
+def metrics_response() -> HttpResponse:
+    """Ответ со сводными метриками всех воркеров."""
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
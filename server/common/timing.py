@@ -0,0 +1,136 @@
+"""
+Замер времени фаз обработки запроса.
+
+Middleware начинает замер (start_timing), код приложения оборачивает
+фазы в ``with phase('token'):``, в конце запроса накопленные
+длительности отдаются в логи structlog и заголовок Server-Timing.
+Прочие поля запроса для логов (например, число запросов к БД)
+добавляются в замер через add_field и связываются вместе с фазами.
+Вне запроса (команды, тесты без middleware) phase ничего не делает.
+
+Вложенная фаза с тем же именем не учитывается повторно, поэтому
+сериализатор, вложенный в сериализатор, не удваивает время.
+"""
+import functools
+import time
+from contextvars import ContextVar
+
+
+class RequestTimings:
+    """Длительности фаз одного запроса в секундах."""
+
+    __slots__ = ('active', 'durations', 'fields', 'marks', 'started')
+
+    def __init__(self):
+        """Отсчет длительности запроса начинается сейчас."""
+        self.started = time.perf_counter()
+        self.durations: dict[str, float] = {}
+        self.active: set[str] = set()
+        self.marks: dict[str, float] = {}
+        self.fields: dict[str, int | float] = {}
+
+    def mark(self, name: str) -> None:
+        """Отметка момента (например, начала представления)."""
+        self.marks[name] = time.perf_counter()
+
+    def add(self, name: str, duration: float) -> None:
+        """Добавление длительности к фазе."""
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def add_field(self, name: str, value: int | float) -> None:
+        """Поле для логов, не являющееся фазой."""
+        self.fields[name] = value
+
+    def inner_duration(self) -> float:
+        """Суммарная длительность всех фаз."""
+        return sum(self.durations.values())
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing."""
+        return ', '.join(
+            f'{name};dur={duration * 1000:.3f}'
+            for name, duration in self.durations.items()
+        )
+
+    def log_fields(self) -> dict[str, int | float]:
+        """Поля для structlog: timing_<фаза>_ms и поля add_field."""
+        return {
+            **{
+                f'timing_{name}_ms': round(duration * 1000, 3)
+                for name, duration in self.durations.items()
+            },
+            **self.fields,
+        }
+
+
+_timings: ContextVar[RequestTimings | None] = ContextVar(
+    'request_timings', default=None
+)
+
+
+def start_timing() -> RequestTimings:
+    """Начало замера для текущего запроса."""
+    timings = RequestTimings()
+    _timings.set(timings)
+    return timings
+
+
+def finish_timing() -> None:
+    """Окончание замера."""
+    _timings.set(None)
+
+
+def get_timings() -> RequestTimings | None:
+    """Замер текущего запроса или None вне запроса."""
+    return _timings.get()
+
+
+class phase:  # noqa: N801
+    """
+    Контекстный менеджер замера фазы.
+
+    Пример:
+        with phase('session'):
+            ...
+    """
+
+    __slots__ = ('name', 'started', 'timings')
+
+    def __init__(self, name: str):
+        """Фаза name."""
+        self.name = name
+        self.timings = None
+
+    def __enter__(self):
+        """Начало фазы, если такая же фаза еще не идет."""
+        timings = _timings.get()
+        if timings is not None and self.name not in timings.active:
+            timings.active.add(self.name)
+            self.timings = timings
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Учет длительности фазы."""
+        timings = self.timings
+        if timings is not None:
+            timings.add(self.name, time.perf_counter() - self.started)
+            timings.active.discard(self.name)
+            self.timings = None
+        return False
+
+
+def timed(name: str):
+    """
+    Декоратор замера фазы для функций и методов.
+
+    Args:
+        name: имя фазы
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
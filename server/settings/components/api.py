@@ -6,6 +6,18 @@ DISABLE_THROTTLING = config("DISABLE_THROTTLING", cast=bool, default=config("DEB
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
+        # Ограничение выборок правами на свои/все объекты (по resource_code)
+        "server.apps.authentication.filters.ResourcePermissionFilterBackend",
+    ],
+    # orjson для JSON API, browsable API остается для отладки
+    "DEFAULT_RENDERER_CLASSES": [
+        "server.apps.main.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "server.apps.main.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # Custom JWT Authentication Middleware
@@ -6,3 +6,87 @@ AUTH_USER_MODEL = "authentication.User"
 JWT_SECRET_KEY = 'rolesgate-secret-key'
 JWT_ACCESS_TOKEN_LIFETIME = 15  # минуты
 JWT_REFRESH_TOKEN_LIFETIME = 7  # дни
+
+# Асимметричные ключи подписи (RS256, EdDSA). Если список пуст,
+# токены подписываются JWT_SECRET_KEY (HS256). Публичные ключи
+# публикуются в /api/auth/jwks/ (кешируется на JWKS_MAX_AGE секунд),
+# поэтому новый ключ добавляйте с NOT_BEFORE не ближе JWKS_MAX_AGE,
+# а старый удаляйте не раньше JWT_REFRESH_TOKEN_LIFETIME после ротации.
+# Пример:
+# JWT_SIGNING_KEYS = [{
+#     'KID': '2026-01',
+#     'ALGORITHM': 'EdDSA',
+#     'PRIVATE_KEY': config('JWT_PRIVATE_KEY_2026_01'),
+#     'NOT_BEFORE': '2026-01-01T00:00:00+00:00',
+# }]
+JWT_SIGNING_KEYS = []
+JWKS_MAX_AGE = 60 * 60 * 24  # секунды
+# Принимать токены без kid, подписанные JWT_SECRET_KEY. После перехода
+# на JWT_SIGNING_KEYS отключите, когда истекут выданные ранее токены
+# (не раньше JWT_REFRESH_TOKEN_LIFETIME).
+JWT_ACCEPT_SECRET_KEY_TOKENS = True
+
+# Процессный кеш подтвержденных сессий.
+# FileInvalidationChannel рассылает отзыв сессий воркерам одного узла
+# через /dev/shm. Для нескольких узлов используйте
+# CacheInvalidationChannel с общим кешем (Redis).
+JWT_SESSION_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TTL': 60,  # секунды
+    'CHANNEL': (
+        'server.apps.authentication.session_cache.FileInvalidationChannel'
+    ),
+    'CHANNEL_OPTIONS': {},
+}
+
+# Процессный LRU-кеш проверенных токенов: повторный запрос с тем же
+# токеном не проверяет подпись и не считает SHA-256 заново.
+JWT_VERIFIED_TOKEN_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+}
+
+# Проверка сессии access токена:
+# 'database' - поиск активной сессии в БД (с кешем JWT_SESSION_CACHE);
+# 'revocation' - без обращения к БД, по списку отозванных токенов
+# и неактивных пользователей, который воркеры получают через канал
+# JWT_SESSION_CACHE; пользователь загружается из БД, только если
+# представлению нужны его поля. Отзыв сессии вступает в силу сразу;
+# исключение - access токены, замененные при refresh до старта воркера
+# и уже вытесненные из журнала канала: они действуют до истечения
+# (не дольше JWT_ACCESS_TOKEN_LIFETIME).
+JWT_SESSION_VALIDATION = 'database'
+JWT_REVOCATION_LIST = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 0.001,
+    'PURGE_INTERVAL': 60,  # секунды
+}
+
+# Интроспекция токенов (/api/auth/introspect/) для соседних сервисов:
+# доступна пользователям с одной из ROLES; результаты хранятся
+# в CACHE_ALIAS по хешу токена CACHE_TTL секунд, поэтому отзыв сессии
+# виден интроспекции с такой задержкой.
+INTROSPECTION = {
+    'ROLES': ['admin'],
+    'BATCH_SIZE': 100,
+    'CACHE_ALIAS': 'default',
+    'CACHE_TTL': 5,  # секунды
+}
+
+# Путь подзапроса forward auth от прокси (см. forward_auth.py
+# и docker/caddy/Caddyfile). Обрабатывается ForwardAuthMiddleware.
+FORWARD_AUTH_PATH = '/api/auth/check/'
+
+# Процессный кеш снимков прав пользователей (Principal) и матрицы прав.
+# Смена версий прав рассылается воркерам через канал JWT_SESSION_CACHE.
+PERMISSION_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,  # секунды
+    # Как часто движок прав сверяет версию матрицы с кешем
+    'ENGINE_CHECK_INTERVAL': 1.0,  # секунды
+}
+
+# Встраивать роли и маски прав в access токен (с версией прав).
+# Проверка прав по такому токену сводится к сверке версии прав воркера.
+JWT_EMBED_PERMISSIONS = False
@@ -17,9 +17,8 @@ from server.settings.components import BASE_DIR, config
 
 SECRET_KEY = config('DJANGO_SECRET_KEY')
 
-MIDDLEWARE: tuple[str, ...] = (
-    # Logging:
-    'server.settings.components.logging.LoggingContextVarsMiddleware',
+# Полная цепочка middleware: админка и HTML страницы.
+FULL_MIDDLEWARE: tuple[str, ...] = (
     # Content Security Policy:
     'csp.middleware.CSPMiddleware',
     # Django:
@@ -37,6 +36,62 @@ MIDDLEWARE: tuple[str, ...] = (
     'axes.middleware.AxesMiddleware',
 )
 
+# Облегченная цепочка для API с bearer токенами: без сессий, CSRF,
+# сообщений, локали, CSP и Django AuthenticationMiddleware
+# (пользователя определяет JWTAuthentication в DRF).
+API_MIDDLEWARE: tuple[str, ...] = (
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+)
+API_PATH_PREFIXES: tuple[str, ...] = ('/api/',)
+
+MIDDLEWARE: tuple[str, ...] = (
+    # Logging: очистка контекста structlog для всех запросов,
+    # в том числе отвеченных следующими middleware
+    'server.settings.components.logging.LoggingContextVarsMiddleware',
+    # Метрики Prometheus: отдача METRICS['PATH'] и учет всех запросов
+    'server.common.metrics.MetricsMiddleware',
+    # Бюджет запросов к БД и поиск N+1
+    'server.common.django.queries.QueryBudgetMiddleware',
+    # Forward auth для прокси: отвечает до остальных middleware
+    'server.apps.authentication.forward_auth.ForwardAuthMiddleware',
+    # API_MIDDLEWARE для API_PATH_PREFIXES, FULL_MIDDLEWARE для остальных:
+    'server.common.django.middleware.PathDispatchMiddleware',
+)
+
+# Метрики Prometheus, суммированные по воркерам узла.
+# Путь не проксируется наружу (см. docker/caddy/Caddyfile).
+METRICS = {
+    'ENABLED': True,
+    'PATH': '/metrics',
+    # None - /dev/shm/rolegate-metrics; его же очищает и дополняет
+    # мастер gunicorn (docker/django/gunicorn_config.py)
+    'DIRECTORY': config('DJANGO_METRICS_DIRECTORY', default=None),
+    # Как часто воркер записывает свой снимок метрик (секунды)
+    'FLUSH_INTERVAL': 1.0,
+}
+
+# Бюджет запросов к БД (см. server/common/django/queries.py).
+QUERY_BUDGET = {
+    'ENABLED': True,
+    # Бюджет представлений без query_budget (None - без ограничения)
+    'DEFAULT': None,
+    # Доля запросов, для которых собираются места вызова
+    'SAMPLE_RATE': 0.01,
+    # Сколько одинаковых по форме запросов считается N+1
+    'REPEAT_THRESHOLD': 5,
+    'LOG_INTERVAL': 60,
+}
+
+# Проверки admin и axes ищут свои middleware только в MIDDLEWARE,
+# а они подключены через FULL_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = [
+    'admin.E408',
+    'admin.E409',
+    'admin.E410',
+    'axes.W002',
+]
+
 ROOT_URLCONF = 'server.urls'
 
 WSGI_APPLICATION = 'server.wsgi.application'
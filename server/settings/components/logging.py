@@ -7,11 +7,19 @@
 
 from __future__ import annotations
 
+import time
 from collections.abc import Callable
 from typing import TYPE_CHECKING, final
 
 import structlog
 
+from server.common.timing import (
+    RequestTimings,
+    finish_timing,
+    get_timings,
+    start_timing,
+)
+
 if TYPE_CHECKING:
     from django.http import HttpRequest, HttpResponse
 
@@ -32,6 +40,7 @@ LOGGING = {
                 key_order=['timestamp', 'level', 'event', 'logger'],
             ),
             'foreign_pre_chain': [
+                structlog.contextvars.merge_contextvars,
                 structlog.stdlib.add_log_level,
                 structlog.stdlib.add_logger_name,
                 structlog.processors.TimeStamper(fmt='iso'),
@@ -68,28 +77,95 @@ LOGGING = {
 }
 
 
+# Per-request phase timing, see `server/common/timing.py`.
+# Phases are bound to structlog context as `timing_<phase>_ms` fields.
+REQUEST_TIMING = {
+    # Emit `Server-Timing` response header:
+    'SERVER_TIMING_HEADER': False,
+    # Log `request_timing` event for every request:
+    'LOG_EVENT': False,
+}
+
+
 @final
 class LoggingContextVarsMiddleware:
-    """Used to reset ContextVars in structlog on each request."""
+    """Used to reset ContextVars in structlog and time request phases."""
 
     def __init__(
         self,
         get_response: Callable[[HttpRequest], HttpResponse],
     ) -> None:
         """Django's API-compatible constructor."""
+        from django.conf import settings  # noqa: WPS433
+
         self.get_response = get_response
+        timing_options = getattr(settings, 'REQUEST_TIMING', {})
+        self.server_timing_header = timing_options.get(
+            'SERVER_TIMING_HEADER',
+            False,
+        )
+        self.log_event = timing_options.get('LOG_EVENT', False)
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
         """
         Handle requests.
 
-        Add your logging metadata here.
+        This middleware must be the first one in `MIDDLEWARE`,
+        so that every request starts with a clean context,
+        including the ones answered by the outer middleware
+        (metrics, forward auth).
+
+        Timing fields are bound in `finally`, so that they are
+        always replaced and still available for `django.request` logs
+        of this response.
         Example: https://github.com/jrobichaud/django-structlog
         """
-        response = self.get_response(request)
         structlog.contextvars.clear_contextvars()
+        timings = start_timing()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_timing()
+            self._bind_timings(timings)
+
+        if self.server_timing_header:
+            response['Server-Timing'] = timings.server_timing()
+        if self.log_event:
+            _timing_logger.info(
+                'request_timing',
+                path=request.path,
+                status=response.status_code,
+            )
         return response
 
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Marks the start of the view."""
+        timings = get_timings()
+        if timings is not None:
+            timings.mark('view')
+
+    def process_template_response(self, request, response):
+        """Marks the end of the view, the response is rendered next."""
+        timings = get_timings()
+        if timings is not None:
+            timings.mark('render')
+        return response
+
+    def _bind_timings(self, timings: RequestTimings) -> None:
+        """Adds view, render and total phases and binds all of them."""
+        finished = time.perf_counter()
+        view_started = timings.marks.get('view')
+        if view_started is not None:
+            view_finished = timings.marks.get('render', finished)
+            timings.add(
+                'view',
+                max(view_finished - view_started - timings.inner_duration(), 0),
+            )
+            if 'render' in timings.marks:
+                timings.add('render', finished - view_finished)
+        timings.add('total', finished - timings.started)
+        structlog.contextvars.bind_contextvars(**timings.log_fields())
+
 
 if not structlog.is_configured():
     structlog.configure(
@@ -110,3 +186,6 @@ if not structlog.is_configured():
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
+
+
+_timing_logger = structlog.get_logger('django.timing')
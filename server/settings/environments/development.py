@@ -66,6 +66,12 @@ INSTALLED_APPS += (
 
 DOCS_ACCESS = 'public'
 
+# Per-request phase timing in browser devtools:
+REQUEST_TIMING = {
+    'SERVER_TIMING_HEADER': True,
+    'LOG_EVENT': False,
+}
+
 # Django debug toolbar:
 # https://django-debug-toolbar.readthedocs.io
 
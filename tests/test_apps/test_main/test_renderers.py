@@ -0,0 +1,39 @@
+import datetime as dt
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from server.apps.main.parsers import ORJSONParser
+from server.apps.main.renderers import ORJSONRenderer
+
+
+def test_renderer_matches_drf() -> None:
+    """Ensures that the orjson renderer produces the same JSON as DRF."""
+    payload = {
+        'created_at': dt.datetime(2025, 1, 2, 3, 4, 5, 678, tzinfo=dt.UTC),
+        'price': Decimal('10.50'),
+        'title': gettext_lazy('Продукт'),
+        1: 'integer key',
+    }
+
+    rendered = ORJSONRenderer().render(payload)
+
+    assert isinstance(rendered, bytes)
+    assert json.loads(rendered) == json.loads(JSONRenderer().render(payload))
+    assert b'"2025-01-02T03:04:05.000678Z"' in rendered
+
+
+def test_parser_round_trip() -> None:
+    """Ensures that the parser reads JSON bytes and rejects broken input."""
+    parser = ORJSONParser()
+
+    assert parser.parse(io.BytesIO('{"name": "Мышка"}'.encode())) == {
+        'name': 'Мышка'
+    }
+    with pytest.raises(ParseError):
+        parser.parse(io.BytesIO(b'{"name":'))
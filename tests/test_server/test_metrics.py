@@ -0,0 +1,23 @@
+from server.common.metrics import merge, render
+
+
+def test_histogram_is_rendered_cumulatively() -> None:
+    """Ensures that merged histogram buckets are cumulative."""
+    worker = {
+        'latency_seconds': {
+            'type': 'histogram',
+            'help': 'Latency',
+            'labelnames': ['route'],
+            'buckets': [0.1, 1.0],
+            'samples': [[['index'], [[1, 2, 0], 1.5]]],
+        },
+    }
+
+    text = render(merge([worker, worker]))
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="index",le="0.1"} 2\n' in text
+    assert 'latency_seconds_bucket{route="index",le="1.0"} 6\n' in text
+    assert 'latency_seconds_bucket{route="index",le="+Inf"} 6\n' in text
+    assert 'latency_seconds_sum{route="index"} 3.0\n' in text
+    assert 'latency_seconds_count{route="index"} 6\n' in text
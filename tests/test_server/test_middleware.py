@@ -0,0 +1,70 @@
+import time
+from http import HTTPStatus
+
+import pytest
+import structlog
+from django.test import Client
+
+from server.common.timing import finish_timing, get_timings, phase, start_timing
+
+
+@pytest.mark.django_db
+def test_api_uses_lean_middleware(client: Client) -> None:
+    """Ensures that API requests skip session, CSRF and CSP middleware."""
+    response = client.get('/api/auth/jwks/')
+
+    assert response.status_code == HTTPStatus.OK
+    assert not hasattr(response.wsgi_request, 'session')
+    assert 'X-Frame-Options' not in response
+
+
+@pytest.mark.django_db
+def test_html_uses_full_middleware(client: Client) -> None:
+    """Ensures that other routes keep the full middleware chain."""
+    response = client.get('/admin/login/')
+
+    assert response.status_code == HTTPStatus.OK
+    assert hasattr(response.wsgi_request, 'session')
+    assert 'X-Frame-Options' in response
+    assert 'csrftoken' in response.cookies
+
+
+def test_nested_phase_is_counted_once() -> None:
+    """Ensures that a nested phase with the same name is not doubled."""
+    timings = start_timing()
+    try:
+        with phase('serialize'), phase('serialize'):
+            time.sleep(0.001)
+    finally:
+        finish_timing()
+
+    elapsed = time.perf_counter() - timings.started
+    assert list(timings.durations) == ['serialize']
+    assert timings.durations['serialize'] < elapsed
+    assert get_timings() is None
+
+
+@pytest.mark.django_db
+def test_context_is_reset_before_outer_middleware(client: Client) -> None:
+    """Ensures that forward auth responses do not keep stale log fields."""
+    structlog.contextvars.bind_contextvars(user_id=1, timing_view_ms=1.0)
+
+    response = client.get('/api/auth/check/')
+
+    log_fields = structlog.contextvars.get_contextvars()
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert 'user_id' not in log_fields
+    assert 'timing_view_ms' not in log_fields
+    assert 'timing_total_ms' in log_fields
+
+
+@pytest.mark.django_db
+def test_query_count_is_bound_with_timings(client: Client) -> None:
+    """Ensures that the query count belongs to the request that made it."""
+    structlog.contextvars.bind_contextvars(db_queries=100)
+
+    client.get('/api/auth/jwks/')
+
+    log_fields = structlog.contextvars.get_contextvars()
+    assert log_fields['db_queries'] < 100
+    assert 'db_time_ms' in log_fields